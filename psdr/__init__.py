@@ -3,6 +3,9 @@ from .exceptions import *
 from .domains import *
 from .basis import *
 from .function import *
+from .cache import *
+from .checkpoint import *
+from .runner import *
 from .subspace import *
 from .coord import *
 from .lipschitz import *
@@ -0,0 +1,234 @@
+r""" A persistent cache of function evaluations
+"""
+from __future__ import print_function
+import io
+import hashlib
+import sqlite3
+import numpy as np
+
+__all__ = ['FunctionCache']
+
+
+def _to_blob(x):
+	if x is None:
+		return None
+	buf = io.BytesIO()
+	np.save(buf, np.asarray(x), allow_pickle = False)
+	return buf.getvalue()
+
+
+def _from_blob(blob):
+	if blob is None:
+		return None
+	return np.load(io.BytesIO(blob), allow_pickle = False)
+
+
+def _hash_update(h, obj):
+	r""" Add a (nested) python/numpy object to a hash in a repeatable way
+	"""
+	if isinstance(obj, dict):
+		h.update(b'dict')
+		for key in sorted(obj.keys(), key = repr):
+			_hash_update(h, key)
+			_hash_update(h, obj[key])
+	elif isinstance(obj, (list, tuple)):
+		h.update(type(obj).__name__.encode())
+		for item in obj:
+			_hash_update(h, item)
+	elif isinstance(obj, np.ndarray):
+		h.update(str(obj.dtype).encode() + str(obj.shape).encode())
+		h.update(np.ascontiguousarray(obj).tobytes())
+	else:
+		h.update(repr(obj).encode())
+
+
+def _hash_code(h, code):
+	r""" Add a code object, including any nested functions, to a hash
+	"""
+	h.update(code.co_code)
+	_hash_update(h, code.co_names)
+	for const in code.co_consts:
+		if hasattr(const, 'co_code'):
+			_hash_code(h, const)
+		else:
+			_hash_update(h, const)
+
+
+def _function_identity(fun):
+	r""" A string identifying a function for use as part of a cache key
+
+	Besides the name of the function, this includes a digest of its bytecode and 
+	of the values it captures in closures, so that distinct lambdas or closures
+	sharing a name do not share cache entries. Only captured numbers, strings, and arrays
+	(or tuples of these) and functions are hashed by value; 
+	other captured objects are identified by their type alone.
+	"""
+	name = getattr(fun, '__module__', '') + '.' + getattr(fun, '__qualname__', type(fun).__name__)
+	code = getattr(fun, '__code__', None)
+	if code is None:
+		return name
+
+	h = hashlib.sha256()
+	_hash_code(h, code)
+	_hash_update(h, getattr(fun, '__defaults__', None))
+	for cell in (getattr(fun, '__closure__', None) or ()):
+		try:
+			value = cell.cell_contents
+		except ValueError:
+			# An empty cell
+			value = None
+		if hasattr(value, '__code__'):
+			_hash_update(h, _function_identity(value))
+		elif _is_value(value):
+			_hash_update(h, value)
+		else:
+			_hash_update(h, type(value).__name__)
+	return name + '@' + h.hexdigest()[:16]
+
+
+def _is_value(obj):
+	if isinstance(obj, tuple):
+		return all(_is_value(item) for item in obj)
+	return obj is None or isinstance(obj, (bool, int, float, complex, str, bytes, np.ndarray, np.number))
+
+
+class FunctionCache(object):
+	r""" An on-disk cache of function values and gradients
+
+	Expensive simulations can take from seconds to days per evaluation;
+	this class stores the results of each evaluation in a SQLite database
+	so that repeated queries, e.g., when re-running a study or resuming after a crash,
+	are served from disk. Entries are keyed by a hash of
+	the input in application (unnormalized) units, the identity of the function,
+	the version string provided here, and the keyword arguments passed to the function.
+
+	The database uses write-ahead logging, so several processes on the same host
+	may read and write the same cache concurrently.
+
+	Parameters
+	----------
+	filename: str
+		Path of the SQLite database; created if it does not exist
+	version: str, optional
+		Version of the function being cached;
+		changing this invalidates all previous entries
+	timeout: float, optional
+		Time in seconds to wait for a lock held by another writer
+	"""
+	def __init__(self, filename, version = None, timeout = 60.):
+		self.filename = filename
+		self.version = version
+		self.timeout = timeout
+		self.hits = 0
+		self.misses = 0
+		self._conn = None
+
+	def __getstate__(self):
+		# SQLite connections cannot be pickled; open a new one when needed
+		state = self.__dict__.copy()
+		state['_conn'] = None
+		return state
+
+	@property
+	def conn(self):
+		if self._conn is None:
+			self._conn = sqlite3.connect(self.filename, timeout = self.timeout)
+			self._conn.execute('PRAGMA journal_mode=WAL')
+			with self._conn:
+				self._conn.execute('CREATE TABLE IF NOT EXISTS evals (key TEXT PRIMARY KEY, fx BLOB, grad BLOB)')
+		return self._conn
+
+	def close(self):
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
+
+	def key(self, identity, x, kwargs = {}):
+		r""" Key of a single evaluation
+
+		Parameters
+		----------
+		identity: str
+			Name identifying the function
+		x: array-like (m,)
+			Input in application units
+		kwargs: dict
+			Keyword arguments passed to the function
+		"""
+		h = hashlib.sha256()
+		_hash_update(h, identity)
+		_hash_update(h, self.version)
+		_hash_update(h, np.asarray(x, dtype = float).flatten())
+		_hash_update(h, kwargs)
+		return h.hexdigest()
+
+	def get(self, keys, grad = False):
+		r""" Look up a batch of entries
+
+		Parameters
+		----------
+		keys: list of str
+			Keys to query
+		grad: bool
+			If True, an entry is only a hit if its gradient is also stored
+
+		Returns
+		-------
+		fX: list
+			Function values for each key, or None if not found
+		grads: list
+			Gradients for each key, or None if not found
+		"""
+		found = {}
+		unique_keys = list(set(keys))
+		# SQLite limits the number of parameters in a single query
+		for start in range(0, len(unique_keys), 500):
+			chunk = unique_keys[start:start+500]
+			query = 'SELECT key, fx, grad FROM evals WHERE key IN (%s)' % ','.join('?'*len(chunk))
+			for key, fx, g in self.conn.execute(query, chunk):
+				found[key] = (fx, g)
+
+		fX = []
+		grads = []
+		for key in keys:
+			fx, g = found.get(key, (None, None))
+			if fx is None or (grad and g is None):
+				self.misses += 1
+			else:
+				self.hits += 1
+			fX.append(_from_blob(fx))
+			grads.append(_from_blob(g))
+		return fX, grads
+
+	def put(self, keys, fX = None, grads = None):
+		r""" Store a batch of entries
+
+		Existing values are kept if the new value is not provided;
+		i.e., adding a gradient does not remove a previously stored function value.
+
+		Parameters
+		----------
+		keys: list of str
+			Keys of the entries
+		fX: list of array-like or None
+			Function values
+		grads: list of array-like or None
+			Gradients in application units
+		"""
+		if fX is None:
+			fX = [None for key in keys]
+		if grads is None:
+			grads = [None for key in keys]
+		rows = [(key, _to_blob(fx), _to_blob(g)) for key, fx, g in zip(keys, fX, grads)]
+		with self.conn:
+			self.conn.executemany('INSERT INTO evals (key, fx, grad) VALUES (?, ?, ?) '
+				'ON CONFLICT(key) DO UPDATE SET fx = COALESCE(excluded.fx, fx), grad = COALESCE(excluded.grad, grad)', rows)
+
+	def __len__(self):
+		return self.conn.execute('SELECT COUNT(*) FROM evals').fetchone()[0]
+
+	@property
+	def stats(self):
+		r""" Number of hits and misses since this object was created and the number of entries stored
+		"""
+		return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
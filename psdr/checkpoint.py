@@ -0,0 +1,138 @@
+r""" Checkpointing long-running studies to disk
+"""
+from __future__ import print_function
+import os
+import re
+import pickle
+import tempfile
+import numpy as np
+
+__all__ = ['Checkpoint']
+
+
+def _atomic_write(filename, write):
+	r""" Write a file by writing to a temporary file in the same directory and renaming it
+
+	Readers either see the previous contents or the new contents, never a partial write.
+	"""
+	fd, tmp = tempfile.mkstemp(dir = os.path.dirname(filename), prefix = '.tmp-')
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			write(f)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, filename)
+	except BaseException:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+		raise
+
+
+class Checkpoint(object):
+	r""" Append-only on-disk storage for resuming long-running studies
+
+	A checkpoint is a directory containing two kinds of files:
+
+	* chunks of arrays (e.g., new samples :code:`X`, function values :code:`fX`, and gradients)
+	  each of which is written once and never modified, so the cost of saving
+	  is proportional to the new data rather than all data collected so far; and
+	* a small state file (e.g., the random number generator state) which is replaced on each save.
+
+	Both are written to a temporary file that is then renamed,
+	so a crash never leaves a partially written file.
+	As chunks and state are written separately, the state file also records the number of chunks
+	when it was saved; once a state has been saved, chunks appended after the most recent save 
+	are ignored when the checkpoint is reopened and overwritten by new chunks,
+	so the chunks and the state read back are always consistent.
+
+	Parameters
+	----------
+	path: str
+		Directory in which to store the checkpoint; created if it does not exist
+	"""
+	_chunk_re = re.compile(r'^chunk_(\d+)\.npz$')
+
+	def __init__(self, path):
+		self.path = os.path.abspath(path)
+		os.makedirs(self.path, exist_ok = True)
+		self._arrays = None
+		saved = self._load_state()
+		if 'nchunks' in saved:
+			self._nchunks = saved['nchunks']
+		else:
+			self._nchunks = len([f for f in os.listdir(self.path) if self._chunk_re.match(f)])
+
+	def _chunk_filename(self, i):
+		return os.path.join(self.path, 'chunk_%08d.npz' % i)
+
+	def _load_state(self):
+		try:
+			with open(os.path.join(self.path, 'state.pkl'), 'rb') as f:
+				return pickle.load(f)
+		except FileNotFoundError:
+			return {}
+
+	def append(self, **arrays):
+		r""" Append a new chunk of arrays
+
+		Arrays with the same name in different chunks are concatenated along the first axis
+		when read back.
+
+		Parameters
+		----------
+		**arrays: array-like
+			Arrays to store
+		"""
+		arrays = {name: np.asarray(value) for name, value in arrays.items()}
+		filename = self._chunk_filename(self._nchunks)
+		_atomic_write(filename, lambda f: np.savez(f, **arrays))
+		self._nchunks += 1
+		if self._arrays is not None:
+			for name, value in arrays.items():
+				self._arrays.setdefault(name, []).append(value)
+
+	def _load_arrays(self):
+		if self._arrays is None:
+			self._arrays = {}
+			for i in range(self._nchunks):
+				with np.load(self._chunk_filename(i), allow_pickle = False) as data:
+					for name in data.files:
+						self._arrays.setdefault(name, []).append(data[name])
+		return self._arrays
+
+	def __contains__(self, name):
+		return name in self._load_arrays()
+
+	def __getitem__(self, name):
+		r""" All stored values of an array concatenated along the first axis
+		"""
+		return np.concatenate(self._load_arrays()[name], axis = 0)
+
+	def get(self, name, default = None):
+		if name in self:
+			return self[name]
+		return default
+
+	@property
+	def state(self):
+		r""" The most recently saved state; an empty dictionary if none has been saved
+		"""
+		return self._load_state().get('state', {})
+
+	def save_state(self, **state):
+		r""" Replace the saved state
+
+		This also marks all chunks appended so far as part of the checkpoint.
+
+		Parameters
+		----------
+		**state:
+			Picklable objects to store
+		"""
+		saved = {'state': state, 'nchunks': self._nchunks}
+		_atomic_write(os.path.join(self.path, 'state.pkl'), lambda f: pickle.dump(saved, f))
+
+	def __len__(self):
+		r""" Number of chunks stored
+		"""
+		return self._nchunks
@@ -10,3 +10,4 @@ from .naca0012 import *
 from .beam import *
 from .hartmann import *
 from .polynomial import *
+from .benchmark import *
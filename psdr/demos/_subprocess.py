@@ -0,0 +1,104 @@
+r""" Helpers for running the Docker-based simulations as subprocesses
+"""
+from __future__ import print_function
+import asyncio
+from subprocess import Popen, PIPE, STDOUT
+
+
+def run_subprocess(args, log_filename, verbose = False):
+	r""" Run a command, appending its output to a log file
+
+	Parameters
+	----------
+	args: list of str
+		Command to run
+	log_filename: str
+		File to which stdout and stderr are appended
+	verbose: bool
+		If True, also print the output to stdout
+
+	Returns
+	-------
+	returncode: int
+		Exit code of the command
+	"""
+	# In order to run from inside jupyter, we need to call using Popen
+	# following https://github.com/takluyver/rt2-workshop-jupyter/blob/e7fde6565e28adf31a0f9003094db70c3766bd6d/Subprocess%20output.ipynb
+	with open(log_filename, 'ab') as log:
+		p = Popen(args, stdout = PIPE, stderr = STDOUT)
+		while True:
+			# Read output from pipe
+			output = p.stdout.readline()
+			log.write(output)
+
+			if verbose:
+				print(output.decode(errors = 'replace'), end ='')
+
+			# Check for termination
+			if p.poll() is not None:
+				break
+		# Flush anything remaining after the process exited
+		output = p.stdout.read()
+		log.write(output)
+		if verbose:
+			print(output.decode(errors = 'replace'), end = '')
+
+	if p.returncode != 0:
+		print("exited with error code %d" % p.returncode)
+	return p.returncode
+
+
+async def run_subprocess_async(args, log_filename, verbose = False, timeout = None, cleanup = None):
+	r""" Run a command without blocking the event loop, appending its output to a log file
+
+	Parameters
+	----------
+	args: list of str
+		Command to run
+	log_filename: str
+		File to which stdout and stderr are appended
+	verbose: bool
+		If True, also print the output to stdout
+	timeout: float, optional
+		Number of seconds after which the command is killed
+		and asyncio.TimeoutError raised
+	cleanup: list of str, optional
+		Command run after the command is killed on timeout or cancellation;
+		e.g., :code:`['docker', 'rm', '-f', name]` to stop a container that
+		keeps running after its :code:`docker run` client is killed
+
+	Returns
+	-------
+	returncode: int
+		Exit code of the command
+	"""
+	p = await asyncio.create_subprocess_exec(*args, stdout = asyncio.subprocess.PIPE,
+		stderr = asyncio.subprocess.STDOUT)
+
+	async def communicate():
+		with open(log_filename, 'ab') as log:
+			while True:
+				output = await p.stdout.readline()
+				if not output:
+					break
+				log.write(output)
+				if verbose:
+					print(output.decode(errors = 'replace'), end = '')
+		return await p.wait()
+
+	try:
+		returncode = await asyncio.wait_for(communicate(), timeout)
+	except BaseException:
+		# Don't leave the simulation running on timeout or cancellation
+		if p.returncode is None:
+			p.kill()
+			await p.wait()
+			if cleanup is not None:
+				c = await asyncio.create_subprocess_exec(*cleanup, 
+					stdout = asyncio.subprocess.DEVNULL, stderr = asyncio.subprocess.DEVNULL)
+				await c.wait()
+		raise
+
+	if returncode != 0:
+		print("exited with error code %d" % returncode)
+	return returncode
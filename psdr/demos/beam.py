@@ -80,16 +80,7 @@ class NowackiBeam(Function):
 			beam_area_ratio,
 			beam_twist_buckling,
 		]
-		grads = [
-			beam_area_grad, 
-			beam_bending_grad, 
-			beam_tip_deflect_grad, 
-			beam_bending_stress_grad,
-			beam_shear_stress_grad,
-			beam_area_ratio_grad,
-			beam_twist_buckling_grad,
-		]
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, kwargs = BEAM)		
+		Function.__init__(self, funs, domain, vectorized = True, return_grad = True, kwargs = BEAM)
 
 def build_beam_domain():
 	# Note the book has an invalid range for height "(20mm > b > 250 mm)" and breadth "(10 mm > b > 50mm)"
@@ -100,24 +91,39 @@ def build_beam_domain():
 	domain = BoxDomain([5e-3, 0.02], [50e-3,0.25], names = ['breadth (m)', 'height (m)'])
 	return domain
 
-def beam_area(X, **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	area = X[:,0]*X[:,1]
+def _beam_return(X_shape, val, grad, return_grad):
+	# Restore the shape of a single point and build the return value
 	if len(X_shape) == 1:
-		area = area[0]
-	return area
+		val = val[0]
+		if grad is not None:
+			grad = grad[0]
+	if return_grad:
+		return val, grad
+	return val
+
+def _beam_grad(b, h, db, dh, return_grad):
+	if not return_grad:
+		return None
+	grad = np.empty((len(b), 2))
+	grad[:,0] = db
+	grad[:,1] = dh
+	return grad
 
-def beam_area_grad(X, **kwargs):
+
+def beam_area(X, return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
-	grad = np.array([X[:,1], X[:,0]]).T
-	if len(X_shape) == 1:
-		grad = grad[0]
-	return grad
+	b = X[:,0]
+	h = X[:,1]
+	area = b*h
+	grad = _beam_grad(b, h, h, b, return_grad)
+	return _beam_return(X_shape, area, grad, return_grad)
+
+def beam_area_grad(X, **kwargs):
+	return beam_area(X, return_grad = True, **kwargs)[1]
 
 
-def beam_bending(X, F = BEAM['F'], L = BEAM['L'], **kwargs):
+def beam_bending(X, F = BEAM['F'], L = BEAM['L'], return_grad = False, **kwargs):
 	r""" Bending stress:
 
 	
@@ -129,23 +135,14 @@ def beam_bending(X, F = BEAM['F'], L = BEAM['L'], **kwargs):
 	# From bending.m
 	# SigmaB=(6*BeamProperties.F*BeamProperties.L)/(b*h^2);
 	bending = 6*F*L/(b*h**2)
-	if len(X_shape) == 1:
-		bending = bending[0]
-	return bending
+	grad = _beam_grad(b, h, -bending/b, -2*bending/h, return_grad)
+	return _beam_return(X_shape, bending, grad, return_grad)
 
-def beam_bending_grad(X, F = BEAM['F'], L = BEAM['L'], **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
-	# From bending.m
-	grad = np.array([-6*F*L/(b**2 * h**2), -2*6*F*L/(b * h**3)]).T
-	if len(X_shape) == 1:
-		grad = grad[0]
-	return grad
+def beam_bending_grad(X, **kwargs):
+	return beam_bending(X, return_grad = True, **kwargs)[1]
 	
 
-def beam_tip_deflect(X, F = BEAM['F'], L = BEAM['L'], E = BEAM['E'], **kwargs):
+def beam_tip_deflect(X, F = BEAM['F'], L = BEAM['L'], E = BEAM['E'], return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
 	b = X[:,0]
@@ -153,105 +150,54 @@ def beam_tip_deflect(X, F = BEAM['F'], L = BEAM['L'], E = BEAM['E'], **kwargs):
 	
 	Iy = b*h**3/12
 	delta = F*L**3/(3*E*Iy)
-	if len(X_shape) == 1:
-		delta = delta[0]
-	return delta
+	grad = _beam_grad(b, h, -delta/b, -3*delta/h, return_grad)
+	return _beam_return(X_shape, delta, grad, return_grad)
 
-def beam_tip_deflect_grad(X, F = BEAM['F'], L = BEAM['L'], E = BEAM['E'], **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
-
-	grads = np.array([
-		-4*F*L**3/(E*b**2*h**3),
-		-12*F*L**3/(E*b*h**4)
-	]).T
-	if len(X_shape) == 1:
-		grads = grads[0]
-	return grads
+def beam_tip_deflect_grad(X, **kwargs):
+	return beam_tip_deflect(X, return_grad = True, **kwargs)[1]
 
-def beam_bending_stress(X, F = BEAM['F'], L = BEAM['L'], **kwargs):
+def beam_bending_stress(X, F = BEAM['F'], L = BEAM['L'], return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
 	b = X[:,0]
 	h = X[:,1]
 
-
 	sigma_B = 6*F*L/(b*h**2)
-	if len(X_shape) == 1:
-		sigma_B = sigma_B[0]
-	return sigma_B
-
-def beam_bending_stress_grad(X, F = BEAM['F'], L = BEAM['L'], **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
+	grad = _beam_grad(b, h, -sigma_B/b, -2*sigma_B/h, return_grad)
+	return _beam_return(X_shape, sigma_B, grad, return_grad)
 
-	grads = np.array([
-		-6*F*L/(b**2*h**2),
-		-12*F*L/(b*h**3),
-	]).T	
-	if len(X_shape) == 1:
-		grads = grads[0]
-	return grads
+def beam_bending_stress_grad(X, **kwargs):
+	return beam_bending_stress(X, return_grad = True, **kwargs)[1]
 
 
-def beam_shear_stress(X, F = BEAM['F'], **kwargs):
+def beam_shear_stress(X, F = BEAM['F'], return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
 	b = X[:,0]
 	h = X[:,1]
 
-
 	sigma_Y = 3*F/(2*b*h)
-	if len(X_shape) == 1:
-		sigma_Y = sigma_Y[0]
-	return sigma_Y
+	grad = _beam_grad(b, h, -sigma_Y/b, -sigma_Y/h, return_grad)
+	return _beam_return(X_shape, sigma_Y, grad, return_grad)
 
-def beam_shear_stress_grad(X, F = BEAM['F'], **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
+def beam_shear_stress_grad(X, **kwargs):
+	return beam_shear_stress(X, return_grad = True, **kwargs)[1]
 
-	grads = np.array([
-		-3*F/(2*b**2*h),
-		-3*F/(2*b*h**2),
-	]).T	
-	if len(X_shape) == 1:
-		grads = grads[0]
-	return grads
-
-def beam_area_ratio(X, **kwargs):
+def beam_area_ratio(X, return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
 	b = X[:,0]
 	h = X[:,1]
 
 	ratio = h/b
-	if len(X_shape) == 1:
-		ratio = ratio[0]
-	return ratio
+	grad = _beam_grad(b, h, -ratio/b, 1/b, return_grad)
+	return _beam_return(X_shape, ratio, grad, return_grad)
 
 def beam_area_ratio_grad(X, **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
-
-	grads = np.array([
-		-h/b**2, 
-		1/b,
-	]).T
-
-	if len(X_shape) == 1:
-		grads = grads[0]
-	return grads
+	return beam_area_ratio(X, return_grad = True, **kwargs)[1]
 
 
-def beam_twist_buckling(X, F = BEAM['F'], L = BEAM['L'], G = BEAM['G'], E = BEAM['E'], nu = BEAM['nu'], **kwargs):
+def beam_twist_buckling(X, F = BEAM['F'], L = BEAM['L'], G = BEAM['G'], E = BEAM['E'], nu = BEAM['nu'], return_grad = False, **kwargs):
 	X_shape = X.shape
 	X = np.atleast_2d(X)
 	b = X[:,0]
@@ -261,22 +207,14 @@ def beam_twist_buckling(X, F = BEAM['F'], L = BEAM['L'], G = BEAM['G'], E = BEAM
 	I_Z = b**3*h/12
 
 	twist = (4/L**2)*np.sqrt(G*I_T*E*I_Z/(1-nu))
-	if len(X_shape) == 1:
-		twist = twist[0]
-	return twist
-
-def beam_twist_buckling_grad(X, F = BEAM['F'], L = BEAM['L'], G = BEAM['G'], E = BEAM['E'], nu = BEAM['nu'], **kwargs):
-	X_shape = X.shape
-	X = np.atleast_2d(X)
-	b = X[:,0]
-	h = X[:,1]
-
-	grads = np.array([
-		2*np.sqrt(3)*np.sqrt(E*G*b**3*h*(b**3*h/12 + b*h**3/12)/(1 - nu))*(1 - nu)*(E*G*b**3*h*(b**2*h/4 + h**3/12)/(2*(1 - nu)) + 3*E*G*b**2*h*(b**3*h/12 + b*h**3/12)/(2*(1 - nu)))/(3*E*G*L**2*b**3*h*(b**3*h/12 + b*h**3/12)),
-		2*np.sqrt(3)*np.sqrt(E*G*b**3*h*(b**3*h/12 + b*h**3/12)/(1 - nu))*(1 - nu)*(E*G*b**3*h*(b**3/12 + b*h**2/4)/(2*(1 - nu)) + E*G*b**3*(b**3*h/12 + b*h**3/12)/(2*(1 - nu)))/(3*E*G*L**2*b**3*h*(b**3*h/12 + b*h**3/12))
-	]).T
-
-	if len(X_shape) == 1:
-		grads = grads[0]
-	return grads
- 
+	grad = None
+	if return_grad:
+		# Logarithmic derivative of the square root of I_T*I_Z
+		grad = _beam_grad(b, h,
+			0.5*twist*((3*b**2*h + h**3)/(12*I_T) + 3/b),
+			0.5*twist*((b**3 + 3*b*h**2)/(12*I_T) + 1/h),
+			return_grad)
+	return _beam_return(X_shape, twist, grad, return_grad)
+
+def beam_twist_buckling_grad(X, **kwargs):
+	return beam_twist_buckling(X, return_grad = True, **kwargs)[1]
@@ -0,0 +1,74 @@
+r""" Timing the evaluation of the analytic test problems
+"""
+from __future__ import print_function
+import time
+import numpy as np
+
+from .borehole import Borehole
+from .piston import Piston
+from .otl_circuit import OTLCircuit
+from .robot_arm import RobotArm
+from .wing_weight import WingWeight
+from .golinski import GolinskiGearbox
+from .beam import NowackiBeam
+from .hartmann import HartmannMHD
+
+__all__ = ['benchmark_demos']
+
+
+def _best_time(f, repeat):
+	best = np.inf
+	for r in range(repeat):
+		start = time.perf_counter()
+		f()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def benchmark_demos(Ns = (10**3, 10**4, 10**5, 10**6), repeat = 3, funs = None, verbose = True):
+	r""" Time the evaluation of function values and gradients for the analytic demos
+
+	For each demo and each number of points N, this reports the best of several
+	wall clock times for evaluating the function, its gradient, and both at once
+	on N points sampled from the domain (in normalized coordinates).
+
+	Parameters
+	----------
+	Ns: list of int, optional
+		Number of points at which to time each demo
+	repeat: int, optional
+		Number of times each evaluation is repeated
+	funs: list of Function, optional
+		Functions to time; defaults to all the analytic demos
+	verbose: bool, optional
+		If True, print a table of timings and throughput as they are computed
+
+	Returns
+	-------
+	timings: list of dict
+		One entry for each function and N with the name of the function,
+		N, and the times in seconds for 'eval', 'grad', and 'call' (value and gradient)
+	"""
+	if funs is None:
+		funs = [Borehole(), Piston(), OTLCircuit(), RobotArm(), WingWeight(),
+			GolinskiGearbox(), NowackiBeam(), HartmannMHD()]
+
+	timings = []
+	if verbose:
+		print('%-16s %9s %10s %10s %10s %12s' % ('function', 'N', 'eval (s)', 'grad (s)', 'call (s)', 'evals/s'))
+	for fun in funs:
+		name = type(fun).__name__
+		for N in Ns:
+			X = fun.domain_norm.sample(N)
+			t = {'name': name, 'N': N}
+			t['eval'] = _best_time(lambda: fun.eval(X), repeat)
+			t['grad'] = _best_time(lambda: fun.grad(X), repeat)
+			t['call'] = _best_time(lambda: fun(X, return_grad = True), repeat)
+			timings.append(t)
+			if verbose:
+				print('%-16s %9d %10.3g %10.3g %10.3g %12.3g' % (name, N, t['eval'], t['grad'], t['call'], N/t['eval']))
+	return timings
+
+
+if __name__ == '__main__':
+	benchmark_demos()
@@ -63,10 +63,7 @@ class Borehole(Function):
 		else:
 			domain = build_borehole_uncertain_domain()
 
-		funs = [borehole]
-		grads = [borehole_grad]
-
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, dask_client = dask_client)
+		Function.__init__(self, borehole, domain, vectorized = True, return_grad = True, dask_client = dask_client)
 
 	def __str__(self):
 		return "<Borehole Function>"
@@ -106,7 +103,7 @@ def build_borehole_uncertain_domain():
 	])
 
 
-def borehole(X):
+def borehole(X, return_grad = False):
 	""" The borehole test function
 
 	See description in :meth:`psdr.demos.Borehole`
@@ -115,14 +112,18 @@ def borehole(X):
 	----------
 	X: array-like (?, 8)
 		Input in application units
+	return_grad: bool, optional
+		If True, also return the gradient 
 	
 	Return
 	------
 	y: np.ndarray (?,)
 		Output of borehole function
+	grad: np.ndarray (?, 8)
+		Gradient of the borehole function; only returned if return_grad is True
 	"""
 	import numpy as np
-	X = X.reshape(-1, 8)
+	X = np.array(X).reshape(-1, 8)
 
 	# Split the variables
 	r_w = X[:,0]
@@ -134,8 +135,28 @@ def borehole(X):
 	L   = X[:,6]
 	K_w = X[:,7]
 
-	val = 2*np.pi*T_u*(H_u - H_l)/(np.log(r/r_w)*(1 + 2*L*T_u/(np.log(r/r_w)*r_w**2*K_w) + T_u/T_l))
-	return val
+	# f = num/den where den = log(r/r_w)(1 + T_u/T_l) + 2 L T_u/(r_w^2 K_w)
+	log_r = np.log(r/r_w)
+	ratio = 1 + T_u/T_l
+	c = 2*L*T_u/(r_w**2*K_w)
+	num = 2*np.pi*T_u*(H_u - H_l)
+	den = log_r*ratio + c
+	val = num/den
+	if not return_grad:
+		return val
+
+	# Quotient rule: grad f = (grad num - f grad den)/den
+	grad = np.empty(X.shape)
+	grad[:,0] = val*(ratio/r_w + 2*c/r_w)
+	grad[:,1] = -val*ratio/r
+	grad[:,2] = 2*np.pi*(H_u - H_l) - val*(log_r/T_l + c/T_u)
+	grad[:,3] = 2*np.pi*T_u
+	grad[:,4] = val*log_r*T_u/T_l**2
+	grad[:,5] = -2*np.pi*T_u
+	grad[:,6] = -val*c/L
+	grad[:,7] = val*c/K_w
+	grad /= den[:,None]
+	return val, grad
 
 def borehole_grad(X):
 	""" The borehole test function gradient
@@ -152,28 +173,4 @@ def borehole_grad(X):
 	y: np.ndarray (?,8)
 		Gradient of borehole test function
 	"""
-	import numpy as np
-	X = np.atleast_2d(np.array(X))
-
-	# Split the variables
-	r_w = X[:,0]
-	r   = X[:,1]
-	T_u = X[:,2]
-	H_u = X[:,3]
-	T_l = X[:,4]
-	H_l = X[:,5]
-	L   = X[:,6]
-	K_w = X[:,7]
-
-	# Gradient computed analytically using Sympy
-	grad = np.vstack([
-		-2*np.pi*K_w*T_l*T_u*r_w*(H_l - H_u)*(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u*(2*np.log(r/r_w) - 1) + 2*L*T_l*T_u)/((K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2*np.log(r/r_w)),
-		2*np.pi*K_w**2*T_l*T_u*r_w**4*(H_l - H_u)*(T_l + T_u)/(r*(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2),
-		2*np.pi*K_w*T_l*r_w**2*(H_l - H_u)*(-K_w*T_l*r_w**2*np.log(r/r_w) - K_w*T_u*r_w**2*np.log(r/r_w) - 2*L*T_l*T_u + T_u*(K_w*r_w**2*np.log(r/r_w) + 2*L*T_l))/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2,
-		2*np.pi*K_w*T_l*T_u*r_w**2/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u),
-		-2*np.pi*K_w**2*T_u**2*r_w**4*(H_l - H_u)*np.log(r/r_w)/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2,
-		-2*np.pi*K_w*T_l*T_u*r_w**2/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u),
-		4*np.pi*K_w*T_l**2*T_u**2*r_w**2*(H_l - H_u)/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2,
-		-4*np.pi*L*T_l**2*T_u**2*r_w**2*(H_l - H_u)/(K_w*T_l*r_w**2*np.log(r/r_w) + K_w*T_u*r_w**2*np.log(r/r_w) + 2*L*T_l*T_u)**2,
-		]).T
-	return grad
+	return borehole(X, return_grad = True)[1]
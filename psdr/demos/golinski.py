@@ -68,20 +68,7 @@ class GolinskiGearbox(Function):
 				golinski_constraint24,
 				golinski_constraint25,
 				]	
-		grads = [golinski_volume_grad,
-				golinski_constraint1_grad,
-				golinski_constraint2_grad,
-				golinski_constraint3_grad,
-				golinski_constraint4_grad,
-				golinski_constraint5_grad,
-				golinski_constraint6_grad,
-				golinski_constraint7_grad,
-				golinski_constraint8_grad,
-				golinski_constraint9_grad,
-				golinski_constraint24_grad,
-				golinski_constraint25_grad,
-				]
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, dask_client = dask_client)
+		Function.__init__(self, funs, domain, vectorized = True, return_grad = True, dask_client = dask_client)
 	
 	def __str__(self):
 		return "<Golinski Gearbox Function>"
@@ -116,205 +103,196 @@ def expand_variables(x):
 
 
 
+def _zero_grad(x1):
+	# Gradient with respect to the six (non-integer) variables 
+	return np.zeros((len(x1), 6))
+
 def golinski_volume(x, return_grad = False):
 	""" Volume (objective function) for Golinski Gearbox test problem
 	"""
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
 
-	return 0.7854*x1*x2**2*( 3.3333*x3**2 + 14.9334*x3 - 43.0934) \
+	c = 3.3333*x3**2 + 14.9334*x3 - 43.0934
+	val = 0.7854*x1*x2**2*c \
 		-1.5079*x1*(x6**2 + x7**2) + 7.477*(x6**3 + x7**3) + 0.7854*(x4*x6**2 + x5*x7**2)
+	if not return_grad:
+		return val
+
+	grad = np.empty((len(x1), 6))
+	grad[:,0] = 0.7854*x2**2*c - 1.5079*(x6**2 + x7**2)
+	grad[:,1] = 1.5708*x1*x2*c
+	grad[:,2] = 0.7854*x6**2
+	grad[:,3] = 0.7854*x7**2
+	grad[:,4] = -3.0158*x1*x6 + 1.5708*x4*x6 + 22.431*x6**2
+	grad[:,5] = -3.0158*x1*x7 + 1.5708*x5*x7 + 22.431*x7**2
+	return val, grad
 	
 
 def golinski_volume_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-		
-	# Gradient as computed symbolically using Sympy
-	return np.vstack([
-			0.7854*x2**2*(3.3333*x3**2 + 14.9334*x3 - 43.0934) - 1.5079*x6**2 - 1.5079*x7**2,
-			1.5708*x1*x2*(3.3333*x3**2 + 14.9334*x3 - 43.0934),
-			0.7854*x6**2,
-			0.7854*x7**2,
-			-3.0158*x1*x6 + 1.5708*x4*x6 + 22.431*x6**2,
-			-3.0158*x1*x7 + 1.5708*x5*x7 + 22.431*x7**2,]).T
+	return golinski_volume(x, return_grad = True)[1]
 	
 
-def golinski_constraint1(x):
+def golinski_constraint1(x, return_grad = False):
 	""" First constraint from the Golinski Gearbox problem
 	"""
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return 27/(x1*x2**2*x3) - 1
+	t = 27/(x1*x2**2*x3)
+	if not return_grad:
+		return t - 1
+	grad = _zero_grad(x1)
+	grad[:,0] = -t/x1
+	grad[:,1] = -2*t/x2
+	return t - 1, grad
 
 def golinski_constraint1_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			-27/(x1**2*x2**2*x3),
-			-54/(x1*x2**3*x3),
-			0*x1,
-			0*x1,
-			0*x1,
-			0*x1,
-		]).T
-
-def golinski_constraint2(x):
+	return golinski_constraint1(x, return_grad = True)[1]
+
+def golinski_constraint2(x, return_grad = False):
 	"""Second constraint from the Golinski Gearbox problem
 	"""
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return 397.5/(x1*x2**2*x3**2) - 1
+	t = 397.5/(x1*x2**2*x3**2)
+	if not return_grad:
+		return t - 1
+	grad = _zero_grad(x1)
+	grad[:,0] = -t/x1
+	grad[:,1] = -2*t/x2
+	return t - 1, grad
 
 def golinski_constraint2_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	
-	return np.vstack([
-			-397.5/(x1**2*x2**2*x3**2),
-			-795.0/(x1*x2**3*x3**2),
-			0*x1,
-			0*x1,
-			0*x1,
-			0*x1,
-		]).T
-
-def golinski_constraint3(x):
+	return golinski_constraint2(x, return_grad = True)[1]
+
+def golinski_constraint3(x, return_grad = False):
 	"""Third constraint from the Golinski Gearbox problem
 	"""
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return 1.93/(x2*x3*x6**4)*x4**3 - 1.
+	t = 1.93/(x2*x3*x6**4)*x4**3
+	if not return_grad:
+		return t - 1.
+	grad = _zero_grad(x1)
+	grad[:,1] = -t/x2
+	grad[:,2] = 3*t/x4
+	grad[:,4] = -4*t/x6
+	return t - 1., grad
 
 def golinski_constraint3_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1,
-			-1.93*x4**3/(x2**2*x3*x6**4),
-			5.79*x4**2/(x2*x3*x6**4),
-			0*x1,
-			-7.72*x4**3/(x2*x3*x6**5),
-			0*x1,
-		]).T
+	return golinski_constraint3(x, return_grad = True)[1]
 	
 
-def golinski_constraint4(x):
+def golinski_constraint4(x, return_grad = False):
 	"""Fourth constraint from the Golinski Gearbox problem
 	"""
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return 1.93/(x2*x3*x7**4)*x5**3 - 1.
+	t = 1.93/(x2*x3*x7**4)*x5**3
+	if not return_grad:
+		return t - 1.
+	grad = _zero_grad(x1)
+	grad[:,1] = -t/x2
+	grad[:,3] = 3*t/x5
+	grad[:,5] = -4*t/x7
+	return t - 1., grad
 
 def golinski_constraint4_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1,
-			-1.93*x5**3/(x2**2*x3*x7**4),
-			0*x1,
-			5.79*x5**2/(x2*x3*x7**4),
-			0*x1,
-			-7.72*x5**3/(x2*x3*x7**5),	
-		]).T
+	return golinski_constraint4(x, return_grad = True)[1]
 	
 
-def golinski_constraint5(x):
+def golinski_constraint5(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.sqrt( (745*x4/x2/x3)**2 + 16.9e6)/(110.0*x6**3) - 1.
+	s = np.sqrt( (745*x4/x2/x3)**2 + 16.9e6)
+	t = s/(110.0*x6**3)
+	if not return_grad:
+		return t - 1.
+	grad = _zero_grad(x1)
+	# d s/d x4 = (745/(x2 x3))^2 x4/s
+	ds = (745/(x2*x3))**2*x4/s
+	grad[:,1] = -ds*x4/x2/(110.0*x6**3)
+	grad[:,2] = ds/(110.0*x6**3)
+	grad[:,4] = -3*t/x6
+	return t - 1., grad
 	
 def golinski_constraint5_grad(x):
+	return golinski_constraint5(x, return_grad = True)[1]
+
+def golinski_constraint6(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1,
-			-5045.68181818182*x4**2/(x2**3*x3**2*x6**3*np.sqrt(16900000.0 + 555025*x4**2/(x2**2*x3**2))),
-			5045.68181818182*x4/(x2**2*x3**2*x6**3*np.sqrt(16900000.0 + 555025*x4**2/(x2**2*x3**2))),
-			0*x1,
-			-0.0272727272727273*np.sqrt(16900000.0 + 555025*x4**2/(x2**2*x3**2))/x6**4,
-			0*x1,
-		]).T
-
-def golinski_constraint6(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.sqrt( (745*x5/x2/x3)**2 + 157.5e6)/(85.0*x7**3) - 1.
+	s = np.sqrt( (745*x5/x2/x3)**2 + 157.5e6)
+	t = s/(85.0*x7**3)
+	if not return_grad:
+		return t - 1.
+	grad = _zero_grad(x1)
+	ds = (745/(x2*x3))**2*x5/s
+	grad[:,1] = -ds*x5/x2/(85.0*x7**3)
+	grad[:,3] = ds/(85.0*x7**3)
+	grad[:,5] = -3*t/x7
+	return t - 1., grad
 
 def golinski_constraint6_grad(x):
+	return golinski_constraint6(x, return_grad = True)[1]
+
+def golinski_constraint7(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1, 
-			-6529.70588235294*x5**2/(x2**3*x3**2*x7**3*np.sqrt(157500000.0 + 555025*x5**2/(x2**2*x3**2))),
-			0*x1, 
-			6529.70588235294*x5/(x2**2*x3**2*x7**3*np.sqrt(157500000.0 + 555025*x5**2/(x2**2*x3**2))),
-			0*x1,
-			-0.0352941176470588*np.sqrt(157500000.0 + 555025*x5**2/(x2**2*x3**2))/x7**4,
-		]).T
-
-def golinski_constraint7(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return x2*x3/40 - 1.
+	val = x2*x3/40 - 1.
+	if not return_grad:
+		return val
+	grad = _zero_grad(x1)
+	grad[:,1] = x3/40
+	return val, grad
 
 def golinski_constraint7_grad(x):
+	return golinski_constraint7(x, return_grad = True)[1]
+
+def golinski_constraint8(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return  np.vstack([
-			0*x1,
-			x3/40,
-			0*x1,	# This is constant because it is the integer value
-			0*x1,
-			0*x1,
-			0*x1,
-		]).T
-
-def golinski_constraint8(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return 5*x2/x1 - 1.
+	val = 5*x2/x1 - 1.
+	if not return_grad:
+		return val
+	grad = _zero_grad(x1)
+	grad[:,0] = -5*x2/x1**2
+	grad[:,1] = 5/x1
+	return val, grad
 
 def golinski_constraint8_grad(x):
+	return golinski_constraint8(x, return_grad = True)[1]
+
+def golinski_constraint9(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return  np.vstack([
-			-5*x2/x1**2,
-			5/x1,
-			0*x1,
-			0*x1,
-			0*x1,
-			0*x1,
-		]).T
-
-def golinski_constraint9(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return x1/(12*x2) - 1.
+	val = x1/(12*x2) - 1.
+	if not return_grad:
+		return val
+	grad = _zero_grad(x1)
+	grad[:,0] = 1/(12*x2)
+	grad[:,1] = -x1/(12*x2**2)
+	return val, grad
 
 def golinski_constraint9_grad(x):
+	return golinski_constraint9(x, return_grad = True)[1]
+
+def golinski_constraint24(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			1/(12*x2),
-			-x1/(12*x2**2),
-			0*x1,
-			0*x1,
-			0*x1,
-			0*x1,
-		]).T
-
-def golinski_constraint24(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return (1.5*x6 + 1.9)/x4 - 1.
+	val = (1.5*x6 + 1.9)/x4 - 1.
+	if not return_grad:
+		return val
+	grad = _zero_grad(x1)
+	grad[:,2] = -(1.5*x6 + 1.9)/x4**2
+	grad[:,4] = 1.5/x4
+	return val, grad
 
 def golinski_constraint24_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1,
-			0*x1,
-			-(1.5*x6 + 1.9)/x4**2,
-			0*x1,
-			1.5/x4,
-			0*x1,
-		]).T
+	return golinski_constraint24(x, return_grad = True)[1]
 	
 
-def golinski_constraint25(x):
+def golinski_constraint25(x, return_grad = False):
 	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return (1.1*x7 + 1.9)/x5 - 1.
+	val = (1.1*x7 + 1.9)/x5 - 1.
+	if not return_grad:
+		return val
+	grad = _zero_grad(x1)
+	grad[:,3] = -(1.1*x7 + 1.9)/x5**2
+	grad[:,5] = 1.1/x5
+	return val, grad
 	
 def golinski_constraint25_grad(x):
-	x1, x2, x3, x4, x5, x6, x7 = expand_variables(x)
-	return np.vstack([
-			0*x1,
-			0*x1,
-			0*x1,
-			-(1.1*x7 + 1.9)/x5**2,
-			0*x1,
-			1.1/x5,
-		]).T
-	return val, grad
+	return golinski_constraint25(x, return_grad = True)[1]
 
 # Units of cm
 def build_golinski_design_domain():
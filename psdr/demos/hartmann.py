@@ -22,8 +22,7 @@ class HartmannMHD(Function):
 	def __init__(self):
 		domain = build_hartmann_domain()
 		funs = [u_ave, Bind]
-		grads = [u_ave_grad, Bind_grad]
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True)
+		Function.__init__(self, funs, domain, vectorized = True, return_grad = True)
 
 	def __str__(self):
 		return "<Hartmann MHD Test Functions>"
@@ -41,7 +40,7 @@ def build_hartmann_domain():
 		])
 
 
-def u_ave(X):
+def u_ave(X, return_grad = False):
 	X = np.atleast_2d(X)
 	mu = X[:,0]
 	dpdx = X[:,1]
@@ -49,27 +48,28 @@ def u_ave(X):
 	B0 = X[:,3]
 	ell = 1 # defined right under subsec 4.1 in GCSW17
 
-	u_ave = -dpdx*eta/B0**2*(1 - B0*ell/np.sqrt(eta*mu)/np.tanh(B0*ell/np.sqrt(eta*mu)))
-
-	return u_ave
+	# Hartmann number
+	Ha = B0*ell/np.sqrt(eta*mu)
+	coth = 1/np.tanh(Ha)
+	g = 1 - Ha*coth
+	u_ave = -dpdx*eta/B0**2*g
+	if not return_grad:
+		return u_ave
+
+	# Derivative of u_ave with respect to the Hartmann number
+	du = -dpdx*eta/B0**2*(Ha/np.sinh(Ha)**2 - coth)
+	grad = np.empty(X.shape)
+	grad[:,0] = -du*Ha/(2*mu)
+	grad[:,1] = -eta/B0**2*g
+	grad[:,2] = u_ave/eta - du*Ha/(2*eta)
+	grad[:,3] = -2*u_ave/B0 + du*Ha/B0
+	return u_ave, grad
 
 def u_ave_grad(X):
-	X = np.atleast_2d(X)
-	mu = X[:,0]
-	dpdx = X[:,1]
-	eta = X[:,2]
-	B0 = X[:,3]
-	ell = 1 # defined right under subsec 4.1 in GCSW17
+	return u_ave(X, return_grad = True)[1]
 
-	return np.vstack([
-		-dpdx*eta*(-B0**2*ell**2*1/(eta*mu)/(2*mu*np.sinh(B0*ell/np.sqrt(eta*mu))**2) + B0*ell/np.tanh(B0*ell/np.sqrt(eta*mu))/(2*mu*np.sqrt(eta*mu)))/B0**2,
-		-eta*(-B0*ell/np.tanh(B0*ell/np.sqrt(eta*mu))/np.sqrt(eta*mu) + 1)/B0**2,
-		-dpdx*eta*(-B0**2*ell**2*1/(eta*mu)/(2*eta*np.sinh(B0*ell/np.sqrt(eta*mu))**2) + B0*ell/np.tanh(B0*ell/np.sqrt(eta*mu))/(2*eta*np.sqrt(eta*mu)))/B0**2 - dpdx*(-B0*ell/np.tanh(B0*ell/np.sqrt(eta*mu))/np.sqrt(eta*mu) + 1)/B0**2,
-		-dpdx*eta*(B0*ell**2*(1/(eta*mu))/np.sinh(B0*ell/np.sqrt(eta*mu))**2 - ell/np.tanh(B0*ell/np.sqrt(eta*mu))/np.sqrt(eta*mu))/B0**2 + 2*dpdx*eta*(-B0*ell/np.tanh(B0*ell/np.sqrt(eta*mu))/np.sqrt(eta*mu) + 1)/B0**3
-	]).T	
 
-
-def Bind(X):
+def Bind(X, return_grad = False):
 	X = np.atleast_2d(X)
 	mu = X[:,0]
 	dpdx = X[:,1]
@@ -77,22 +77,25 @@ def Bind(X):
 	B0 = X[:,3]
 	ell = 1 # defined right under subsec 4.1 in GCSW17
 	mu0 = 1 
-	Bind = dpdx*(ell*mu0/(2*B0))*(1 - 2*np.sqrt(eta*mu)/(B0*ell)*np.tanh(B0*ell/(2*np.sqrt(eta*mu))))
-	return Bind
+	
+	# Half the Hartmann number
+	c = B0*ell/(2*np.sqrt(eta*mu))
+	tanh = np.tanh(c)
+	k = 1 - tanh/c
+	scale = dpdx*(ell*mu0/(2*B0))
+	Bind = scale*k
+	if not return_grad:
+		return Bind
+
+	# Derivative of Bind with respect to c
+	dB = scale*((tanh/c - (1 - tanh**2))/c)
+	grad = np.empty(X.shape)
+	grad[:,0] = -dB*c/(2*mu)
+	grad[:,1] = ell*mu0/(2*B0)*k
+	grad[:,2] = -dB*c/(2*eta)
+	grad[:,3] = -Bind/B0 + dB*c/B0
+	return Bind, grad
 
 
 def Bind_grad(X):
-	X = np.atleast_2d(X)
-	mu = X[:,0]
-	dpdx = X[:,1]
-	eta = X[:,2]
-	B0 = X[:,3]
-	ell = 1 # defined right under subsec 4.1 in GCSW17
-	mu0 = 1
-
-	return np.vstack([
-		dpdx*ell*mu0*((-np.tanh(B0*ell/(2*np.sqrt(eta*mu)))**2 + 1)/(2*mu) - np.sqrt(eta*mu)*np.tanh(B0*ell/(2*np.sqrt(eta*mu)))/(B0*ell*mu))/(2*B0),
-		ell*mu0*(1 - 2*np.sqrt(eta*mu)*np.tanh(B0*ell/(2*np.sqrt(eta*mu)))/(B0*ell))/(2*B0),
-		dpdx*ell*mu0*((-np.tanh(B0*ell/(2*np.sqrt(eta*mu)))**2 + 1)/(2*eta) - np.sqrt(eta*mu)*np.tanh(B0*ell/(2*np.sqrt(eta*mu)))/(B0*ell*eta))/(2*B0),
-		dpdx*ell*mu0*(-(-np.tanh(B0*ell/(2*np.sqrt(eta*mu)))**2 + 1)/B0 + 2*np.sqrt(eta*mu)*np.tanh(B0*ell/(2*np.sqrt(eta*mu)))/(B0**2*ell))/(2*B0) - dpdx*ell*mu0*(1 - 2*np.sqrt(eta*mu)*np.tanh(B0*ell/(2*np.sqrt(eta*mu)))/(B0*ell))/(2*B0**2)
-	]).T 
+	return Bind(X, return_grad = True)[1]
@@ -6,7 +6,7 @@ This borrows code by Rick Fenrich
 """
 from __future__ import print_function
 import numpy as np
-from psdr import Function
+from psdr import Function, DockerRunner
 from ._multif_domains3d import buildDesignDomain, buildRandomDomain
 
 
@@ -68,6 +68,11 @@ class MULTIF(Function):
 		If True, print the output of running MULTI-F to stdout
 	dask_client: dask.distributed.Client or None
 		If specified, allows distributed computation with this function.
+	runner: SimulationRunner or None
+		If specified, evaluate the function using this runner;
+		e.g., :meth:`multif_runner` to reuse Docker containers between evaluations
+		or a :class:`psdr.LocalRunner` wrapping a surrogate to test a pipeline without Docker.
+		Cannot be combined with dask_client.
 
 	References
 	----------
@@ -78,7 +83,7 @@ class MULTIF(Function):
 
 	""" 
 	def __init__(self, truncate = 1e-7, level = 0, su2_maxiter = 5000, workdir = None,
-		dask_client = None, **kwargs):
+		dask_client = None, runner = None, **kwargs):
 		self.design_domain_app = buildDesignDomain(output = 'none', solver = 'CVXOPT')
 		self.design_domain_norm = self.design_domain_app.normalized_domain()
 		self.design_domain = self.design_domain_norm		
@@ -88,7 +93,13 @@ class MULTIF(Function):
 		self.random_domain = self.random_domain_norm		
 
 		domain = self.design_domain_app * self.random_domain_app
-		Function.__init__(self, multif, domain, vectorized = False, dask_client = dask_client, kwargs = kwargs )
+		if runner is not None:
+			if dask_client is not None:
+				raise ValueError("Specify either a runner or a dask_client, not both")
+			Function.__init__(self, runner, domain, vectorized = True, kwargs = kwargs)
+		else:
+			Function.__init__(self, multif, domain, vectorized = False, dask_client = dask_client, kwargs = kwargs,
+				afuns = multif_async)
 
 	def __str__(self):
 		return "<MULTI-F Function>"
@@ -105,40 +116,16 @@ def build_multif_random_domain(truncate = 1e-7):
 	return buildRandomDomain(truncate = truncate, **kwargs)
 
 
-def multif(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None, 
-	keep_data = False, verbose = False, cores = None):
-	"""
-
-
-	*NOTE*:	prior to running, install Docker and then pull the image for multif:
-
-	    >> docker pull jeffreyhokanson/multif:v25
-
-
-	Parameters
-	----------
-	x: np.array(136)
-		Input coordinates to MULTI-F in the application domain
-
-	level: int
-		Level of MULTIF to run, one of 0-13 inclusive
-
-	su2_maxiter: None or int
-		Maximum number of iterations to run only for levels 2-13;
-		default = 5000
-
-	workdir: string or None
-		If None, create a tempory file 
-	
-	keep_data: bool
-		If true, do not delete the directory containing intermediate results
+def _multif_setup(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None, 
+	keep_data = False, cores = None):
+	r""" Write the inputs for a MULTI-F run and construct the command to run it
 
+	The container is given a unique name so that it can be removed if the run is abandoned.
 	"""
 	# If we use this inside the RedisPool, we need to load the modules
 	# internal to this file
-	import shutil, subprocess, os, tempfile, shlex, platform
+	import shutil, os, tempfile, shlex, platform, uuid
 	import numpy as np
-	from subprocess import Popen, PIPE, STDOUT
 
 	if workdir is None:
 		# Docker cannot access /var by default, so we move the temporary file to
@@ -153,62 +140,57 @@ def multif(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None,
 		workdir = os.path.abspath(workdir)
 		os.makedirs(workdir)
 		
+	_multif_write_input(workdir, x, version = version, su2_maxiter = su2_maxiter)
+	
+	# Now call multif
+	uid = os.getuid()
+	# We specify the user ID so we can later delete the results by the local user 
+	name = 'psdr-multif-%s' % uuid.uuid4().hex
+	call = 'docker run -t --rm --name %s --mount type=bind,source="%s",target="/workdir" --workdir /workdir --user %d' % (name, workdir, uid)
+	call += ' jeffreyhokanson/multif:%s' % (version,)
+	return workdir, shlex.split(call) + _multif_command('/workdir', level = level, cores = cores), name
+
+
+def _multif_write_input(jobdir, x, version = 'v25', su2_maxiter = None, **kwargs):
+	import shutil, os
+	import numpy as np
 	# Copy the configuration file	
 	dir_path = os.path.dirname(os.path.realpath(__file__))
-	shutil.copyfile('%s/multif/general-3d.cfg.%s' % (dir_path, version,), workdir + '/general-3d.cfg')
+	shutil.copyfile('%s/multif/general-3d.cfg.%s' % (dir_path, version,), jobdir + '/general-3d.cfg')
 	
 	# If provided a maximum number of SU2 iterations, set that value
 	if su2_maxiter is not None:
-		with open(workdir + '/general-3d.cfg', 'a') as config:
+		with open(jobdir + '/general-3d.cfg', 'a') as config:
 			config.write("SU2_MAX_ITERATIONS=%d" % su2_maxiter)
 
 	# Copy the input parameters 
-	np.savetxt(workdir + '/general-3d.in', x.reshape(-1,1), fmt = '%.15e')
-	
-	# Now call multif
-	uid = os.getuid()
-	# We specify the user ID so we can later delete the results by the local user 
-	call = 'docker run -t --rm --mount type=bind,source="%s",target="/workdir" --workdir /workdir --user %d' % (workdir, uid)
-	call += ' jeffreyhokanson/multif:%s' % (version,)
-	call += " -f general-3d.cfg -l %d " % (level,)
+	np.savetxt(jobdir + '/general-3d.in', x.reshape(-1,1), fmt = '%.15e')
+
+
+def _multif_command(jobdir, level = 0, cores = None, **kwargs):
+	args = ['-f', 'general-3d.cfg', '-l', '%d' % level]
 	if cores is not None:
 		# This seems to work on Linux
-		#raise NotImplementedError("Haven't figured out how to run docker in parallel")
-		call += ' -c %d ' % (cores,)
-
-	# In order to run from inside jupyter, we need to call using Popen
-	# following https://github.com/takluyver/rt2-workshop-jupyter/blob/e7fde6565e28adf31a0f9003094db70c3766bd6d/Subprocess%20output.ipynb
-	args = shlex.split(call)
-	with open(workdir + '/output.log', 'ab') as log:
-		p = Popen(args, stdout = PIPE, stderr = STDOUT)
-		while True:
-			# Read output from pipe
-			# TODO: this should buffer to end of line rather than fixed size
-			output = p.stdout.readline()
-			log.write(output)
-
-			if verbose:
-				print(output, end ='')
-
-			# Check for termination
-			if p.poll() is not None:
-				break
-		if p.returncode != 0:
-			print("exited with error code %d" % p.returncode)
-
-	#if verbose:		
-	#	return_code = subprocess.call(call, shell = True)
-	#else:
-	#	with open(workdir + '/output.log', 'a') as output:
-	#		return_code = subprocess.call(call, shell = True, stdout = output, stderr = output)
-
-	# Now read output
-	with open(workdir + '/results.out') as f:
+		args += ['-c', '%d' % cores]
+	return args
+
+
+def _multif_read_output(jobdir, **kwargs):
+	import numpy as np
+	with open(jobdir + '/results.out') as f:
 		output = []
 		for line in f:
 			value, name = line.split()
 			output.append(float(value))
-	fx = np.array(output)
+	return np.array(output)
+
+
+def _multif_output(workdir, keep_data = False):
+	r""" Read the outputs of a MULTI-F run
+	"""
+	import shutil
+
+	fx = _multif_read_output(workdir)
 
 	# delete the output if we're not keeping it 
 	if not keep_data:
@@ -217,6 +199,86 @@ def multif(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None,
 	return fx
 
 
+def multif_runner(version = 'v25', **kwargs):
+	r""" A runner for MULTI-F that reuses Docker containers between evaluations
+
+	Parameters
+	----------
+	version: str, optional
+		Version of the jeffreyhokanson/multif Docker image
+	**kwargs:
+		Arguments of :class:`psdr.DockerRunner`; e.g., the number of workers,
+		timeout, and number of retries
+
+	Returns
+	-------
+	runner: DockerRunner
+		Runner for use with :class:`MULTIF`
+	"""
+	return DockerRunner('jeffreyhokanson/multif:%s' % version, _multif_write_input, 
+		_multif_command, _multif_read_output, **kwargs)
+
+
+def multif(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None, 
+	keep_data = False, verbose = False, cores = None):
+	"""
+
+
+	*NOTE*:	prior to running, install Docker and then pull the image for multif:
+
+	    >> docker pull jeffreyhokanson/multif:v25
+
+
+	Parameters
+	----------
+	x: np.array(136)
+		Input coordinates to MULTI-F in the application domain
+
+	level: int
+		Level of MULTIF to run, one of 0-13 inclusive
+
+	su2_maxiter: None or int
+		Maximum number of iterations to run only for levels 2-13;
+		default = 5000
+
+	workdir: string or None
+		If None, create a tempory file 
+	
+	keep_data: bool
+		If true, do not delete the directory containing intermediate results
+
+	"""
+	from psdr.demos._subprocess import run_subprocess
+
+	workdir, args, name = _multif_setup(x, level = level, version = version, su2_maxiter = su2_maxiter, 
+		workdir = workdir, keep_data = keep_data, cores = cores)
+	run_subprocess(args, workdir + '/output.log', verbose = verbose)
+	return _multif_output(workdir, keep_data = keep_data)
+
+
+async def multif_async(x, level = 0, version = 'v25', su2_maxiter = None, workdir = None, 
+	keep_data = False, verbose = False, cores = None, timeout = None):
+	r""" Run MULTI-F at a single point without blocking the event loop
+
+	Identical to :code:`multif`, but the Docker container runs as an asyncio subprocess
+	so many simulations can run concurrently from a single thread; 
+	if :code:`timeout` seconds elapse, the container is killed and asyncio.TimeoutError raised.
+	"""
+	import shutil
+	from psdr.demos._subprocess import run_subprocess_async
+
+	workdir, args, name = _multif_setup(x, level = level, version = version, su2_maxiter = su2_maxiter, 
+		workdir = workdir, keep_data = keep_data, cores = cores)
+	try:
+		await run_subprocess_async(args, workdir + '/output.log', verbose = verbose, timeout = timeout,
+			cleanup = ['docker', 'rm', '-f', name])
+	except BaseException:
+		if not keep_data:
+			shutil.rmtree(workdir, ignore_errors = True)
+		raise
+	return _multif_output(workdir, keep_data = keep_data)
+
+
 level_names = ["NONIDEALNOZZLE,1e-8,AEROTHERMOSTRUCTURAL,LINEAR,0.01",
 		 "NONIDEALNOZZLE,1e-8,AEROTHERMOSTRUCTURAL,NONLINEAR,0.4",
 		"EULER,2D,COARSE,AEROTHERMOSTRUCTURAL,LINEAR,0.01",
@@ -1,9 +1,9 @@
 from __future__ import print_function
 import numpy as np
 
-from psdr import Function, BoxDomain
+from psdr import Function, BoxDomain, DockerRunner
 
-__all__ = ['NACA0012']
+__all__ = ['NACA0012', 'naca0012_runner']
 
 class NACA0012(Function):
 	r""" The lift and drag of a NACA0012 airfoil perturbed by Hicks-Henne bump functions
@@ -23,16 +23,27 @@ class NACA0012(Function):
 		Number of bump functions for the upper surface
 	fraction: float, optional (default:0.01)
 		 
+	runner: SimulationRunner, optional
+		If provided, evaluate the function using this runner;
+		e.g., :meth:`naca0012_runner` to reuse Docker containers between evaluations
+		or a :class:`psdr.LocalRunner` wrapping a surrogate to test a pipeline without Docker.
+		Otherwise, each evaluation starts a new Docker container.
+		Cannot be combined with dask_client.
 
 	References
 	----------
 	.. [SU2] https://su2code.github.io/	
 	"""
-	def __init__(self, n_lower = 10, n_upper = 10, fraction = 0.01, dask_client = None, **kwargs):
+	def __init__(self, n_lower = 10, n_upper = 10, fraction = 0.01, dask_client = None, runner = None, **kwargs):
 		domain = build_hicks_henne_domain(n_lower, n_upper, fraction = fraction)
 		kwargs.update({'n_lower':n_lower, 'n_upper':n_upper}) 
-		Function.__init__(self, naca0012_func, domain, vectorized = False,
-			kwargs = kwargs, dask_client = dask_client, return_grad = True)
+		if runner is not None:
+			if dask_client is not None:
+				raise ValueError("Specify either a runner or a dask_client, not both")
+			Function.__init__(self, runner, domain, vectorized = True, kwargs = kwargs, return_grad = True)
+		else:
+			Function.__init__(self, naca0012_func, domain, vectorized = False,
+				kwargs = kwargs, dask_client = dask_client, return_grad = True, afuns = naca0012_func_async)
 
 
 def build_hicks_henne_domain(n_lower = 10, n_upper = 10, fraction = 0.1):
@@ -42,19 +53,16 @@ def build_hicks_henne_domain(n_lower = 10, n_upper = 10, fraction = 0.1):
 	return dom
 
 
-def naca0012_func(x, version = 'v1', workdir = None, verbose = False, 
-	keep_data = False, n_lower = 10, n_upper = 10, return_grad = False, maxiter = 1000,
-	nprocesses = 1):
-	r"""
-
-
+def _naca0012_setup(x, version = 'v1', workdir = None, keep_data = False, n_lower = 10, n_upper = 10, 
+	return_grad = False, maxiter = 1000, nprocesses = 1):
+	r""" Write the inputs for a NACA0012 run and construct the command to run it
 
+	The container is given a unique name so that it can be removed if the run is abandoned.
 	"""
 	# If we use this inside the RedisPool, we need to load the modules
 	# internal to this file
-	import shutil, subprocess, os, tempfile, shlex, platform
+	import os, tempfile, shlex, platform, uuid
 	import numpy as np
-	from subprocess import Popen, PIPE, STDOUT
 
 	if workdir is None:
 		# Docker cannot access /var by default, so we move the temporary file to
@@ -68,44 +76,107 @@ def naca0012_func(x, version = 'v1', workdir = None, verbose = False,
 		workdir = os.path.abspath(workdir)
 		os.makedirs(workdir)
 
-	# Copy the inputs to a file
-	np.savetxt(workdir + '/my.input', x, fmt = '%.15e')
+	_naca0012_write_input(workdir, x)
 	
-	call = "docker run -t --rm --mount  type=bind,source='%s',target='/workdir' jeffreyhokanson/naca0012:%s /workdir/my.input" % (workdir, version)
-	call += " --nlower %d --nupper %d" % (n_lower, n_upper)
+	name = 'psdr-naca0012-%s' % uuid.uuid4().hex
+	call = "docker run -t --rm --name %s --mount  type=bind,source='%s',target='/workdir' jeffreyhokanson/naca0012:%s" % (name, workdir, version)
+	args = shlex.split(call) + _naca0012_command('/workdir', n_lower = n_lower, n_upper = n_upper,
+		return_grad = return_grad, maxiter = maxiter, nprocesses = nprocesses)
+	return workdir, args, name
+
+
+def _naca0012_write_input(jobdir, x, **kwargs):
+	import numpy as np
+	# Copy the inputs to a file
+	np.savetxt(jobdir + '/my.input', x, fmt = '%.15e')
+
+
+def _naca0012_command(jobdir, n_lower = 10, n_upper = 10, return_grad = False, maxiter = 1000, 
+	nprocesses = 1, **kwargs):
+	args = [jobdir + '/my.input', '--nlower', '%d' % n_lower, '--nupper', '%d' % n_upper]
 	if return_grad:
-		call += " --adjoint discrete"
-	call += ' --maxiter %d' % maxiter
-	call += ' --nprocesses %d' % nprocesses
-	args = shlex.split(call)
-	with open(workdir + '/output.log', 'ab') as log:
-		p = Popen(args, stdout = PIPE, stderr = STDOUT)
-		while True:
-			# Read output from pipe
-			# TODO: this should buffer to end of line rather than fixed size
-			output = p.stdout.readline()
-			log.write(output)
-
-			if verbose:
-				print(output, end ='')
-
-			# Check for termination
-			if p.poll() is not None:
-				break
-		if p.returncode != 0:
-			print("exited with error code %d" % p.returncode)
-
-	fx = np.loadtxt(workdir + '/my.output')
+		args += ['--adjoint', 'discrete']
+	args += ['--maxiter', '%d' % maxiter]
+	args += ['--nprocesses', '%d' % nprocesses]
+	return args
+
 
+def _naca0012_read_output(jobdir, return_grad = False, **kwargs):
+	import numpy as np
+	fx = np.loadtxt(jobdir + '/my.output')
 	if return_grad:
-		grad = np.loadtxt(workdir + '/my_grad.output')
+		grad = np.loadtxt(jobdir + '/my_grad.output')
+		return fx, grad
+	return fx
+
+
+def _naca0012_output(workdir, keep_data = False, return_grad = False):
+	r""" Read the outputs of a NACA0012 run
+	"""
+	import shutil
+	
+	out = _naca0012_read_output(workdir, return_grad = return_grad)
 
 	if not keep_data:
 		shutil.rmtree(workdir) 
 	
-	if return_grad:
-		return fx, grad
-	else:
-		return fx
-	
+	return out
 
+
+def naca0012_runner(version = 'v1', **kwargs):
+	r""" A runner for the NACA0012 simulation that reuses Docker containers between evaluations
+
+	Parameters
+	----------
+	version: str, optional
+		Version of the jeffreyhokanson/naca0012 Docker image
+	**kwargs:
+		Arguments of :class:`psdr.DockerRunner`; e.g., the number of workers,
+		timeout, and number of retries
+
+	Returns
+	-------
+	runner: DockerRunner
+		Runner for use with :class:`NACA0012`
+	"""
+	return DockerRunner('jeffreyhokanson/naca0012:%s' % version, _naca0012_write_input, 
+		_naca0012_command, _naca0012_read_output, **kwargs)
+
+
+def naca0012_func(x, version = 'v1', workdir = None, verbose = False, 
+	keep_data = False, n_lower = 10, n_upper = 10, return_grad = False, maxiter = 1000,
+	nprocesses = 1):
+	r""" Run the NACA0012 simulation at a single point
+
+	See :class:`NACA0012` for a description of the parameters.
+	"""
+	from psdr.demos._subprocess import run_subprocess
+
+	workdir, args, name = _naca0012_setup(x, version = version, workdir = workdir, keep_data = keep_data, 
+		n_lower = n_lower, n_upper = n_upper, return_grad = return_grad, maxiter = maxiter, nprocesses = nprocesses)
+	run_subprocess(args, workdir + '/output.log', verbose = verbose)
+	return _naca0012_output(workdir, keep_data = keep_data, return_grad = return_grad)
+
+
+async def naca0012_func_async(x, version = 'v1', workdir = None, verbose = False, 
+	keep_data = False, n_lower = 10, n_upper = 10, return_grad = False, maxiter = 1000,
+	nprocesses = 1, timeout = None):
+	r""" Run the NACA0012 simulation at a single point without blocking the event loop
+	
+	Identical to :code:`naca0012_func`, but the Docker container runs as an asyncio subprocess
+	so many simulations can run concurrently from a single thread; 
+	if :code:`timeout` seconds elapse, the container is killed and asyncio.TimeoutError raised.
+	"""
+	import shutil
+	from psdr.demos._subprocess import run_subprocess_async
+
+	workdir, args, name = _naca0012_setup(x, version = version, workdir = workdir, keep_data = keep_data, 
+		n_lower = n_lower, n_upper = n_upper, return_grad = return_grad, maxiter = maxiter, nprocesses = nprocesses)
+	try:
+		await run_subprocess_async(args, workdir + '/output.log', verbose = verbose, timeout = timeout,
+			cleanup = ['docker', 'rm', '-f', name])
+	except BaseException:
+		if not keep_data:
+			shutil.rmtree(workdir, ignore_errors = True)
+		raise
+	return _naca0012_output(workdir, keep_data = keep_data, return_grad = return_grad)
@@ -44,10 +44,7 @@ class OTLCircuit(Function):
 	"""
 	def __init__(self, dask_client = None):
 		domain = build_otl_circuit_domain()
-		funs = [otl_circuit]
-		grads = [otl_circuit_grad] 
-
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, dask_client = dask_client)
+		Function.__init__(self, otl_circuit, domain, vectorized = True, return_grad = True, dask_client = dask_client)
 
 	def __str__(self):
 		return "<OTL Circuit Function>"
@@ -61,6 +58,24 @@ def build_otl_circuit_domain():
 	return BoxDomain(lb, ub, names = ['R_b1', 'R_b2', 'R_f', 'R_c1', 'R_c2', 'beta'])
 
 def otl_circuit(x, return_grad = False):
+	""" OTL circuit test function
+
+	See description in :meth:`psdr.demos.OTLCircuit`
+	
+	Parameters
+	----------
+	x: array-like (?, 6)
+		Input in application units
+	return_grad: bool, optional
+		If True, also return the gradient 
+
+	Return
+	------
+	Vm: np.ndarray (?,)
+		Midpoint voltage
+	grad: np.ndarray (?, 6)
+		Gradient of the midpoint voltage; only returned if return_grad is True
+	"""
 	import numpy as np
 	x = np.array(x).reshape(-1,6)
 	
@@ -72,28 +87,27 @@ def otl_circuit(x, return_grad = False):
 	beta = x[:,5]
 
 	Vb1 = 12*Rb2/(Rb1 + Rb2)
-	Vm = (Vb1 + 0.74)*beta*(Rc2 + 9)/(beta*(Rc2 + 9)+Rf) + 11.35*Rf/(beta*(Rc2 + 9) + Rf) + 0.74*Rf*beta*(Rc2 + 9)/( (beta*(Rc2 + 9) + Rf)*Rc1)
+	# Write Vm = num/den with B = beta*(Rc2 + 9)
+	B = beta*(Rc2 + 9)
+	den = B + Rf
+	num = (Vb1 + 0.74)*B + 11.35*Rf + 0.74*Rf*B/Rc1
+	Vm = num/den
+	if not return_grad:
+		return Vm
 	
-	return Vm
+	# Quotient rule: grad Vm = (grad num - Vm grad den)/den
+	dnum_dB = Vb1 + 0.74 + 0.74*Rf/Rc1
+	grad = np.empty(x.shape)
+	grad[:,0] = -12*Rb2/(Rb1 + Rb2)**2*B
+	grad[:,1] = 12*Rb1/(Rb1 + Rb2)**2*B
+	grad[:,2] = 11.35 + 0.74*B/Rc1 - Vm
+	grad[:,3] = -0.74*Rf*B/Rc1**2
+	grad[:,4] = (dnum_dB - Vm)*beta
+	grad[:,5] = (dnum_dB - Vm)*(Rc2 + 9)
+	grad /= den[:,None]
+	return Vm, grad
 
 def otl_circuit_grad(x):
-	x = x.reshape(-1,6)
-	Rb1 = x[:,0]
-	Rb2 = x[:,1]
-	Rf = x[:,2]
-	Rc1 = x[:,3]
-	Rc2 = x[:,4]
-	beta = x[:,5]
-
-	grad = np.vstack([
-			-12*Rb2*beta*(Rc2 + 9)/((Rb1 + Rb2)**2*(Rf + beta*(Rc2 + 9))),
-			12*Rb1*beta*(Rc2 + 9)/((Rb1 + Rb2)**2*(Rf + beta*(Rc2 + 9))),
-			(-11.35*Rc1*Rf*(Rb1 + Rb2) - Rc1*beta*(0.74*Rb1 + 12.74*Rb2)*(Rc2 + 9) + 11.35*Rc1*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9)) - 0.74*Rf*beta*(Rb1 + Rb2)*(Rc2 + 9) + 0.74*beta*(Rb1 + Rb2)*(Rc2 + 9)*(Rf + beta*(Rc2 + 9)))/(Rc1*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9))**2),
-			-0.74*Rf*beta*(Rc2 + 9)/(Rc1**2*(Rf + beta*(Rc2 + 9))),
-			beta*(-11.35*Rc1*Rf*(Rb1 + Rb2) - Rc1*beta*(0.74*Rb1 + 12.74*Rb2)*(Rc2 + 9) + Rc1*(0.74*Rb1 + 12.74*Rb2)*(Rf + beta*(Rc2 + 9)) - 0.74*Rf*beta*(Rb1 + Rb2)*(Rc2 + 9) + 0.74*Rf*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9)))/(Rc1*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9))**2),
-			(Rc2 + 9)*(-11.35*Rc1*Rf*(Rb1 + Rb2) - Rc1*beta*(0.74*Rb1 + 12.74*Rb2)*(Rc2 + 9) + Rc1*(0.74*Rb1 + 12.74*Rb2)*(Rf + beta*(Rc2 + 9)) - 0.74*Rf*beta*(Rb1 + Rb2)*(Rc2 + 9) + 0.74*Rf*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9)))/(Rc1*(Rb1 + Rb2)*(Rf + beta*(Rc2 + 9))**2),
-		]).T
-	return grad
-
-
-
+	""" Gradient of the OTL circuit test function
+	"""
+	return otl_circuit(x, return_grad = True)[1]
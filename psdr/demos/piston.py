@@ -47,10 +47,7 @@ class Piston(Function):
 	"""
 	def __init__(self, dask_client = None):
 		domain = build_piston_domain()
-		funs = [piston]
-		grads = [piston_grad]
-
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, dask_client = dask_client)
+		Function.__init__(self, piston, domain, vectorized = True, return_grad = True, dask_client = dask_client)
 
 	def __str__(self):
 		return "<Piston Function>"
@@ -63,12 +60,27 @@ def build_piston_domain():
 	return BoxDomain(lb, ub, names = ['M', 'S', 'V_0', 'k', 'P_0', 'T_a', 'T_0'])
 
 
-def piston(X):
+def piston(X, return_grad = False):
 	""" Piston test function
 
+	See description in :meth:`psdr.demos.Piston`
+	
+	Parameters
+	----------
+	X: array-like (?, 7)
+		Input in application units
+	return_grad: bool, optional
+		If True, also return the gradient 
+
+	Return
+	------
+	C: np.ndarray (?,)
+		Cycle time of the piston
+	grad: np.ndarray (?, 7)
+		Gradient of the cycle time; only returned if return_grad is True
 	"""
 	import numpy as np
-	X = X.reshape(-1, 7)
+	X = np.array(X).reshape(-1, 7)
 
 	# Split the variables
 	M  = X[:,0]
@@ -80,31 +92,46 @@ def piston(X):
 	T0 = X[:,6]
 
 	A = P0*S + 19.62*M - k*V0/S
-	V = S/(2*k)*( np.sqrt(A**2 + 4*k*P0*V0/T0*Ta) - A)
-	C = 2*np.pi*np.sqrt(M/(k+S**2*(P0*V0/T0)*(Ta/V**2)))
+	Q = P0*V0/T0*Ta
+	R = np.sqrt(A**2 + 4*k*Q)
+	V = S/(2*k)*(R - A)
+	W = k + S**2*Q/V**2
+	C = 2*np.pi*np.sqrt(M/W)
+	if not return_grad:
+		return C
+
+	# Propagate derivatives of each intermediate quantity with respect to all inputs
+	N = X.shape[0]
+	dA = np.zeros((N, 7))
+	dA[:,0] = 19.62
+	dA[:,1] = P0 + k*V0/S**2
+	dA[:,2] = -k/S
+	dA[:,3] = -V0/S
+	dA[:,4] = S
+
+	# Logarithmic derivative of Q
+	dQ_Q = np.zeros((N, 7))
+	dQ_Q[:,2] = 1/V0
+	dQ_Q[:,4] = 1/P0
+	dQ_Q[:,5] = 1/Ta
+	dQ_Q[:,6] = -1/T0
+	
+	dR = (A[:,None]*dA + 2*k[:,None]*Q[:,None]*dQ_Q)/R[:,None]
+	dR[:,3] += 2*Q/R
 
-	return C
+	dV = (S/(2*k))[:,None]*(dR - dA)
+	dV[:,1] += V/S
+	dV[:,3] -= V/k
+
+	dW = (S**2*Q/V**2)[:,None]*(dQ_Q - 2*dV/V[:,None])
+	dW[:,1] += 2*S*Q/V**2
+	dW[:,3] += 1
+
+	grad = -0.5*(C/W)[:,None]*dW
+	grad[:,0] += 0.5*C/M
+	return C, grad
 
 def piston_grad(X):
-	import numpy as np
-	X = X.reshape(-1,7)
-	# Split the variables
-	M  = X[:,0]
-	S  = X[:,1]
-	V0 = X[:,2]
-	k  = X[:,3]
-	P0 = X[:,4]
-	Ta = X[:,5]
-	T0 = X[:,6]
-	
-	# Compute analytic gradients determined using Sympy
-	grad = np.vstack([
-			2*np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k)*(-2*M*P0*Ta*V0*k**2*(39.24 - 2*(384.9444*M + 19.62*P0*S - 19.62*V0*k/S)/np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2))/(T0*(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k)**2*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) + 1/(2*(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k)))/M,
-			-4*np.pi*P0*Ta*V0*k**2*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(2*P0 - (2*P0 + 2*V0*k/S**2)*(19.62*M + P0*S - V0*k/S)/np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + 2*V0*k/S**2)/(T0*(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k)*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3),
-			np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(-4*P0*Ta*V0*k**2*(-2*(2*P0*Ta*k/T0 - k*(19.62*M + P0*S - V0*k/S)/S)/np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) - 2*k/S)/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) - 4*P0*Ta*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2))/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k),
-			np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(-4*P0*Ta*V0*k**2*(-2*(2*P0*Ta*V0/T0 - V0*(19.62*M + P0*S - V0*k/S)/S)/np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) - 2*V0/S)/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) - 8*P0*Ta*V0*k/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) - 1)/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k),
-			np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(-4*P0*Ta*V0*k**2*(2*S - 2*(S*(19.62*M + P0*S - V0*k/S) + 2*Ta*V0*k/T0)/np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2))/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) - 4*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2))/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k),
-			np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(16*P0**2*Ta*V0**2*k**3/(T0**2*np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2)*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) - 4*P0*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2))/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k),
-			np.pi*np.sqrt(M/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k))*(-16*P0**2*Ta**2*V0**2*k**3/(T0**3*np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2)*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**3) + 4*P0*Ta*V0*k**2/(T0**2*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2))/(4*P0*Ta*V0*k**2/(T0*(-19.62*M - P0*S + np.sqrt(4*P0*Ta*V0*k/T0 + (19.62*M + P0*S - V0*k/S)**2) + V0*k/S)**2) + k),
-		]).T
-	return grad 
+	""" Gradient of the piston test function
+	"""
+	return piston(X, return_grad = True)[1]
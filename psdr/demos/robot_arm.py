@@ -42,10 +42,7 @@ class RobotArm(Function):
 	"""
 	def __init__(self, dask_client = None):
 		domain = build_robot_arm_domain()
-		funs = [robot_arm]
-		grads = [robot_arm_grad]
-		
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True, dask_client = dask_client)
+		Function.__init__(self, robot_arm, domain, vectorized = True, return_grad = True, dask_client = dask_client)
 
 	def __str__(self):
 		return "<Robot Arm Function>"
@@ -57,56 +54,53 @@ def build_robot_arm_domain():
 	ub = np.array([2*np.pi, 2*np.pi, 2*np.pi, 2*np.pi, 1,1,1,1])
 	return BoxDomain(lb, ub, names = ['theta_1', 'theta_2', 'theta_3', 'theta_4', 'L_1', 'L_2', 'L_3', 'L_4'])
 
-def robot_arm(X):
+def robot_arm(X, return_grad = False):
 	"""Robot arm test function
 	
 	See: https://www.sfu.ca/~ssurjano/robot.html
+
+	Parameters
+	----------
+	X: array-like (?, 8)
+		Input in application units
+	return_grad: bool, optional
+		If True, also return the gradient 
+
+	Return
+	------
+	f: np.ndarray (?,)
+		Distance of the end of the arm from the origin
+	grad: np.ndarray (?, 8)
+		Gradient of f; only returned if return_grad is True
 	"""
-	X = X.reshape(-1, 8)
+	X = np.array(X).reshape(-1, 8)
 
-	th1 = X[:,0]
-	th2 = X[:,1]
-	th3 = X[:,2]
-	th4 = X[:,3]
-	L1  = X[:,4]
-	L2  = X[:,5]
-	L3  = X[:,6]
-	L4  = X[:,7]
+	# Cumulative angle of each segment and their lengths
+	phi = np.cumsum(X[:,0:4], axis = 1)
+	L = X[:,4:8]
 
-	u = L1*np.cos(th1) + L2*np.cos(th1+th2) + L3*np.cos(th1+th2+th3) + L4*np.cos(th1+th2+th3+th4)
-	v = L1*np.sin(th1) + L2*np.sin(th1+th2) + L3*np.sin(th1+th2+th3) + L4*np.sin(th1+th2+th3+th4)
+	Lcos = L*np.cos(phi)
+	Lsin = L*np.sin(phi)
+	u = np.sum(Lcos, axis = 1)
+	v = np.sum(Lsin, axis = 1)
 
 	f = np.sqrt(u**2 + v**2)
-	return f
+	if not return_grad:
+		return f
+
+	grad = np.empty(X.shape)
+	# Angle theta_j rotates segments j,...,4
+	Lcos_tail = np.cumsum(Lcos[:,::-1], axis = 1)[:,::-1]
+	Lsin_tail = np.cumsum(Lsin[:,::-1], axis = 1)[:,::-1]
+	grad[:,0:4] = (v[:,None]*Lcos_tail - u[:,None]*Lsin_tail)/f[:,None]
+	# Rotating the whole arm does not change the distance
+	grad[:,0] = 0
+	grad[:,4:8] = (u[:,None]*np.cos(phi) + v[:,None]*np.sin(phi))/f[:,None]
+	return f, grad
 
 def robot_arm_grad(X):
-	"""Robot arm test function
+	"""Gradient of the robot arm test function
 	
 	See: https://www.sfu.ca/~ssurjano/robot.html
 	"""
-	X = X.reshape(-1, 8)
-
-	th1 = X[:,0]
-	th2 = X[:,1]
-	th3 = X[:,2]
-	th4 = X[:,3]
-	L1  = X[:,4]
-	L2  = X[:,5]
-	L3  = X[:,6]
-	L4  = X[:,7]
-
-	u = L1*np.cos(th1) + L2*np.cos(th1+th2) + L3*np.cos(th1+th2+th3) + L4*np.cos(th1+th2+th3+th4)
-	v = L1*np.sin(th1) + L2*np.sin(th1+th2) + L3*np.sin(th1+th2+th3) + L4*np.sin(th1+th2+th3+th4)
-
-	f = np.sqrt(u**2 + v**2)
-	grad = np.vstack([
-			0*th1,
-			-L1*(L2*np.sin(th2) + L3*np.sin(th2 + th3) + L4*np.sin(th2 + th3 + th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			-(L1*L3*np.sin(th2 + th3) + L1*L4*np.sin(th2 + th3 + th4) + L2*L3*np.sin(th3) + L2*L4*np.sin(th3 + th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			-L4*(L1*np.sin(th2 + th3 + th4) + L2*np.sin(th3 + th4) + L3*np.sin(th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			(L1 + L2*np.cos(th2) + L3*np.cos(th2 + th3) + L4*np.cos(th2 + th3 + th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			(L1*np.cos(th2) + L2 + L3*np.cos(th3) + L4*np.cos(th3 + th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			(L1*np.cos(th2 + th3) + L2*np.cos(th3) + L3 + L4*np.cos(th4))/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-			(L1*np.cos(th2 + th3 + th4) + L2*np.cos(th3 + th4) + L3*np.cos(th4) + L4)/np.sqrt(L1**2 + 2*L1*L2*np.cos(th2) + 2*L1*L3*np.cos(th2 + th3) + 2*L1*L4*np.cos(th2 + th3 + th4) + L2**2 + 2*L2*L3*np.cos(th3) + 2*L2*L4*np.cos(th3 + th4) + L3**2 + 2*L3*L4*np.cos(th4) + L4**2),
-		]).T
-	return grad
+	return robot_arm(X, return_grad = True)[1]
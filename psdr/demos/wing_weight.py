@@ -45,9 +45,7 @@ class WingWeight(Function):
 	"""
 	def __init__(self):
 		domain = build_wing_weight_domain()
-		funs = [wing_weight]
-		grads = [wing_weight_grad]
-		Function.__init__(self, funs, domain, grads = grads, vectorized = True)	
+		Function.__init__(self, wing_weight, domain, vectorized = True, return_grad = True)
 
 	def __str__(self):
 		return "<Wing Weight Function>"
@@ -61,13 +59,27 @@ def build_wing_weight_domain():
 
 
 
-def wing_weight(X):
+def wing_weight(X, return_grad = False):
 	"""Wing weight test function
 	
 	See: https://www.sfu.ca/~ssurjano/wingweight.html
+
+	Parameters
+	----------
+	X: array-like (?, 10)
+		Input in application units
+	return_grad: bool, optional
+		If True, also return the gradient 
+
+	Return
+	------
+	f: np.ndarray (?,)
+		Weight of the wing
+	grad: np.ndarray (?, 10)
+		Gradient of the weight; only returned if return_grad is True
 	"""	
 
-	X = X.reshape(-1,10)
+	X = np.array(X).reshape(-1,10)
 
 	Sw  = X[:,0]
 	Wfw = X[:,1]
@@ -80,33 +92,26 @@ def wing_weight(X):
 	Wdg = X[:,8]
 	Wp  = X[:,9]
 
-	f = 0.036*(Sw**0.758)*(Wfw**0.0035)*(A/(np.cos(Lam)**2))**(0.6)*(q**0.006)*(lam**0.04)*(100*tc/np.cos(Lam))**(-0.3)*(Nz*Wdg)**(0.49) + Sw*Wp
-	return f
+	P = 0.036*(Sw**0.758)*(Wfw**0.0035)*(A/(np.cos(Lam)**2))**(0.6)*(q**0.006)*(lam**0.04)*(100*tc/np.cos(Lam))**(-0.3)*(Nz*Wdg)**(0.49)
+	f = P + Sw*Wp
+	if not return_grad:
+		return f
+
+	# P is a product of powers, so each partial derivative is P*exponent/variable
+	grad = np.empty(X.shape)
+	grad[:,0] = 0.758*P/Sw + Wp
+	grad[:,1] = 0.0035*P/Wfw
+	grad[:,2] = 0.6*P/A
+	grad[:,3] = (np.pi/180)*0.9*P*np.tan(Lam)
+	grad[:,4] = 0.006*P/q
+	grad[:,5] = 0.04*P/lam
+	grad[:,6] = -0.3*P/tc
+	grad[:,7] = 0.49*P/Nz
+	grad[:,8] = 0.49*P/Wdg
+	grad[:,9] = Sw
+	return f, grad
 
 def wing_weight_grad(X):
-	X = X.reshape(-1,10)
-
-	Sw  = X[:,0]
-	Wfw = X[:,1]
-	A   = X[:,2]
-	Lam = X[:,3]*(np.pi/180) # In degrees
-	q   = X[:,4]
-	lam = X[:,5]
-	tc  = X[:,6]
-	Nz  = X[:,7]
-	Wdg = X[:,8]
-	Wp  = X[:,9]
-		
-	grad = np.vstack([
-			0.00685443569430334*Sw**(-0.242)*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3) + 1.0*Wp,
-			3.16497690370207e-5*Sw**0.758*Wfw**(-0.9965)*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3),
-			0.00542567469206069*Sw**0.758*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3)/A,
-			(np.pi/180)*0.00813851203809104*Sw**0.758*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3)*np.tan(Lam),
-			5.42567469206069e-5*Sw**0.758*Wfw**0.0035*lam**0.04*q**(-0.994)*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3),
-			0.000361711646137379*Sw**0.758*Wfw**0.0035*lam**(-0.96)*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3),
-			-0.00271283734603035*Sw**0.758*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3)/tc,
-			0.0044309676651829*Sw**0.758*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3)/Nz,
-			0.0044309676651829*Sw**0.758*Wfw**0.0035*lam**0.04*q**0.006*(A/np.cos(Lam)**2)**0.6*(Nz*Wdg)**0.49*(tc/np.cos(Lam))**(-0.3)/Wdg,
-			Sw,
-		]).T
-	return grad	
+	"""Gradient of the wing weight test function
+	"""
+	return wing_weight(X, return_grad = True)[1]
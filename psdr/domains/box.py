@@ -71,8 +71,15 @@ class BoxDomain(LinIneqDomain):
 			raise EmptyDomainException
 		return x
 
-	def _extent(self, x, p):
-		return self._extent_bounds(x, p)
+	def _closest_point(self, x0, L = None, **kwargs):
+		# When L.T @ L is diagonal the objective separates over coordinates
+		# and the closest point is found by clipping to the bounds
+		if self.is_empty:
+			raise EmptyDomainException
+		LL = L.T.dot(L)
+		if np.count_nonzero(LL - np.diag(np.diag(LL))) == 0:
+			return np.clip(x0, self.lb, self.ub)
+		return super(BoxDomain, self)._closest_point(x0, L = L, **kwargs)
 
 	def _isinside(self, X, tol = TOL):
 		return self._isinside_bounds(X, tol = tol)
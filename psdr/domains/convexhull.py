@@ -20,9 +20,15 @@ from .linquad import LinQuadDomain
 from .box import BoxDomain
 from ..misc import merge
 from ..geometry import unique_points
-from .euclidean import TOL
+from .euclidean import TOL, EuclideanDomain, _chords
 
 
+# Largest dimension of a convex hull for which we compute its facets to check if points are inside
+_HULL_HALFSPACE_MAX_DIM = 6
+
+# Number of NNLS problems to solve before sharing the separating hyperplanes found
+_HULL_NNLS_BATCH = 32
+
 
 
 def _hull_to_linineq(X):
@@ -258,22 +264,111 @@ class ConvexHullDomain(LinQuadDomain):
 		constraints += LinQuadDomain._build_constraints_norm(self, x_norm)
 		return constraints
 	
-	def _isinside(self, X, tol = TOL):
+	@cached_property
+	def _hull_halfspaces(self):
+		r""" Half-space representation of the convex hull in normalized coordinates
 
-		# Check that the points are in the convex hull
-		inside = np.zeros(X.shape[0], dtype = np.bool)
+		Returns None if the hull is of too high a dimension for Qhull to enumerate its facets quickly.
+		"""
+		Xdiff = self._X_norm - np.mean(self._X_norm, axis = 0)
+		dim = np.sum(~np.isclose(scipy.linalg.svdvals(Xdiff), 0))
+		if dim > _HULL_HALFSPACE_MAX_DIM:
+			return None
+		try:
+			A, b, A_eq, b_eq, vertices = _hull_to_linineq(self._X_norm)
+		except Exception:
+			# e.g., a nearly degenerate hull Qhull cannot handle
+			return None
+		if A is None:
+			A, b = np.zeros((0, len(self))), np.zeros(0)
+		return A, b, A_eq, b_eq
+
+	def _polytope_halfspaces_norm(self):
+		A, b = LinQuadDomain._polytope_halfspaces_norm(self)
+		A_hull, b_hull, A_eq_hull, b_eq_hull = self._hull_halfspaces
+		return np.vstack([A, A_hull]), np.hstack([b, b_hull])
+
+	def _volume_exact(self):
+		halfspaces = self._hull_halfspaces
+		if halfspaces is None:
+			return None
+		# A hull of lower dimension than the space has no volume
+		if len(halfspaces[3]) > 0:
+			return 0.
+		return LinQuadDomain._volume_exact(self)
+
+	def _volume_multiphase(self, sd):
+		# Hit-and-run requires the facets of the hull, 
+		# which are only available when the volume can be computed exactly
+		return None
+
+	def _extents(self, X, P):
+		halfspaces = self._hull_halfspaces
+		if halfspaces is None:
+			# Solve a linear program for each line
+			return EuclideanDomain._extents(self, X, P)
 		
-		for i, xi in enumerate(X):
-			alpha = self.coefficients(xi)
-			rnorm = np.linalg.norm( xi - self._X.T.dot(alpha))
-			inside[i] = (rnorm < tol)
-
-		# Now check linear inequality/equality constraints and quadratic constraints
-		inside &= self._isinside_bounds(X, tol = tol)
-		inside &= self._isinside_ineq(X, tol = tol)	
-		inside &= self._isinside_eq(X, tol = tol)
-		inside &= self._isinside_quad(X, tol = tol)
-
+		alpha_forward, alpha_backward = LinQuadDomain._extents(self, X, P)
+		# The chords of the hull are found from its facets in normalized coordinates
+		A, b, A_eq, b_eq = halfspaces
+		P_norm = P*self._normalize_scale()
+		lo, hi = _chords(self.normalize(X), P_norm, A, b)
+		if len(b_eq) > 0:
+			I = np.any(np.abs(P_norm @ A_eq.T) >= self.tol, axis = 1)
+			lo[I] = 0.
+			hi[I] = 0.
+		return np.minimum(alpha_forward, hi), np.minimum(alpha_backward, -lo)
+
+	def _isinside_hull(self, X, tol = TOL):
+		r""" Check if points are inside the convex hull, ignoring the other constraints
+		
+		A point is inside if its distance to the hull (in normalized coordinates) is less than tol.
+		"""
+		X_norm = self.normalize(X)
+		halfspaces = self._hull_halfspaces
+		if halfspaces is not None:
+			A, b, A_eq, b_eq = halfspaces
+			inside = np.all(X_norm @ A.T <= b + tol, axis = 1)
+			if len(b_eq) > 0:
+				inside &= np.all(np.abs(X_norm @ A_eq.T - b_eq) < tol, axis = 1)
+			return inside
+
+		# Otherwise solve a nonnegative least squares problem for each point,
+		# finding the convex combination closest to that point. 
+		A = np.vstack([self._X_norm.T, np.ones( (1,len(self._X_norm)) )])
+		Z = np.hstack([X_norm, np.ones((len(X_norm), 1))])
+		
+		# Points outside the bounding box are outside the hull
+		lb, ub = np.min(self._X_norm, axis = 0), np.max(self._X_norm, axis = 0)
+		inside = np.all(X_norm > lb - tol, axis = 1) & np.all(X_norm < ub + tol, axis = 1)
+
+		# If a point is outside, the residual r of the NNLS problem satisfies r @ A <= 0,
+		# providing a hyperplane separating the hull from other points: 
+		# if r @ z/|r| >= tol, the residual for z is at least tol.
+		# Hence we solve NNLS problems in small batches, using the hyperplanes found 
+		# to remove other points before solving the next batch. 
+		todo = np.flatnonzero(inside)
+		while len(todo) > 0:
+			batch, todo = todo[:_HULL_NNLS_BATCH], todo[_HULL_NNLS_BATCH:]
+			H = []
+			for i in batch:
+				alpha, rnorm = nnls(A, Z[i])
+				if rnorm >= tol:
+					inside[i] = False
+					H.append((Z[i] - A @ alpha)/rnorm)
+			if len(H) > 0 and len(todo) > 0:
+				outside = np.any(Z[todo] @ np.array(H).T >= tol, axis = 1)
+				inside[todo[outside]] = False
+				todo = todo[~outside]
+		return inside
+	
+	def _isinside(self, X, tol = TOL):
+		# Check the linear and quadratic constraints first as these are cheap,
+		# then only check the points that remain are in the convex hull
+		inside = self._isinside_linquad(X, tol = tol)
+		I = np.flatnonzero(inside)
+		if len(I) > 0:
+			inside[I] = self._isinside_hull(X[I], tol = tol)
 		return inside
 
 	def add_constraints(self, A = None, b = None, lb = None, ub = None, A_eq = None, b_eq = None,
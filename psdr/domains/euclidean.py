@@ -1,10 +1,15 @@
+import hashlib
+import warnings
 import numpy as np
 
+import scipy.special
+import scipy.stats
 from scipy.stats import ortho_group
+import scipy.linalg
 from scipy.linalg import orth
 from scipy.spatial.distance import pdist
-
-from functools import lru_cache
+from scipy.spatial import ConvexHull, HalfspaceIntersection, QhullError
+from scipy.optimize import linprog
 
 
 try:
@@ -18,7 +23,81 @@ import cvxpy as cp
 from .domain import Domain, TOL
 from ..exceptions import SolverError, EmptyDomainException, UnboundedDomainException
 from ..misc import merge
-from ..quadrature import gauss
+from ..quadrature import gauss, smolyak, smolyak_size, _tensor_rule
+
+
+# Largest dimension of a polytope for which the volume is computed exactly
+_VOLUME_EXACT_MAX_DIM = 6
+
+# Number of points from the bounding box used to estimate the volume before switching estimators
+_VOLUME_REJECT_MAX = 4*10**6
+
+# Relative accuracy of the volume used internally; e.g., for quadrature weights
+_VOLUME_RTOL = 0.1
+
+
+def _chords(X, D, A, b, quad = ()):
+	r""" Range of steps staying inside linear and quadratic constraints along many lines
+
+	For each row x of X and d of D, this finds the interval of alpha
+	such that :math:`\mathbf A(\mathbf x + \alpha \mathbf d) \le \mathbf b`
+	and :math:`\|\mathbf L(\mathbf x + \alpha \mathbf d - \mathbf y)\|_2 \le \rho`
+	for each (L, y, rho) in quad.
+	Points that already violate a constraint (e.g., a corner found within tolerance)
+	are treated as lying on that constraint: they cannot step further outside it,
+	but may step back inside.
+
+	Returns
+	-------
+	lo: np.ndarray (M,)
+		Smallest (most negative) step
+	hi: np.ndarray (M,)
+		Largest step
+	"""
+	with np.errstate(divide = 'ignore', invalid = 'ignore'):
+		slack = np.maximum(b - X @ A.T, 0)
+		AD = D @ A.T
+		alpha = slack/AD
+		hi = np.min(np.where(AD > 0, alpha, np.inf), axis = 1, initial = np.inf)
+		lo = np.max(np.where(AD < 0, alpha, -np.inf), axis = 1, initial = -np.inf)
+		for L, y, rho in quad:
+			LX = (X - y) @ L.T
+			LD = D @ L.T
+			# Roots of a alpha^2 + 2 beta alpha + gamma = 0
+			a = np.sum(LD**2, axis = 1)
+			beta = np.sum(LX*LD, axis = 1)
+			gamma = np.sum(LX**2, axis = 1) - rho**2
+			root = np.sqrt(np.maximum(beta**2 - a*gamma, 0))
+			move = a > 0
+			hi = np.where(move, np.minimum(hi, (-beta + root)/a), hi)
+			lo = np.where(move, np.maximum(lo, (-beta - root)/a), lo)
+	return lo, hi
+
+
+def _polytope_volume(A, b):
+	r""" Volume of the polytope A x <= b, or None if Qhull fails
+	"""
+	m = A.shape[1]
+	if m == 1:
+		a = A[:,0]
+		hi = np.min(b[a > 0]/a[a > 0], initial = np.inf)
+		lo = np.max(b[a < 0]/a[a < 0], initial = -np.inf)
+		return float(max(hi - lo, 0))
+
+	# Chebyshev center as an interior point
+	normA = np.linalg.norm(A, axis = 1)
+	c = np.zeros(m+1)
+	c[-1] = -1
+	res = linprog(c, A_ub = np.hstack([A, normA.reshape(-1,1)]), b_ub = b, bounds = [(None, None)]*m + [(0, None)])
+	if res.status != 0:
+		return None
+	if res.x[-1] <= 1e-10:
+		return 0.
+	try:
+		hs = HalfspaceIntersection(np.hstack([A, -b.reshape(-1,1)]), res.x[:m])
+		return float(ConvexHull(hs.intersections).volume)
+	except (QhullError, ValueError):
+		return None
 
 
 class EuclideanDomain(Domain):
@@ -428,10 +507,9 @@ class EuclideanDomain(Domain):
 			Qeq = self._A_eq_basis
 			p -= Qeq.dot(Qeq.T.dot(p))
 
-			a1 = self.extent(x, p)
-			c1 = x + a1*p
-			a2 = -self.extent(x, -p)
-			c2 = x + a2*p
+			a1, a2 = self.extents(x, p)
+			c1 = x + a1[0]*p
+			c2 = x - a2[0]*p
 		
 		# Samples
 		X = np.array([ (1-alpha)*c1 + alpha*c2 for alpha in np.linspace(0,1,n)])
@@ -490,6 +568,53 @@ class EuclideanDomain(Domain):
 	def _extent(self, x, p):
 		raise NotImplementedError
 
+	def extents(self, X, P):
+		r"""Compute the distances to the boundary of the domain along many lines at once
+
+		For each point :math:`\mathbf x` in the domain (a row of X) and direction :math:`\mathbf p` (a row of P),
+		find how far we can go forward and backward along this direction and stay inside the domain:
+
+		.. math::
+
+			\alpha_+ = \max_{\alpha \ge 0} \alpha \quad\text{such that} \quad \mathbf x + \alpha\mathbf p \in \mathcal D,
+			\qquad
+			\alpha_- = \max_{\alpha \ge 0} \alpha \quad\text{such that} \quad \mathbf x - \alpha\mathbf p \in \mathcal D;
+
+		i.e., the chord through :math:`\mathbf x` is the segment 
+		from :math:`\mathbf x - \alpha_-\mathbf p` to :math:`\mathbf x + \alpha_+\mathbf p`.
+		Unlike :meth:`extent`, this does not check that the points are inside the domain.
+
+		Parameters
+		----------
+		X : np.ndarray(M, m) or np.ndarray(m)
+			Starting points in the domain; a single point is used with every direction
+		P : np.ndarray(M, m) or np.ndarray(m)
+			Directions; a single direction is used with every point
+
+		Returns
+		-------
+		alpha_forward: np.ndarray(M)
+			Distance to the boundary along each direction p
+		alpha_backward: np.ndarray(M)
+			Distance to the boundary along each direction -p
+		"""
+		X = np.atleast_2d(np.asarray(X, dtype = float))
+		P = np.atleast_2d(np.asarray(P, dtype = float))
+		if X.shape[1] != len(self) or P.shape[1] != len(self):
+			raise ValueError("Points and directions must have the same dimension as the domain")
+		X, P = np.broadcast_arrays(X, P)
+		if len(X) == 0:
+			return np.zeros(0), np.zeros(0)
+
+		alpha_forward, alpha_backward = self._extents(X, P)
+		return np.maximum(alpha_forward, 0), np.maximum(alpha_backward, 0)
+
+	def _extents(self, X, P):
+		# By default, find the extent along each line separately
+		alpha_forward = np.array([self._extent(x, p) for x, p in zip(X, P)], dtype = float)
+		alpha_backward = np.array([self._extent(x, -p) for x, p in zip(X, P)], dtype = float)
+		return alpha_forward, alpha_backward
+
 	def isinside(self, X, tol = TOL):
 		""" Determine if points are inside the domain
 
@@ -515,38 +640,47 @@ class EuclideanDomain(Domain):
 	def _isinside(self, X, tol = TOL):
 		raise NotImplementedError
 
-	def normalize(self, X):
+	def normalize(self, X, out = None):
 		""" Given a points in the application space, convert it to normalized units
 		
 		Parameters
 		----------
 		X: np.ndarray((M,m))
 			points in the domain to normalize
+		out: np.ndarray((M,m)), optional
+			array in which to store the result; this may be X itself
+			to normalize in place
 		"""
-		try:
-			X.shape
-		except AttributeError:
-			X = np.array(X)
+		X = np.asarray(X)
 		if len(X.shape) == 1:
 			X = X.reshape(-1, len(self)) 
-			return self._normalize(X).flatten()
+			if out is None:
+				return self._normalize(X).flatten()
+			self._normalize(X, out = out[None,:])
+			return out
 		else:
-			return self._normalize(X)
+			return self._normalize(X, out = out)
 
-	def unnormalize(self, X_norm):
+	def unnormalize(self, X_norm, out = None):
 		""" Convert points from normalized units into application units
 		
 		Parameters
 		----------
 		X_norm: np.ndarray((M,m))
 			points in the normalized domain to convert to the application domain
-		
+		out: np.ndarray((M,m)), optional
+			array in which to store the result; this may be X_norm itself
+			to unnormalize in place
 		"""
+		X_norm = np.asarray(X_norm)
 		if len(X_norm.shape) == 1:
 			X_norm = X_norm.reshape(-1, len(self)) 
-			return self._unnormalize(X_norm).flatten()
+			if out is None:
+				return self._unnormalize(X_norm).flatten()
+			self._unnormalize(X_norm, out = out[None,:])
+			return out
 		else:
-			return self._unnormalize(X_norm)
+			return self._unnormalize(X_norm, out = out)
 	
 	
 	def normalized_domain(self, **kwargs):
@@ -695,13 +829,30 @@ class EuclideanDomain(Domain):
 			\int_{\mathbf x\in \mathcal D} f(\mathbb{x}) \mathrm{d}\mathbf{x}
 			\approx \sum_{j=1}^M w_j f(\mathbf{x}_j).
 
-		
+		The available rules are:
+
+		* :code:`'gauss'`: a tensor product Gauss-Legendre rule on the normalization box,
+		  restricted to those points inside the domain; the number of points in each direction
+		  is found by bisection so the rule has at most N points.
+		* :code:`'smolyak'`: a Smolyak sparse grid built from nested Clenshaw-Curtis rules
+		  (see :meth:`psdr.smolyak`) with the largest level that has at most N points.
+		  Sparse grids remain useful in dimensions where a tensor product rule
+		  has only one point per direction, but as some weights are negative,
+		  these should only be used on box domains.
+		* :code:`'qmc'`: a scrambled Sobol sequence inside the domain
+		  with equal weights that sum to the volume of the domain.
+		* :code:`'montecarlo'`: random samples from the domain
+		  with equal weights that sum to the volume of the domain.
+
+		By default (:code:`'auto'`), a tensor product Gauss rule is used 
+		if it can have more than one point in each direction; otherwise a sparse grid
+		is used on box domains and Monte-Carlo on all others.
 		
 		Parameters
 		----------
 		N: int
 			Number of samples to use to construct estimate
-		method: string, ['auto', 'gauss', 'montecarlo']
+		method: string, ['auto', 'gauss', 'smolyak', 'qmc', 'montecarlo']
 			Method to use to construct quadrature rule
 
 		Returns
@@ -722,70 +873,79 @@ class EuclideanDomain(Domain):
 			return self.sample().reshape(1,-1), np.ones(1) 
 	
 		N = int(N)
+		m = len(self)
 	
 		# The number of points in each direction we could use for a tensor-product
 		# quadrature rule
-		q = int(np.floor( N**(1./len(self))))
+		q = int(np.floor( N**(1./m)))
+		# Numerical error in the root can make this off by one
+		if (q+1)**m <= N: q += 1
 		if method == 'auto':
 			# If we can take more than one point in each axis, use a tensor-product Gauss quadrature rule
 			if q > 1: method = 'gauss'
+			elif self.is_box_domain: method = 'smolyak'
 			else: method = 'montecarlo'
 
 		if self.is_unbounded:
 			method = 'montecarlo'
 
 		# We currently do not support gauss quadrature on equality constrained domains
-		if len(self.A_eq) > 0 and method == 'gauss':
+		if len(self.A_eq) > 0 and method in ['gauss', 'smolyak', 'qmc']:
 			method = 'montecarlo'
 
 		if method == 'gauss':
-
-			def quad(qs):
+			rules = {}
+			def quad(q):
 				# Constructs a quadrature rule for the domain, restricting to those points that are inside
-				xs = []
-				ws = []
-				for i in range(len(self)):
-					x, w = gauss(qs[i], self.norm_lb[i], self.norm_ub[i])
-					xs.append(x)
-					ws.append(w)
-				# Construct the samples	
-				Xs = np.meshgrid(*xs)
-				# Flatten into (M, len(self)) shape 
-				X = np.hstack([X.reshape(-1,1) for X in Xs])
-			
-				# Construct the weights
-				Ws = np.meshgrid(*ws)
-				W = np.hstack([W.reshape(-1,1) for W in Ws])
-				w = np.prod(W, axis = 1)
-				
-				# remove those points outside the domain
+				if q not in rules:
+					xws = [gauss(q, lb, ub) for lb, ub in zip(self.norm_lb, self.norm_ub)]
+					X, w = _tensor_rule([x for x, w in xws], [w for x, w in xws])
+					# remove those points outside the domain
+					if not self.is_box_domain:
+						I = self.isinside(X)
+						X, w = X[I], w[I]
+					rules[q] = X, w
+				return rules[q]
+
+			# If all the points are inside the domain, no larger rule can fit
+			if self.is_box_domain:
+				return quad(q)
+
+			# Otherwise bisect on the number of points in each direction
+			# for the largest rule with at most N points inside the domain;
+			# first find a rule that is too large by doubling
+			lo, hi = q, 2*q
+			while len(quad(hi)[0]) <= N:
+				lo, hi = hi, 2*hi
+			while hi - lo > 1:
+				mid = (lo + hi)//2
+				if len(quad(mid)[0]) <= N: lo = mid
+				else: hi = mid
+			return quad(lo)
+
+		elif method == 'smolyak':
+			# Largest level with at most N points; the size is monotone in the level,
+			# and computing it does not construct the grid 
+			lo, hi = 0, 1
+			while smolyak_size(m, hi) <= N:
+				lo, hi = hi, 2*hi
+			while hi - lo > 1:
+				mid = (lo + hi)//2
+				if smolyak_size(m, mid) <= N: lo = mid
+				else: hi = mid
+			X, w = smolyak(m, lo, self.norm_lb, self.norm_ub)
+			if not self.is_box_domain:
 				I = self.isinside(X)
-				X = X[I]
-				w = w[I]	
-			
-				return X, w
-
-			qs = q*np.ones(len(self))
-			X, w = quad(qs)
-
-			# If all the points were in the domain, stop
-			if np.prod(qs) == len(X):
-				return X, w
-
-			# Now we iterate, increasing the density of the quadrature rule
-			# while staying below the maximum number of points 
-			# TODO: Use a bisection search to find the right spacing
-			while True:
-				# increase dimension of the rule 
-				qs += 1.
-				Xnew, wnew = quad(qs)
-				if len(Xnew) <= N:
-					X = Xnew
-					w = wnew
-				else:
-					break
-
-			return X, w 
+				X, w = X[I], w[I]
+			return X, w
+	
+		elif method == 'qmc':
+			from ..sample import sobol_sequence
+			# Sobol points are uniformly distributed over the domain, so like Monte-Carlo
+			# each weight is the volume of the domain divided by the number of points
+			X = sobol_sequence(self, N, scramble = True)
+			w = (self.volume(rtol = _VOLUME_RTOL)/N)*np.ones(N)
+			return X, w
 
 		elif method == 'montecarlo':
 			# For a Monte-Carlo rule we simply sample the domain randomly.
@@ -794,22 +954,263 @@ class EuclideanDomain(Domain):
 
 			# However, we need to include a correction to account for the 
 			# volume of this domain
-			vol = self.volume()
+			vol = self.volume(rtol = _VOLUME_RTOL)
 			w *= vol
 			return X, w
 
-	@lru_cache()
-	def volume(self, N = 1e4):
+		raise ValueError("Unknown quadrature rule '%s'" % method)
+
+	def volume(self, rtol = 2e-2, confidence = 0.95, return_interval = False):
+		r""" Volume of the domain
+
+		The volume is computed exactly for box domains 
+		and for polytopes (domains with only linear inequality constraints) of modest dimension
+		using Qhull to decompose the polytope.
+		Otherwise the volume is estimated using Monte-Carlo.
+		When the domain fills a reasonable fraction of its bounding box,
+		points are sampled uniformly from the bounding box.
+		Otherwise, a multiphase Monte-Carlo estimator is used [LV06]_:
+		starting from a ball :math:`B_0` inside the domain :math:`\mathcal D`,
+		we use a sequence of concentric balls :math:`B_0 \subset B_1 \subset \cdots \subset B_k`
+		with :math:`\mathcal D \subset B_k` and write
+
+		.. math::
+
+			\text{vol}(\mathcal D) = \text{vol}(B_0) \prod_{i=1}^k 
+				\frac{\text{vol}(\mathcal D \cap B_i)}{\text{vol}(\mathcal D\cap B_{i-1})}
+
+		where each ratio is estimated using hit-and-run samples from :math:`\mathcal D\cap B_i`.
+		As the radii grow slowly, no ratio is small, and hence each is estimated accurately.
+
+		Samples are drawn until the confidence interval for the volume has 
+		a relative half-width below rtol (treating the hit-and-run samples as independent)
+		or a fixed sample budget is exhausted; in the latter case a warning is issued 
+		and the returned interval reflects the accuracy actually achieved.
+		Estimates are cached on the domain with the constraints that define it,
+		so repeated calls are free unless a more accurate estimate is requested.
+
+		Parameters
+		----------
+		rtol: float, optional
+			Requested relative accuracy of the estimate
+		confidence: float, optional
+			Confidence level of the interval used to measure the accuracy
+		return_interval: bool, optional
+			If True, also return the confidence interval
+
+		Returns
+		-------
+		vol: float
+			Volume of the domain
+		interval: tuple of floats
+			If return_interval is True, the lower and upper limits of the confidence interval
+
+		References
+		----------
+		.. [LV06] Laszlo Lovasz and Santosh Vempala.
+			Simulated annealing in convex bodies and an O*(n^4) volume algorithm.
+			Journal of Computer and System Sciences 72 (2006) pp. 392--417.
+		"""
+		z = scipy.stats.norm.ppf((1. + confidence)/2.)
+		vol, sd = self._volume_cached(rtol/z)
+		if sd > rtol/z:
+			warnings.warn("The volume estimate only reached a relative accuracy of %.2g" % (z*sd))
+		if return_interval:
+			if sd == 0:
+				return vol, (vol, vol)
+			return vol, (vol*np.exp(-z*sd), vol*np.exp(z*sd))
+		return vol
+
+	def _volume_key(self):
+		r""" A digest of the data defining the domain, used to cache the volume
+		"""
+		arrays = [self.lb, self.ub, self.A, self.b, self.A_eq, self.b_eq, np.array(self.rhos)] 
+		arrays += list(self.Ls) + list(self.ys) + [getattr(self, '_X', np.zeros(0))]
+		h = hashlib.sha1(type(self).__name__.encode())
+		for a in arrays:
+			a = np.ascontiguousarray(a, dtype = float)
+			h.update(str(a.shape).encode())
+			h.update(a.tobytes())
+		return h.hexdigest()
+
+	def _volume_cached(self, sd):
+		r""" Volume and the standard deviation of its logarithm, reusing a cached estimate if accurate enough
+
+		Estimates limited by the sample budget are reused for any request at least as accurate
+		as the one that produced them, as repeating the computation would not improve them.
+		"""
+		try:
+			cache = self._volume_cache
+		except AttributeError:
+			cache = self._volume_cache = {}
+
+		key = self._volume_key()
+		if key not in cache or min(cache[key][1], cache[key][2]) > sd:
+			cache[key] = self._volume(sd) + (sd,)
+		return cache[key][:2]
+
+	def _volume(self, sd):
+		r""" Estimate the volume so the standard deviation of the estimate of its logarithm is at most sd
+		"""
+		if not np.all(np.isfinite(self.norm_lb) & np.isfinite(self.norm_ub)):
+			return np.inf, 0.
+		vol = self._volume_exact()
+		if vol is not None:
+			return vol, 0.
+		
+		# When the domain occupies a large fraction of its bounding box, rejection sampling is cheapest;
+		# otherwise switch to multiphase Monte-Carlo if possible.
+		# A pilot run estimates how many points rejection would need.
+		vol, sd_reject, n, n_req = self._volume_reject(sd, n_max = 0)
+		if sd_reject > sd and n_req <= _VOLUME_REJECT_MAX:
+			vol, sd_reject, n, n_req = self._volume_reject(sd, n_max = _VOLUME_REJECT_MAX)
+		if sd_reject > sd:
+			est = self._volume_multiphase(sd)
+			if est is not None:
+				return est
+			# Otherwise use as many points as the budget allows
+			if n < _VOLUME_REJECT_MAX:
+				vol, sd_reject, n, n_req = self._volume_reject(sd, n_max = _VOLUME_REJECT_MAX)
+		return vol, sd_reject
+
+	def _volume_exact(self):
+		r""" Exact volume of the domain, or None if this cannot be computed cheaply
+		"""
 		if self.is_box_domain:
-			# if the domain is a box domain, this is simple
-			vol = np.prod(self.ub - self.lb)
-		else:
-			N = int(N)
-			# Otherwise we estimate the volume of domain using Monte-Carlo
-			Xt = np.random.uniform(self.norm_lb, self.norm_ub, size = (N, len(self)))
-			vol = np.prod(self.norm_ub - self.norm_lb)*(np.sum(self.isinside(Xt))/(N))
+			return float(np.prod(self.ub - self.lb))
+		if len(self.A_eq) > 0 or np.any(self._unnormalize_scale() == 0):
+			return 0.
+		if self.is_linineq_domain and len(self) <= _VOLUME_EXACT_MAX_DIM:
+			halfspaces = self._polytope_halfspaces_norm()
+			if halfspaces is not None:
+				vol = _polytope_volume(*halfspaces)
+				if vol is not None:
+					return vol*float(np.prod(self._unnormalize_scale()))
+		return None
+
+	def _polytope_halfspaces_norm(self):
+		r""" Linear inequality and bound constraints A x <= b in normalized coordinates
+		"""
+		I = np.eye(len(self))
+		lb, ub = self.lb_norm, self.ub_norm
+		Ilb, Iub = np.isfinite(lb), np.isfinite(ub)
+		A = np.vstack([self.A_norm, -I[Ilb], I[Iub]])
+		b = np.hstack([self.b_norm, -lb[Ilb], ub[Iub]])
+		return A, b
+
+	def _volume_reject(self, sd, n_max, n_pilot = 10**4, chunk = 10**5):
+		r""" Estimate the volume from the fraction of points in the bounding box inside the domain
+
+		Stops when the standard deviation of the log volume is less than sd
+		or n_max points (at least n_pilot) have been drawn.
+
+		Returns
+		-------
+		vol: float
+			Estimated volume
+		sd: float
+			Estimated standard deviation of the logarithm of the volume
+		n: int
+			Number of points drawn
+		n_req: int
+			Estimated number of points needed to reach the requested accuracy
+		"""
+		lb, ub = self.norm_lb, self.norm_ub
+		box_vol = float(np.prod(ub - lb))
+		n = hits = 0
+		n_req = n_pilot
+		n_max = max(n_max, n_pilot)
+		while n < min(n_req, n_max):
+			batch = int(min(chunk, n_req - n, n_max - n))
+			X = np.random.uniform(lb, ub, size = (batch, len(self)))
+			hits += int(np.sum(self.isinside(X)))
+			n += batch
+			# The variance of the log of the fraction p of points inside is approximately (1-p)/(p n)
+			p = max(hits, 0.5)/n
+			n_req = max(n_pilot, int(np.ceil((1 - p)/(p*sd**2))))
+		# If no points were inside, use half a hit so that the estimate and its interval are positive
+		p = max(hits, 0.5)/n
+		return box_vol*p, np.sqrt((1 - p)/(p*n)), n, n_req
+
+	def _inscribed_ball_norm(self):
+		r""" Center and radius of a large ball inside the domain in normalized coordinates
+		"""
+		m = len(self)
+		A, b = self._polytope_halfspaces_norm()
+		x = cp.Variable(m)
+		r = cp.Variable(1)
+		constraints = [A @ x + np.linalg.norm(A, axis = 1)*r <= b]
+		for L, y, rho in zip(self.Ls_norm, self.ys_norm, self.rhos_norm):
+			constraints.append(cp.norm(L @ x - L @ y) + np.linalg.norm(L, 2)*r <= rho)
+		problem = cp.Problem(cp.Maximize(r), constraints)
+		problem.solve(**self.kwargs)
+		if problem.status not in ['optimal', 'optimal_inaccurate']:
+			raise SolverError("CVXPY exited with status '%s'" % problem.status)
+		return np.array(x.value).reshape(m), float(r.value)
+
+	def _volume_multiphase(self, sd, chains = 200, max_steps = 10**5, burn = 20):
+		r""" Multiphase Monte-Carlo volume estimate; see :meth:`volume`
+
+		Returns None if this domain does not support this estimator.
+		"""
+		if not self.is_linquad_domain:
+			return None
+
+		m = len(self)
+		A, b = self._polytope_halfspaces_norm()
+		quad = list(zip(self.Ls_norm, self.ys_norm, self.rhos_norm))
+		c, r0 = self._inscribed_ball_norm()
+		if r0 <= 0:
+			return 0., 0.
+	
+		# The normalized domain is inside the box [-1,1]^m;
+		# the radii increase geometrically so that consecutive balls have volume ratio at most e
+		R = np.linalg.norm(np.maximum(np.abs(-1 - c), np.abs(1 - c)))
+		# and inside any bounded ellipsoid
+		for L, y, rho in quad:
+			s = scipy.linalg.svdvals(L)
+			if len(s) == m and s[-1] > 0:
+				R = min(R, np.linalg.norm(c - y) + rho/s[-1])
+		k = max(1, int(np.ceil(np.log(R/r0)/np.log1p(1./m))))
+		radii = r0*(R/r0)**(np.arange(k+1)/k)
+		
+		# Split the variance evenly between phases
+		var_phase = sd**2/k
+		logvol = m/2.*np.log(np.pi) - scipy.special.gammaln(m/2. + 1) + m*np.log(r0)
+		var = 0.
+
+		def step(X, r):
+			D = np.random.randn(chains, m)
+			lo, hi = _chords(X, D, A, b, quad + [(np.eye(m), c, r)])
+			X += np.random.uniform(lo, hi).reshape(-1,1)*D
+
+		# Each phase starts with the chains where the previous phase ended,
+		# concentrated in the smaller ball; without enough steps for them to spread 
+		# into the larger ball, the ratio of volumes is overestimated
+		X = np.tile(c, (chains, 1))
+		for r_in, r_out in zip(radii[:-1], radii[1:]):
+			for it in range(burn*m):
+				step(X, r_out)
+
+			# The fraction of steps each chain spends inside the smaller ball
+			# are independent estimates of the ratio of volumes, 
+			# and so their variance accounts for the correlation between steps
+			hits = np.zeros(chains)
+			steps = 0
+			while steps < max_steps:
+				for it in range(m):
+					step(X, r_out)
+					hits += np.sum((X - c)**2, axis = 1) <= r_in**2
+				steps += m
+				p = hits/steps
+				p_mean = max(np.mean(p), 0.5/(steps*chains))
+				var_phase_est = np.var(p, ddof = 1)/chains/p_mean**2
+				if np.mean(p) > 0 and var_phase_est <= var_phase:
+					break
+			logvol -= np.log(p_mean)
+			var += var_phase_est
 
-		return vol	
+		return float(np.exp(logvol)*np.prod(self._unnormalize_scale())), np.sqrt(var)
 
 
 	@cached_property
@@ -893,8 +1294,8 @@ class EuclideanDomain(Domain):
 			# Orthogonalize against equality constarints constraints
 			p /= np.linalg.norm(p)
 
-			alpha_min = -self.extent(x0, -p)
-			alpha_max =  self.extent(x0,  p)
+			alpha_max, alpha_min = self.extents(x0, p)
+			alpha_min, alpha_max = -alpha_min[0], alpha_max[0]
 			if alpha_max - alpha_min > 1e-7:
 				alpha = np.random.uniform(alpha_min, alpha_max)
 				# We call closest point just to make sure we stay inside numerically
@@ -968,33 +1369,31 @@ class EuclideanDomain(Domain):
 
 	@property
 	def A_norm(self):
-		D = self._unnormalize_der()
-		return self.A.dot(D)
+		return self.A*self._unnormalize_scale()
 
 	@property
 	def b_norm(self):
-		c = self._center()
+		c = self._affine[0]
 		return self.b - self.A.dot(c)
 
 	@property
 	def A_eq_norm(self):	
-		D = self._unnormalize_der()
-		return self.A_eq.dot(D)
+		return self.A_eq*self._unnormalize_scale()
 
 	@property
 	def b_eq_norm(self):
-		c = self._center()
+		c = self._affine[0]
 		return self.b_eq - self.A_eq.dot(c)
 
 	@property
 	def Ls_norm(self):
-		D = self._unnormalize_der()
-		return [ L.dot(D) for L in self.Ls]
+		scale = self._unnormalize_scale()
+		return [ L*scale for L in self.Ls]
 			
 	@property
 	def ys_norm(self):
-		c = self._center()
-		return [y - c for y in self.ys]	
+		c, scale, inv_scale = self._affine
+		return [(y - c)*inv_scale for y in self.ys]	
 
 	@property
 	def rhos_norm(self):
@@ -1024,20 +1423,24 @@ class EuclideanDomain(Domain):
 			return self._norm_lb
 		except AttributeError:
 			self._norm_lb = -np.inf*np.ones(len(self))
-			for i in range(len(self)):
-				ei = np.zeros(len(self))
-				ei[i] = 1
-				if np.isfinite(self.lb[i]):
-					self._norm_lb[i] = self.lb[i]
-					# This ensures normalization maintains positive orientation
-					if np.isfinite(self.ub[i]):
-						self._norm_lb[i] = min(self._norm_lb[i], self.ub[i])
-				else:
-					try:
-						x_corner = self.corner(-ei)
-						self._norm_lb[i] = x_corner[i]	
-					except (SolverError, UnboundedDomainException):
-						self._norm_lb[i] = -np.inf
+			self._norm_bounds_pending += 1
+			try:
+				for i in range(len(self)):
+					ei = np.zeros(len(self))
+					ei[i] = 1
+					if np.isfinite(self.lb[i]):
+						self._norm_lb[i] = self.lb[i]
+						# This ensures normalization maintains positive orientation
+						if np.isfinite(self.ub[i]):
+							self._norm_lb[i] = min(self._norm_lb[i], self.ub[i])
+					else:
+						try:
+							x_corner = self.corner(-ei)
+							self._norm_lb[i] = x_corner[i]	
+						except (SolverError, UnboundedDomainException):
+							self._norm_lb[i] = -np.inf
+			finally:
+				self._norm_bounds_pending -= 1
 
 			return self._norm_lb
 
@@ -1054,20 +1457,24 @@ class EuclideanDomain(Domain):
 			# choose a reasonable value to initialize this property, which
 			# will be used until the remainder of the corner calls are made
 			self._norm_ub = np.inf*np.ones(len(self))
-			for i in range(len(self)):
-				ei = np.zeros(len(self))
-				ei[i] = 1
-				if np.isfinite(self.ub[i]):
-					self._norm_ub[i] = self.ub[i]
-					# This ensures normalization maintains positive orientation
+			self._norm_bounds_pending += 1
+			try:
+				for i in range(len(self)):
+					ei = np.zeros(len(self))
+					ei[i] = 1
 					if np.isfinite(self.ub[i]):
-						self._norm_ub[i] = max(self._norm_ub[i], self.lb[i])
-				else:
-					try:
-						x_corner = self.corner(ei)
-						self._norm_ub[i] = x_corner[i]	
-					except (SolverError, UnboundedDomainException):
-						self._norm_ub[i] = np.inf
+						self._norm_ub[i] = self.ub[i]
+						# This ensures normalization maintains positive orientation
+						if np.isfinite(self.ub[i]):
+							self._norm_ub[i] = max(self._norm_ub[i], self.lb[i])
+					else:
+						try:
+							x_corner = self.corner(ei)
+							self._norm_ub[i] = x_corner[i]	
+						except (SolverError, UnboundedDomainException):
+							self._norm_ub[i] = np.inf
+			finally:
+				self._norm_bounds_pending -= 1
 			
 			return self._norm_ub
 	
@@ -1078,19 +1485,50 @@ class EuclideanDomain(Domain):
 	def isnormalized(self):
 		return np.all( (~np.isfinite(self.norm_lb)) | (self.norm_lb == -1.) ) and np.all( (~np.isfinite(self.norm_ub)) | (self.norm_ub == 1.) ) 
 
-	def _normalize_der(self):
-		"""Derivative of normalization function"""
+	# Number of normalization bounds currently being computed;
+	# while positive, the normalization is provisional and is not cached
+	_norm_bounds_pending = 0
 
-		slope = np.ones(len(self))
+	@property
+	def _affine(self):
+		r""" The affine map between normalized and application units
+
+		Returns a tuple (center, scale, inv_scale) of read-only vectors such that
+		:code:`X = X_norm*scale + center` and :code:`X_norm = (X - center)*inv_scale`.
+		This is computed once the normalization bounds are known and then cached.
+		"""
+		try:
+			return self._affine_map
+		except AttributeError:
+			pass
+		
+		scale = np.ones(len(self))
 		I = (self.norm_ub != self.norm_lb) & np.isfinite(self.norm_lb) & np.isfinite(self.norm_ub)
-		slope[I] = 2.0/(self.norm_ub[I] - self.norm_lb[I])
-		return np.diag(slope)
+		scale[I] = (self.norm_ub[I] - self.norm_lb[I])/2.0
+		affine = (np.array(self._center(), dtype = float), scale, 1./scale)
+		for v in affine:
+			v.setflags(write = False)
+		
+		if self._norm_bounds_pending == 0:
+			self._affine_map = affine
+		return affine
+
+	def _normalize_scale(self):
+		r""" Diagonal of the derivative of the normalization function
+		"""
+		return self._affine[2]
+
+	def _unnormalize_scale(self):
+		r""" Diagonal of the derivative of the unnormalization function
+		"""
+		return self._affine[1]
+
+	def _normalize_der(self):
+		"""Derivative of normalization function"""
+		return np.diag(self._normalize_scale())
 
 	def _unnormalize_der(self):
-		slope = np.ones(len(self))
-		I = (self.norm_ub != self.norm_lb) & np.isfinite(self.norm_lb) & np.isfinite(self.norm_ub)
-		slope[I] = (self.norm_ub[I] - self.norm_lb[I])/2.0
-		return np.diag(slope)
+		return np.diag(self._unnormalize_scale())
 	
 	def _center(self):
 		c = np.zeros(len(self))
@@ -1098,17 +1536,17 @@ class EuclideanDomain(Domain):
 		c[I] = (self.norm_lb[I] + self.norm_ub[I])/2.0
 		return c	
 
-	def _normalize(self, X):
-		c = self._center()
-		D = self._normalize_der()
-		X_norm = D.dot( (X - c.reshape(1,-1)).T ).T
-		return X_norm
+	def _normalize(self, X, out = None):
+		c, scale, inv_scale = self._affine
+		out = np.subtract(X, c, out = out)
+		out *= inv_scale
+		return out
 	
-	def _unnormalize(self, X_norm, **kwargs):
-		c = self._center()
-		Dinv = self._unnormalize_der()
-		X = Dinv.dot(X_norm.T).T + c.reshape(1,-1)
-		return X 
+	def _unnormalize(self, X_norm, out = None):
+		c, scale, inv_scale = self._affine
+		out = np.multiply(X_norm, scale, out = out)
+		out += c
+		return out
 
 	################################################################################		
 	# Bound checking
@@ -1130,79 +1568,154 @@ class EuclideanDomain(Domain):
 
 	def _isinside_ineq(self, X, tol = None):
 		if tol is None: tol = self.tol
-		return np.array([np.all(np.dot(self.A, x) <= self.b + tol) for x in X], dtype = np.bool)
+		if len(self.b) == 0:
+			return np.ones(len(X), dtype = bool)
+		return np.all(X @ self.A.T <= self.b + tol, axis = 1)
 
 	def _isinside_eq(self, X, tol = None):
 		if tol is None: tol = self.tol
-		return np.array([np.all( np.abs(np.dot(self.A_eq, x) - self.b_eq) < tol) for x in X], dtype = np.bool)
+		if len(self.b_eq) == 0:
+			return np.ones(len(X), dtype = bool)
+		return np.all(np.abs(X @ self.A_eq.T - self.b_eq) < tol, axis = 1)
 
 	def _isinside_quad(self, X, tol = None):
 		"""check that points are inside quadratic constraints"""
 		if tol is None: tol = self.tol
-		inside = np.ones(X.shape[0],dtype = np.bool)
+		inside = np.ones(X.shape[0],dtype = bool)
 		for L, y, rho in zip(self.Ls, self.ys, self.rhos):
-			diff = X - np.tile(y.reshape(1,-1), (X.shape[0],1))
-			Ldiff = L.dot(diff.T).T
-			Ldiff_norm = np.sum(Ldiff**2,axis=1)
-			inside = inside & (np.sqrt(Ldiff_norm) <= rho + tol)
+			Ldiff = (X - y) @ L.T
+			inside &= np.sqrt(np.sum(Ldiff**2, axis = 1)) <= rho + tol
 		return inside
-	
+
+	@property
+	def _linquad_constraints(self):
+		r""" Constraints in the form used by _isinside_linquad; computed once as domains are immutable
+		"""
+		try:
+			return self._linquad_constraints_cache
+		except AttributeError:
+			lb, ub = self.lb, self.ub
+			self._linquad_constraints_cache = {
+				'lb': np.where(np.isfinite(lb), lb, -np.inf), 
+				'ub': np.where(np.isfinite(ub), ub, np.inf),
+				'A': np.asarray(self.A, dtype = float), 'b': np.asarray(self.b, dtype = float),
+				'A_eq': np.asarray(self.A_eq, dtype = float), 'b_eq': np.asarray(self.b_eq, dtype = float),
+				'quad': [(np.asarray(L).T, np.asarray(y), rho) for L, y, rho in zip(self.Ls, self.ys, self.rhos)],
+				'A_aug': self.A_aug, 'b_aug': self.b_aug,
+				}
+			return self._linquad_constraints_cache
+
+	def _isinside_linquad(self, X, tol = TOL, return_slack = False):
+		r""" Check bound, linear inequality, equality, and quadratic constraints together
+
+		Points are processed in chunks so that temporaries stay in cache;
+		within each chunk, the linear inequalities are evaluated with a single matrix product
+		and the remaining constraints are only evaluated on points that satisfy the previous ones.
+		
+		If return_slack is True, this also returns the slack in each inequality constraint;
+		see :meth:`slack`.
+		"""
+		con = self._linquad_constraints
+		M, m = X.shape
+		inside = np.ones(M, dtype = bool)
+		if return_slack:
+			A_aug, b_aug = con['A_aug'], con['b_aug']
+			slack = np.empty((M, len(b_aug) + len(con['quad'])))
+
+		chunk = max(256, 2**19 // (len(con['b']) + len(con['b_eq']) + 2*m))
+		for start in range(0, M, chunk):
+			Xc = X[start:start+chunk]
+			ok = inside[start:start+chunk]
+
+			if return_slack:
+				S = slack[start:start+chunk]
+				np.subtract(b_aug, Xc @ A_aug.T, out = S[:,:len(b_aug)])
+				for k, (LT, y, rho) in enumerate(con['quad']):
+					S[:,len(b_aug)+k] = rho - np.sqrt(np.sum(((Xc - y) @ LT)**2, axis = 1))
+				ok &= np.all(S >= -tol, axis = 1)
+				if len(con['b_eq']) > 0:
+					ok &= np.all(np.abs(Xc @ con['A_eq'].T - con['b_eq']) < tol, axis = 1)
+				continue
+
+			ok &= np.all(Xc >= con['lb'] - tol, axis = 1)
+			ok &= np.all(Xc <= con['ub'] + tol, axis = 1)
+			if len(con['b']) > 0:
+				ok &= np.all(Xc @ con['A'].T <= con['b'] + tol, axis = 1)
+
+			# Only check the remaining constraints on points that are still inside
+			if len(con['b_eq']) > 0 or len(con['quad']) > 0:
+				I = np.flatnonzero(ok)
+				if len(I) > 0 and len(con['b_eq']) > 0:
+					keep = np.all(np.abs(Xc[I] @ con['A_eq'].T - con['b_eq']) < tol, axis = 1)
+					ok[I[~keep]] = False
+					I = I[keep]
+				for LT, y, rho in con['quad']:
+					if len(I) == 0:
+						break
+					keep = np.sum(((Xc[I] - y) @ LT)**2, axis = 1) <= (rho + tol)**2
+					ok[I[~keep]] = False
+					I = I[keep]
+
+		if return_slack:
+			return inside, slack
+		return inside
+
+	def slack(self, X):
+		r""" Slack in each inequality constraint of the domain
+
+		For a domain with linear inequality constraints 
+		(including the bound constraints as given by :code:`A_aug` and :code:`b_aug`)
+		and quadratic constraints :math:`\| \mathbf{L}_i(\mathbf{x} - \mathbf{y}_i)\|_2 \le \rho_i`,
+		this computes 
+
+		.. math::
+
+			[\mathbf{b}_{\text{aug}} - \mathbf{A}_{\text{aug}}\mathbf{x}, \ 
+			\rho_1 - \| \mathbf{L}_1(\mathbf{x} - \mathbf{y}_1)\|_2, \ \ldots]
+
+		so a point satisfies the inequality constraints if every entry is nonnegative.
+		Equality constraints are not included.
+
+		Parameters
+		----------
+		X: np.ndarray(M, m)
+			Points at which to compute the slack
+
+		Returns
+		-------
+		slack: np.ndarray(M, len(b_aug) + len(rhos))
+			Slack in each constraint
+		"""
+		X = np.atleast_2d(X)
+		if not self.is_linquad_domain:
+			raise NotImplementedError
+		return self._isinside_linquad(X, return_slack = True)[1]
+
 
 	################################################################################		
 	# Extent functions 
 	################################################################################		
 	
+	# These find the extent with respect to each kind of constraint separately;
+	# see _extents for the extent with respect to all constraints at once
+
 	def _extent_bounds(self, x, p):
 		"""Check the extent from the box constraints"""
-		alpha = np.inf
-		
-		# If on the boundary, the direction needs to point inside the domain
-		# otherwise we cannot move
-		if np.any(p[self.lb == x] < 0):
-			return 0.
-		if np.any(p[self.ub == x] > 0):
-			return 0.	
-		
-		# To prevent divide-by-zero we ignore directions we are not moving in
-		I = np.nonzero(p)
-
-		# Check upper bounds
-		y = (self.ub - x)[I]/p[I]
-		if np.any(y>0):
-			alpha = min(alpha, np.min(y[y>0]))	
-
-		# Check lower bounds
-		y = (self.lb - x)[I]/p[I]
-		if np.any(y>0):
-			alpha = min(alpha, np.min(y[y>0]))
-		
-		return alpha
+		con = self._linquad_constraints
+		I = np.eye(len(self))
+		Ilb, Iub = np.isfinite(con['lb']), np.isfinite(con['ub'])
+		A = np.vstack([-I[Ilb], I[Iub]])
+		b = np.hstack([-con['lb'][Ilb], con['ub'][Iub]])
+		return max(_chords(x.reshape(1,-1), p.reshape(1,-1), A, b)[1][0], 0.)
 
 	def _extent_ineq(self, x, p):
 		""" check the extent from the inequality constraints """
-		alpha = np.inf
-		# positive extent
-		with np.errstate(divide = 'ignore'):
-			y = (self.b - np.dot(self.A, x)	)/np.dot(self.A, p)
-		if np.sum(y>0) > 0:
-			alpha = min(alpha, np.min(y[y>0]))
-
-		return alpha
+		con = self._linquad_constraints
+		return max(_chords(x.reshape(1,-1), p.reshape(1,-1), con['A'], con['b'])[1][0], 0.)
 	
 	def _extent_quad(self, x, p):
 		""" check the extent from the quadratic constraints"""
-		alpha = np.inf
-		for L, y, rho in zip(self.Ls, self.ys, self.rhos):
-			Lp = L.dot(p)
-			Lxy = L.dot(x - y)
-			# Terms in quadratic formula a alpha^2 + b alpha + c
-			a = Lp.T.dot(Lp)
-			b = 2*Lp.T.dot(Lxy)
-			c = Lxy.T.dot(Lxy) - rho**2
-			
-			roots = np.roots([a,b,c])
-			real_roots = roots[np.isreal(roots)]
-			pos_roots = real_roots[real_roots>=0]
-			if len(pos_roots) > 0:
-				alpha = min(alpha, min(pos_roots))
-		return alpha
+		con = self._linquad_constraints
+		quad = [(LT.T, y, rho) for LT, y, rho in con['quad']]
+		A, b = np.zeros((0, len(self))), np.zeros(0)
+		return max(_chords(x.reshape(1,-1), p.reshape(1,-1), A, b, quad)[1][0], 0.)
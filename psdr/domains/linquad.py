@@ -13,7 +13,7 @@ from __future__ import division
 import numpy as np
 import cvxpy as cp
 from .domain import TOL, DEFAULT_CVXPY_KWARGS
-from .euclidean import EuclideanDomain
+from .euclidean import EuclideanDomain, _chords
 from .tensor import TensorProductDomain
 
 from ..misc import merge
@@ -252,14 +252,23 @@ class LinQuadDomain(EuclideanDomain):
 			names = names_norm, **merge(self.kwargs, kwargs))
 
 	def _isinside(self, X, tol = TOL):
-		return self._isinside_bounds(X, tol = tol) & self._isinside_ineq(X, tol = tol) & self._isinside_eq(X, tol = tol) & self._isinside_quad(X, tol = tol)
+		return self._isinside_linquad(X, tol = tol)
 
 	def _extent(self, x, p):
-		# Check that direction satisfies equality constraints to a tolerance
-		if self.A_eq.shape[0] == 0 or np.all(np.abs(self.A_eq.dot(p) ) < self.tol):
-			return min(self._extent_bounds(x, p), self._extent_ineq(x, p), self._extent_quad(x, p))
-		else:
-			return 0. 
+		alpha_forward, alpha_backward = self._extents(x.reshape(1,-1), np.asarray(p, dtype = float).reshape(1,-1))
+		return max(alpha_forward[0], 0.)
+
+	def _extents(self, X, P):
+		# The bounds, linear inequality, and quadratic constraints are handled together,
+		# solving for the roots of all the quadratic constraints along every line at once
+		con = self._linquad_constraints
+		lo, hi = _chords(X, P, con['A_aug'], con['b_aug'], [(LT.T, y, rho) for LT, y, rho in con['quad']])
+		# Directions that leave the equality constraints cannot move at all
+		if len(con['b_eq']) > 0:
+			I = np.any(np.abs(P @ con['A_eq'].T) >= self.tol, axis = 1)
+			lo[I] = 0.
+			hi[I] = 0.
+		return hi, -lo
 
 	################################################################################		
 	# Convex Solver Functions 
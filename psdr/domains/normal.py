@@ -1,12 +1,31 @@
 from __future__ import division
 
 import numpy as np
-import scipy
+import scipy.linalg
+import scipy.special
+import scipy.stats
+
+import cvxpy as cp
 
 from ..misc import merge
+from ..exceptions import SolverError, EmptyDomainException
 from .domain import TOL, DEFAULT_CVXPY_KWARGS
 from .random import RandomDomain
 from .linquad import LinQuadDomain
+from .euclidean import _chords
+
+
+def _gibbs_step(Z, A, b, quad):
+	r""" One hit-and-run step for each row of Z of the standard normal distribution restricted to 
+	:math:`\mathbf A \mathbf z \le \mathbf b` and the quadratic constraints quad
+	"""
+	D = np.random.randn(*Z.shape)
+	D /= np.linalg.norm(D, axis = 1).reshape(-1,1)
+	lo, hi = _chords(Z, D, A, b, quad)
+	# Along the line z + t d the density is proportional to exp(-(t + z.d)^2/2)
+	mu = -np.sum(Z*D, axis = 1)
+	t = scipy.stats.truncnorm.rvs(lo - mu, hi - mu) + mu
+	Z += t.reshape(-1,1)*D
 
 class NormalDomain(LinQuadDomain, RandomDomain):
 	r""" Domain described by a normal distribution
@@ -35,6 +54,21 @@ class NormalDomain(LinQuadDomain, RandomDomain):
 	This is done so that the domain has compact support which is necessary for several metric-based sampling strategies.
 
 
+	The distribution can be further restricted to a polytope by providing 
+	bounds and linear inequality constraints (or calling :meth:`add_constraints`);
+	the density is then proportional to the normal density on the resulting domain.
+
+	Samples without linear constraints are drawn exactly:
+	a standard normal sample is rescaled so that its radius follows the (truncated) chi distribution
+	using the inverse of its cumulative distribution function, 
+	and then mapped into this distribution using the Cholesky factor.
+	With linear constraints, samples are drawn using a hit-and-run Gibbs sampler
+	in coordinates where the distribution is a standard normal:
+	each step picks a random direction, finds the chord through the current point
+	in this direction, and draws the step along the chord from the (exact) one-dimensional 
+	truncated normal conditional distribution.
+	Many chains are run at once and their state is kept between calls to :meth:`sample`.
+
 	Parameters
 	----------
 	mean : array-like (m,)
@@ -43,8 +77,18 @@ class NormalDomain(LinQuadDomain, RandomDomain):
 		Positive definite Covariance matrix; defaults to the identity matrix
 	truncate: float in [0,1), optional
 		Amount to truncate the domain to ensure compact support
+	names: list of strings, optional
+		Names for each of the parameters in the space
+	lb: array-like (m,), optional
+		Lower bounds
+	ub: array-like (m,), optional
+		Upper bounds
+	A: array-like (n,m), optional
+		Matrix in left-hand side of inequality constraint
+	b: array-like (n,), optional
+		Vector in right-hand side of the inequality constraint
 	"""
-	def __init__(self, mean, cov = None, truncate = None, names = None, **kwargs):
+	def __init__(self, mean, cov = None, truncate = None, names = None, lb = None, ub = None, A = None, b = None, **kwargs):
 		self.tol = 1e-6	
 		self.kwargs = merge(DEFAULT_CVXPY_KWARGS, kwargs)
 		######################################################################################	
@@ -91,23 +135,107 @@ class NormalDomain(LinQuadDomain, RandomDomain):
 			self._ys = []
 			self._rhos = []
 
+		self._lb = self._init_lb(lb)
+		self._ub = self._init_ub(ub)
+		self._A, self._b = self._init_ineq(A, b)
+
 		self._init_names(names)
 
+	@property
+	def _is_polytope_restricted(self):
+		return len(self.b) > 0 or np.any(np.isfinite(self.lb)) or np.any(np.isfinite(self.ub))
+
 	def _sample(self, draw = 1):
-		X = np.random.randn(draw, self.mean.shape[0])
-		if self.clip is not None:
-			# Under the assumption that the truncation parameter is small,
-			# we use replacement sampling.
-			while True:
-				# Find points that violate the clipping
-				I = np.sum(X**2, axis = 1) > self.clip
-				if np.sum(I) == 0:
-					break
-				X[I,:] = np.random.randn(np.sum(I), self.mean.shape[0])
+		if self._is_polytope_restricted:
+			Z = self._sample_hit_and_run(draw)
+		else:
+			Z = self._sample_radial(draw)
 		
 		# Convert from standard normal into this domain
-		X = (self.mean.reshape(-1,1) + self.L.dot(X.T) ).T
-		return X
+		return self.mean + Z @ self.L.T
+
+	def _sample_radial(self, draw):
+		r""" Exact samples of the (truncated) standard normal distribution
+		"""
+		m = len(self)
+		Z = np.random.randn(draw, m)
+		if self.clip is not None:
+			# The direction Z/|Z| is uniform and independent of the radius |Z|, 
+			# so we replace the radius by one drawn from the truncated chi distribution
+			u = np.random.uniform(0, 1 - self.truncate, size = draw)
+			if m == 1:
+				r = scipy.special.ndtri(0.5 + u/2.)
+			else:
+				r = np.sqrt(2*scipy.special.gammaincinv(m/2., u))
+			Z *= (r/np.linalg.norm(Z, axis = 1)).reshape(-1,1)
+		return Z
+
+	@property
+	def _whitened_constraints(self):
+		r""" Linear constraints A z <= b on the standard normal variable z where x = mean + L z
+		"""
+		try:
+			return self._whitened_constraints_cache
+		except AttributeError:
+			A, b = self.A_aug, self.b_aug
+			self._whitened_constraints_cache = (A @ self.L, b - A @ self.mean)
+			return self._whitened_constraints_cache
+
+	@property
+	def _whitened_quad(self):
+		m = len(self)
+		return [] if self.clip is None else [(np.eye(m), np.zeros(m), np.sqrt(self.clip))]
+
+	def _whitened_interior_point(self):
+		r""" A point strictly inside the domain in whitened coordinates near the point closest to the mean
+
+		The point closest to the mean may lie (slightly) outside the constraints due to solver tolerances,
+		so we take the center of the largest ball inside the domain within a unit distance of this point.
+		"""
+		m = len(self)
+		A, b = self._whitened_constraints
+		z0 = self.Linv @ (self.closest_point(self.mean) - self.mean)
+		z = cp.Variable(m)
+		r = cp.Variable()
+		constraints = [A @ z + np.linalg.norm(A, axis = 1)*r <= b, cp.norm(z - z0) + r <= 1]
+		for LT, y, rho in self._whitened_quad:
+			constraints.append(cp.norm(z - y) + r <= rho)
+		problem = cp.Problem(cp.Maximize(r), constraints)
+		problem.solve(**self.kwargs)
+		if problem.status not in ['optimal', 'optimal_inaccurate']:
+			raise SolverError("CVXPY exited with status '%s'" % problem.status)
+		if r.value <= 0:
+			raise EmptyDomainException("The domain has no interior")
+
+		z = np.array(z.value).reshape(m)
+		if not (np.all(A @ z < b) and all(np.linalg.norm(z - y) < rho for LT, y, rho in self._whitened_quad)):
+			raise SolverError("Could not find a point strictly inside the domain")
+		return z
+
+	def _sample_hit_and_run(self, draw, chains = 1000):
+		r""" Hit-and-run samples of the standard normal distribution restricted to the domain
+
+		Each chain contributes consecutive samples separated by several steps.
+		"""
+		A, b = self._whitened_constraints
+		quad = self._whitened_quad
+		thin = max(len(self), 5)
+		
+		try:
+			Z = self._hit_and_run_chains
+		except AttributeError:
+			# Start every chain at a point strictly inside the domain and run until the chains are independent
+			Z = np.tile(self._whitened_interior_point(), (chains, 1))
+			for it in range(10*thin):
+				_gibbs_step(Z, A, b, quad)
+			self._hit_and_run_chains = Z
+
+		samples = []
+		for k in range(int(np.ceil(draw/len(Z)))):
+			for it in range(thin):
+				_gibbs_step(Z, A, b, quad)
+			samples.append(np.copy(Z))
+		return np.vstack(samples)[np.random.permutation(len(samples)*len(Z))[:draw]]
 
 
 	def _center(self):
@@ -120,25 +248,29 @@ class NormalDomain(LinQuadDomain, RandomDomain):
 		names_norm = [name + ' (normalized)' for name in self.names]
 		D = self._normalize_der()
 		return NormalDomain(self.normalize(self.mean), D.dot(self.cov).dot(D.T), truncate = self.truncate, names = names_norm, 
-			**merge(self.kwargs, kwargs))
+			lb = self.lb_norm, ub = self.ub_norm, A = self.A_norm, b = self.b_norm, **merge(self.kwargs, kwargs))
+
+	def add_constraints(self, A = None, b = None, lb = None, ub = None, A_eq = None, b_eq = None,
+		Ls = None, ys = None, rhos = None):
+		r"""Add new constraints to the domain
+
+		Adding bounds and linear inequality constraints yields a normal distribution restricted to a polytope;
+		other constraints yield a domain without the normal distribution.
+		"""
+		if A_eq is not None or Ls is not None:
+			return LinQuadDomain.add_constraints(self, A = A, b = b, lb = lb, ub = ub, A_eq = A_eq, b_eq = b_eq,
+				Ls = Ls, ys = ys, rhos = rhos)
+
+		A, b = self._init_ineq(A, b)
+		return NormalDomain(self.mean, self.cov, truncate = self.truncate, names = self.names, 
+			lb = np.maximum(self._init_lb(lb), self.lb), ub = np.minimum(self._init_ub(ub), self.ub),
+			A = np.vstack([self.A, A]), b = np.hstack([self.b, b]), **self.kwargs)
 
 	
 
 	################################################################################		
 	# Simple properties
 	################################################################################		
-	@property
-	def lb(self): return -np.inf*np.ones(len(self))
-	
-	@property
-	def ub(self): return np.inf*np.ones(len(self))
-
-	@property
-	def A(self): return np.zeros((0,len(self)))
-
-	@property
-	def b(self): return np.zeros(0)
-
 	@property
 	def A_eq(self): return np.zeros((0,len(self)))
 
@@ -147,17 +279,91 @@ class NormalDomain(LinQuadDomain, RandomDomain):
 
 
 	def _isinside(self, X, tol = TOL):
-		return self._isinside_quad(X, tol = tol) 
+		return self._isinside_linquad(X, tol = tol) 
 
 	def _pdf(self, X):
 		# Mahalanobis distance
 		d2 = np.sum(self.Linv.dot(X.T - self.mean.reshape(-1,1))**2, axis = 0)
 		# Normalization term
-		p = np.exp(-0.5*d2) / np.sqrt((2*np.pi)**len(self) * np.abs(scipy.linalg.det(self.cov)))
-		if self.truncate is not None:
-			# Normalization term
-			p /= (1-self.truncate)
+		logp = -0.5*d2 - 0.5*(len(self)*np.log(2*np.pi) + np.linalg.slogdet(self.cov)[1])
+		if self.truncate is not None or self._is_polytope_restricted:
+			# Normalize by the probability of the domain, in logarithms so that domains 
+			# far in the tails do not underflow
+			p = np.exp(logp - self._log_mass)
 			# probability is zero for those points outside of the domain
 			p *= self.isinside(X)
-			pass
-		return p
+			return p
+		return np.exp(logp)
+
+	@property
+	def _log_mass(self):
+		r""" Logarithm of the probability of the domain under the untruncated normal distribution
+		"""
+		try:
+			return self._log_mass_cache
+		except AttributeError:
+			log_mass = 0. if self.truncate is None else np.log1p(-self.truncate)
+			if self._is_polytope_restricted:
+				log_mass += self._log_mass_polytope()
+			self._log_mass_cache = log_mass
+			return log_mass
+
+	def _log_mass_polytope(self, chains = 1000, maxlevel = 200):
+		r""" Logarithm of the probability of the linear constraints under the (truncated) distribution
+
+		When the variables are independent and there are only bounds, this is computed exactly.
+		Otherwise we use a multiphase estimator (also known as subset simulation):
+		with :math:`g(\mathbf z)` the largest scaled violation of the linear constraints,
+		the domain is approached through the nested sets 
+		:math:`\lbrace \mathbf z : g(\mathbf z) \le t_k \rbrace` with decreasing levels :math:`t_k \ge 0`,
+		each chosen so that about half of the samples from the previous set lie inside.
+		Samples from each set are drawn using hit-and-run starting from the samples inside it,
+		and the product of the fractions inside is an estimate of the probability of the domain.
+		As each fraction is at least one half, this estimate is never zero.
+		"""
+		m = len(self)
+		diagonal = np.all(self.cov == np.diag(np.diag(self.cov)))
+		if (m == 1 or self.clip is None) and len(self.b) == 0 and diagonal:
+			# Independent bounds on each (standardized) variable
+			sigma = np.sqrt(np.diag(self.cov))
+			lo, hi = (self.lb - self.mean)/sigma, (self.ub - self.mean)/sigma
+			if self.clip is not None:
+				rho = np.sqrt(self.clip)
+				lo, hi = np.maximum(lo, -rho), np.minimum(hi, rho)
+				log_ball = np.log1p(-self.truncate)
+			else:
+				log_ball = 0.
+			if np.any(lo >= hi):
+				return -np.inf
+			# log(Phi(hi) - Phi(lo)), using the upper tail when lo > 0 to avoid cancellation
+			flip = lo > 0
+			lo, hi = np.where(flip, -hi, lo), np.where(flip, -lo, hi)
+			log_hi, log_lo = scipy.special.log_ndtr(hi), scipy.special.log_ndtr(lo)
+			return float(np.sum(log_hi + np.log1p(-np.exp(log_lo - log_hi)))) - log_ball
+
+		A, b = self._whitened_constraints
+		quad = self._whitened_quad
+		scale = np.linalg.norm(A, axis = 1)
+		nonzero = scale > 0
+		if np.any(b[~nonzero] < 0):
+			return -np.inf
+		A, b, scale = A[nonzero], b[nonzero], scale[nonzero]
+
+		def violation(Z):
+			return np.max((Z @ A.T - b)/scale, axis = 1, initial = -np.inf)
+	
+		thin = max(m, 5)
+		Z = self._sample_radial(chains)
+		log_mass = 0.
+		for level in range(maxlevel):
+			g = violation(Z)
+			t = max(np.median(g), 0.)
+			inside = g <= t
+			log_mass += np.log(np.mean(inside))
+			if t == 0:
+				return log_mass
+			# Restart the chains from the samples inside the next level
+			Z = Z[np.flatnonzero(inside)[np.random.randint(np.sum(inside), size = chains)]]
+			for it in range(thin):
+				_gibbs_step(Z, A, b + t*scale, quad)
+		raise EmptyDomainException("Could not reach the domain after %d levels" % maxlevel)
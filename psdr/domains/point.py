@@ -40,6 +40,9 @@ class PointDomain(BoxDomain):
 	def _extent(self, x, p, **kwargs):
 		return 0
 
+	def _extents(self, X, P):
+		return np.zeros(len(X)), np.zeros(len(X))
+
 	def _isinside(self, X, tol = TOL):
 		Pcopy = np.tile(self._x.reshape(1,-1), (X.shape[0],1))
 		return np.all(X == Pcopy, axis = 1)	
@@ -1,6 +1,7 @@
 from __future__ import division
 
 import numpy as np
+import scipy.sparse
 import itertools
 
 from ..misc import merge
@@ -8,18 +9,34 @@ from .euclidean import EuclideanDomain
 from .domain import Domain
 from .domain import TOL, DEFAULT_CVXPY_KWARGS
 
+def _block_corner(dom, p, kwargs):
+	return dom._corner(p, **kwargs)
+
+
+def _block_closest_point(dom, x0, L, kwargs):
+	return dom._closest_point(x0, L = L, **kwargs)
+
+
 class TensorProductDomain(EuclideanDomain):
 	r""" A class describing a tensor product of a multiple domains
 
 
+	Since the constraints of each domain act on separate coordinates,
+	sampling, :meth:`corner`, and :meth:`closest_point` (when the weighting matrix does not couple domains)
+	are performed domain-by-domain.
+
 	Parameters
 	----------
 	domains: list of domains
 		Domains to combine into a single domain
+	executor: concurrent.futures.Executor, optional
+		If provided, the separate problems for each domain in :meth:`corner` 
+		and :meth:`closest_point` are solved in parallel using this executor's map;
+		e.g., a ProcessPoolExecutor.
 	**kwargs
 		Additional keyword arguments to pass to CVXPY
 	"""
-	def __init__(self, domains = None, **kwargs):
+	def __init__(self, domains = None, executor = None, **kwargs):
 		self._domains = []
 		if domains == None:
 			domains = []
@@ -32,6 +49,7 @@ class TensorProductDomain(EuclideanDomain):
 				self._domains.extend(domain.domains)
 			else:
 				self._domains.append(domain)
+		self.executor = executor
 		self.kwargs = merge(DEFAULT_CVXPY_KWARGS, kwargs)
 
 	def __str__(self):
@@ -63,21 +81,70 @@ class TensorProductDomain(EuclideanDomain):
 			start += len(dom) 	
 
 	def _sample(self, draw = 1):
-		X = []
-		for dom in self.domains:
-			X.append(dom.sample(draw = draw))
-		return np.hstack(X)
+		X = np.empty((draw, len(self)))
+		for dom, I in zip(self.domains, self._slices):
+			X[:,I] = dom.sample(draw = draw).reshape(draw, len(dom))
+		return X
 
 	def _isinside(self, X, tol = TOL):
-		inside = np.ones(X.shape[0], dtype = np.bool)
+		inside = np.ones(X.shape[0], dtype = bool)
 		for dom, I in zip(self.domains, self._slices):
-			#print(dom, I, dom.isinside(X[:,I]))
-			inside = inside & dom.isinside(X[:,I], tol = tol)
+			inside &= dom.isinside(X[:,I], tol = tol)
 		return inside
 
+	def _map_domains(self, fun, *args):
+		r""" Apply a function to each domain and its arguments, in parallel if an executor is provided
+		"""
+		if self.executor is None:
+			return list(map(fun, self.domains, *args))
+		return list(self.executor.map(fun, self.domains, *args))
+
+	def _corner(self, p, **kwargs):
+		# The objective p.T x separates over the domains;
+		# the work for each domain is a module-level function so it can be sent to other processes
+		return np.hstack(self._map_domains(_block_corner, [p[I] for I in self._slices], 
+			[kwargs]*len(self.domains)))
+
+	def _closest_point(self, x0, L = None, **kwargs):
+		# The objective separates over the domains if each row of L 
+		# only involves the coordinates of a single domain
+		rows = [np.any(L[:,I] != 0, axis = 1) for I in self._slices]
+		if np.any(np.sum(rows, axis = 0) > 1):
+			return EuclideanDomain._closest_point(self, x0, L = L, **kwargs)
+		
+		# A block no row of L involves does not affect the objective, 
+		# so any feasible point will do; we take the closest in the Euclidean norm
+		slices = list(self._slices)
+		Ls = [L[row, I] if np.any(row) else np.eye(len(dom)) for dom, row, I in zip(self.domains, rows, slices)]
+		return np.hstack(self._map_domains(_block_closest_point, [x0[I] for I in slices], 
+			Ls, [kwargs]*len(self.domains)))
+
 	def _extent(self, x, p):
-		alpha = [dom._extent(x[I], p[I]) for dom, I in zip(self.domains, self._slices)]
-		return min(alpha)
+		alpha_forward, alpha_backward = self._extents(x.reshape(1,-1), np.asarray(p, dtype = float).reshape(1,-1))
+		return alpha_forward[0]
+
+	def _extents(self, X, P):
+		# A line leaves the domain when it leaves any block;
+		# blocks in which a direction does not move do not limit it
+		alpha_forward = np.full(len(X), np.inf)
+		alpha_backward = np.full(len(X), np.inf)
+		for dom, I in zip(self.domains, self._slices):
+			J = np.flatnonzero(np.any(P[:,I] != 0, axis = 1))
+			if len(J) > 0:
+				fwd, bwd = dom._extents(X[J,I], P[J,I])
+				alpha_forward[J] = np.minimum(alpha_forward[J], fwd)
+				alpha_backward[J] = np.minimum(alpha_backward[J], bwd)
+		return alpha_forward, alpha_backward
+
+	def _volume_key(self):
+		return ':'.join([dom._volume_key() for dom in self.domains])
+
+	def _volume(self, sd):
+		# The volume is the product of the volumes of each block,
+		# each estimated so the variances of their logarithms sum to sd**2
+		sd_block = sd/np.sqrt(len(self.domains))
+		vols, sds = zip(*[dom._volume_cached(sd_block) for dom in self.domains])
+		return float(np.prod(vols)), float(np.sqrt(np.sum(np.square(sds))))
 
 
 	def __len__(self):
@@ -88,21 +155,24 @@ class TensorProductDomain(EuclideanDomain):
 	# Normalization related functions
 	################################################################################		
 	
-	def _normalize(self, X):
-		return np.hstack([dom.normalize(X[:,I]) for dom, I in zip(self.domains, self._slices)])
-
-	def _unnormalize(self, X_norm):
-		return np.hstack([dom.unnormalize(X_norm[:,I]) for dom, I in zip(self.domains, self._slices)])
-
-	def _unnormalize_der(self):
-		return np.diag(np.hstack([np.diag(dom._unnormalize_der()) for dom in self.domains]))
-
-	def _normalize_der(self):
-		return np.diag(np.hstack([np.diag(dom._normalize_der()) for dom in self.domains]))
+	@property
+	def _affine(self):
+		# Compose the affine maps of each block
+		try:
+			return self._affine_map
+		except AttributeError:
+			affines = [dom._affine for dom in self.domains]
+			self._affine_map = tuple(np.concatenate([affine[k] for affine in affines]) for k in range(3))
+			for v in self._affine_map:
+				v.setflags(write = False)
+			return self._affine_map
+
+	def _center(self):
+		return np.copy(self._affine[0])
 
 	def _normalized_domain(self, **kwargs):
 		domains_norm = [dom.normalized_domain(**kwargs) for dom in self.domains]
-		return TensorProductDomain(domains = domains_norm)
+		return TensorProductDomain(domains = domains_norm, executor = self.executor, **self.kwargs)
 
 	
 	################################################################################		
@@ -126,39 +196,68 @@ class TensorProductDomain(EuclideanDomain):
 	# Properties resembling LinQuad Domains 
 	################################################################################		
 
+	# The constraints of each domain are assembled once and cached as read-only arrays
+
+	def _cached_constraint(self, name, build):
+		try:
+			return self._constraint_cache[name]
+		except AttributeError:
+			self._constraint_cache = {}
+		except KeyError:
+			pass
+		value = build()
+		value.setflags(write = False)
+		self._constraint_cache[name] = value
+		return value
+
+	def _block_diag(self, name):
+		r""" Block diagonal sparse matrix built from the named matrix of each domain
+		"""
+		return scipy.sparse.block_diag([getattr(dom, name) for dom in self.domains], format = 'csr')
+
+	@property
+	def A_sparse(self):
+		r""" Block diagonal inequality constraint matrix as a sparse matrix
+		"""
+		try:
+			return self._A_sparse
+		except AttributeError:
+			self._A_sparse = self._block_diag('A')
+			return self._A_sparse
+
+	@property
+	def A_eq_sparse(self):
+		r""" Block diagonal equality constraint matrix as a sparse matrix
+		"""
+		try:
+			return self._A_eq_sparse
+		except AttributeError:
+			self._A_eq_sparse = self._block_diag('A_eq')
+			return self._A_eq_sparse
+
 	@property
 	def lb(self):
-		return np.concatenate([dom.lb for dom in self.domains])
+		return self._cached_constraint('lb', lambda: np.concatenate([dom.lb for dom in self.domains]))
 
 	@property
 	def ub(self):
-		return np.concatenate([dom.ub for dom in self.domains])
+		return self._cached_constraint('ub', lambda: np.concatenate([dom.ub for dom in self.domains]))
 
 	@property
 	def A(self):
-		A = []
-		for dom, I in zip(self.domains, self._slices):
-			A_tmp = np.zeros((dom.A.shape[0] ,len(self)))
-			A_tmp[:,I] = dom.A
-			A.append(A_tmp)
-		return np.vstack(A)
+		return self._cached_constraint('A', lambda: self.A_sparse.toarray())
 
 	@property
 	def b(self):
-		return np.concatenate([dom.b for dom in self.domains])
+		return self._cached_constraint('b', lambda: np.concatenate([dom.b for dom in self.domains]))
 
 	@property
 	def A_eq(self):
-		A_eq = []
-		for dom, I in zip(self.domains, self._slices):
-			A_tmp = np.zeros((dom.A_eq.shape[0] ,len(self)))
-			A_tmp[:,I] = dom.A_eq
-			A_eq.append(A_tmp)
-		return np.vstack(A_eq)
+		return self._cached_constraint('A_eq', lambda: self.A_eq_sparse.toarray())
 	
 	@property
 	def b_eq(self):
-		return np.concatenate([dom.b_eq for dom in self.domains])
+		return self._cached_constraint('b_eq', lambda: np.concatenate([dom.b_eq for dom in self.domains]))
 
 	def add_constraints(self, *args, **kwargs):
 		if self.is_linquad_domain:
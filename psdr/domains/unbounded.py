@@ -41,11 +41,22 @@ class UnboundedDomain(EuclideanDomain):
 	def _closest_point(self, x0, L = None, **kwargs):
 		return x0
 
-	def _normalize(self, X):
-		return X
+	@property
+	def _affine(self):
+		# No normalization is applied
+		return (np.zeros(len(self)), np.ones(len(self)), np.ones(len(self)))
 
-	def _unnormalize(self, X_norm):
-		return X_norm
+	def _normalize(self, X, out = None):
+		if out is None:
+			return X
+		out[...] = X
+		return out
+
+	def _unnormalize(self, X_norm, out = None):
+		if out is None:
+			return X_norm
+		out[...] = X_norm
+		return out
 
 	def _isinside(self, X, tol = None):
 		if X.shape[1]== len(self):
@@ -16,3 +16,17 @@ class SolverError(Exception):
 
 class UnderdeterminedException(Exception):
 	pass
+
+class FunctionEvaluationError(Exception):
+	r""" Raised when one or more points of a batch evaluation fail
+
+	Parameters
+	----------
+	errors: dict
+		Maps the row index of each failed point to the exception it raised
+	"""
+	def __init__(self, errors):
+		self.errors = errors
+		rows = sorted(errors.keys())
+		msg = "Evaluation failed at %d point(s), rows %s; first error: %r" % (len(rows), rows[:10], errors[rows[0]])
+		super(FunctionEvaluationError, self).__init__(msg)
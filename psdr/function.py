@@ -1,13 +1,18 @@
 from __future__ import print_function
 import numpy as np
+import os
+import asyncio
 import textwrap
 import inspect
+from concurrent.futures import Future
 
 import cloudpickle
 
 #from .domains import Domain
 
 from .misc import merge
+from .cache import FunctionCache, _function_identity
+from .exceptions import FunctionEvaluationError
 
 
 __all__ = ['Function', 'BaseFunction']
@@ -16,6 +21,61 @@ __all__ = ['Function', 'BaseFunction']
 # me from loading modules inside functions
 # https://github.com/uqfoundation/dill/issues/219	
 
+
+def _evaluate_batch(funs_pickle, X, kwargs, vectorized, return_grad):
+	r""" Evaluate each function on a block of rows inside a worker
+
+	Returns a list with one entry per row: either the list of outputs of each function
+	or the exception raised when evaluating that row. 
+	"""
+	funs = cloudpickle.loads(funs_pickle)
+	if return_grad:
+		kwargs = merge(kwargs, {'return_grad': True})
+
+	if vectorized:
+		try:
+			out = []
+			for fun in funs:
+				ret = fun(X, **kwargs)
+				if return_grad:
+					out.append( (np.array(ret[0]).reshape(len(X), -1), np.array(ret[1]).reshape(len(X), -1, X.shape[1])) )
+				else:
+					out.append(np.array(ret).reshape(len(X), -1))
+		except Exception as e:
+			return [e for x in X]
+		if return_grad:
+			return [ [(fXi[i], gradsi[i]) for fXi, gradsi in out] for i in range(len(X))]
+		return [ [fXi[i] for fXi in out] for i in range(len(X))]
+
+	rows = []
+	for x in X:
+		try:
+			rows.append([fun(x, **kwargs) for fun in funs])
+		except Exception as e:
+			rows.append(e)
+	return rows
+
+
+def _resolve_row(batch_future, i, row_future):
+	try:
+		row = batch_future.result()[i]
+	except Exception as e:
+		row = e
+	if isinstance(row, Exception):
+		row_future.set_exception(row)
+	else:
+		row_future.set_result(row)
+
+
+def _release_slot(fut, semaphore):
+	r""" Release a semaphore once an abandoned evaluation finishes
+	"""
+	if not fut.cancelled():
+		# Retrieve the exception so it is not reported as never retrieved
+		fut.exception()
+	semaphore.release()
+
+
 class BaseFunction(object):
 	r""" Abstract base class for functions
 
@@ -66,11 +126,44 @@ class Function(BaseFunction):
 		Keyword arguments to pass to the functions when evaluating function
 	dask_client: dask.distributed.Client
 		Client to use for multiprocessing 
+	fd_grad: bool or str, optional
+		If provided, approximate gradients using finite differences. 
+		Either True or 'forward' for forward differences, 'central' for central differences,
+		or 'complex' for the complex-step derivative (which requires the functions accept complex inputs).
+		All perturbed points of a call to :code:`grad` are evaluated in a single batch.
+	fd_step: float, optional
+		Step size in the normalized domain used for finite difference gradients;
+		defaults to 1e-7 for forward, 1e-5 for central, and 1e-20 for complex-step differences.
+	cache: FunctionCache or str, optional
+		If provided, function values and gradients are stored in and served from this
+		on-disk cache; a string is interpreted as the filename of the cache. 
+		Entries are keyed by the name and bytecode of each function and the values it captures;
+		changes to code it calls are not detected, so change the cache's version when these change.
+	executor: concurrent.futures.Executor, optional
+		If provided, evaluations of multiple points are split into batches of rows
+		which are evaluated in parallel using this executor; e.g., a 
+		:code:`ProcessPoolExecutor` or :code:`ThreadPoolExecutor`.
+		Results are returned in the same order as the input.
+		If any point fails, a :code:`FunctionEvaluationError` is raised
+		after all batches have finished listing the failed rows.
+	batch_size: int, optional
+		Number of rows of the input sent to a worker at once when using an executor.
+		By default, the rows are divided into four batches per CPU.
+	afuns: coroutine function or list of coroutine functions, optional
+		Asynchronous versions of :code:`funs` used by :code:`aeval` and :code:`aeval_stream`;
+		e.g., functions that await a simulation run as an asyncio subprocess.
+		If not provided, these methods run :code:`funs` on the executor
+		(or the event loop's default thread pool). 
 	"""
 
 	def __init__(self, funs, domain, grads = None, fd_grad = None, vectorized = False, kwargs = {},
-		dask_client = None, return_grad = False):
+		dask_client = None, return_grad = False, cache = None, executor = None, batch_size = None, fd_step = None, afuns = None):
 
+		self.executor = executor
+		self.batch_size = batch_size
+		if isinstance(cache, str):
+			cache = FunctionCache(cache)
+		self.cache = cache
 		self.dask_client = dask_client
 		self.vectorized = vectorized
 		self.kwargs = kwargs
@@ -81,6 +174,12 @@ class Function(BaseFunction):
 		else:
 			self._funs = funs
 
+		if afuns is not None:
+			if callable(afuns):
+				afuns = [afuns]
+			assert len(afuns) == len(self._funs), "Must provide the same number of functions and async functions"
+		self._afuns = afuns
+
 		if grads is not None:
 			if callable(grads):
 				grads = [grads]
@@ -127,10 +226,83 @@ class Function(BaseFunction):
 		self.domain_app = domain
 		self.domain_norm = domain.normalized_domain()
 		self.domain = self.domain_norm
+		if fd_grad is True:
+			fd_grad = 'forward'
+		assert fd_grad in [None, False, 'forward', 'central', 'complex'], "Invalid finite difference scheme '%s'" % (fd_grad,)
 		self.fd_grad = fd_grad
+		self.fd_step = fd_step
+
+	@property
+	def _cache_identity(self):
+		r""" A string identifying the wrapped functions for use as part of a cache key
+		"""
+		return type(self).__name__ + ':' + ','.join(_function_identity(fun) for fun in self._funs)
+
+	def _cache_lookup(self, X_norm, kwargs, grad = False):
+		r""" Find the cache keys and stored values for each row of X_norm
+		"""
+		X = np.atleast_2d(self.domain_app.unnormalize(X_norm))
+		keys = [self.cache.key(self._cache_identity, x, kwargs) for x in X]
+		fX, grads = self.cache.get(keys, grad = grad)
+		if grad:
+			miss = [i for i in range(len(X)) if fX[i] is None or grads[i] is None]
+		else:
+			miss = [i for i in range(len(X)) if fX[i] is None]
+		return keys, fX, grads, miss
+	
+	def _submit_batches(self, funs, X, kwargs, return_grad = False):
+		r""" Submit blocks of rows of X (in application units) to the executor
+		
+		Returns a list of futures, one per row, each resolving to the list of outputs of each function
+		"""
+		batch_size = self.batch_size
+		if batch_size is None:
+			batch_size = max(1, int(np.ceil(len(X)/(4.*(os.cpu_count() or 1)))))
+		funs_pickle = cloudpickle.dumps(funs)
+		futures = []
+		for start in range(0, len(X), batch_size):
+			batch = self.executor.submit(_evaluate_batch, funs_pickle, X[start:start+batch_size], 
+				kwargs, self.vectorized, return_grad)
+			for i in range(min(batch_size, len(X) - start)):
+				row = Future()
+				batch.add_done_callback(lambda batch, i = i, row = row: _resolve_row(batch, i, row))
+				futures.append(row)
+		return futures
+
+	def _map_rows(self, funs, X, kwargs, return_grad = False):
+		r""" Evaluate funs on every row of X using the executor, preserving order
+		"""
+		futures = self._submit_batches(funs, X, kwargs, return_grad = return_grad)
+		rows = []
+		errors = {}
+		for i, fut in enumerate(futures):
+			try:
+				rows.append(fut.result())
+			except Exception as e:
+				errors[i] = e
+		if len(errors) > 0:
+			raise FunctionEvaluationError(errors)
+		return rows
 
 	def eval(self, X_norm, **kwargs):
 		X_norm = np.atleast_1d(X_norm)
+		if self.cache is None:
+			return self._eval(X_norm, **kwargs)
+		
+		kwargs = merge(self.kwargs, kwargs)
+		keys, fX, _, miss = self._cache_lookup(X_norm, kwargs)
+		if len(miss) > 0:
+			X_miss = np.atleast_2d(X_norm)[miss]
+			fX_miss = self._eval(X_miss, **kwargs)
+			self.cache.put([keys[i] for i in miss], fX = fX_miss)
+			for i, fx in zip(miss, fX_miss):
+				fX[i] = fx
+		fX = np.vstack([np.atleast_1d(fx) for fx in fX])
+		if len(X_norm.shape) == 1:
+			return fX.flatten()
+		return fX
+
+	def _eval(self, X_norm, **kwargs):
 		X = self.domain_app.unnormalize(X_norm)
 
 		kwargs = merge(self.kwargs, kwargs)
@@ -140,7 +312,10 @@ class Function(BaseFunction):
 			return np.hstack([fun(x, **kwargs) for fun in self._funs]).flatten()
 
 		elif len(X.shape) == 2:
-			if self.vectorized:
+			if self.executor is not None:
+				rows = self._map_rows(self._funs, X, kwargs)
+				return np.vstack([np.hstack(row) for row in rows])
+			elif self.vectorized:
 				fX = [fun(X, **kwargs) for fun in self._funs]
 				for fXi in fX:
 					assert len(fXi) == X.shape[0], "Must provide an array with %d entires; got %d" % (X.shape[0], len(fXi) )
@@ -156,16 +331,25 @@ class Function(BaseFunction):
 
 
 	def eval_async(self, X_norm, **kwargs):
-		r""" Evaluate the function asyncronously using dask.distributed
+		r""" Evaluate the function asyncronously using dask.distributed or the executor
+
+		Returns one future per point whose result is the list of outputs of each function.
 		"""
-		assert self.dask_client is not None, "A dask_client must be specified on class initialization"
-		
 		kwargs = merge(self.kwargs, kwargs)
 
 		X_norm = np.atleast_1d(X_norm)
 		X = self.domain_app.unnormalize(X_norm)
 		X = np.atleast_2d(X)
 
+		if self.executor is not None and self.dask_client is None:
+			return_grad = kwargs.pop('return_grad', False)
+			results = self._submit_batches(self._funs, X, kwargs, return_grad = return_grad)
+			if len(X_norm.shape) == 1:
+				return results[0]
+			return results
+
+		assert self.dask_client is not None, "A dask_client or executor must be specified on class initialization"
+
 		def subcall(funs_pickle, x, **kwargs_):
 			import cloudpickle
 			funs = [cloudpickle.loads(fun) for fun in funs_pickle]
@@ -178,6 +362,140 @@ class Function(BaseFunction):
 			return results
 
 
+	async def _aeval_row(self, x, kwargs, semaphore, timeout, funs_pickle):
+		await semaphore.acquire()
+		release = True
+		try:
+			if self._afuns is not None:
+				coro = asyncio.gather(*[afun(x, **kwargs) for afun in self._afuns])
+				row = await asyncio.wait_for(coro, timeout)
+			else:
+				loop = asyncio.get_running_loop()
+				fut = loop.run_in_executor(self.executor, _evaluate_batch, funs_pickle, x.reshape(1,-1), 
+					kwargs, self.vectorized, False)
+				try:
+					row = (await asyncio.wait_for(asyncio.shield(fut), timeout))[0]
+				except (asyncio.TimeoutError, asyncio.CancelledError):
+					# The worker cannot be interrupted, so it keeps its slot until it finishes
+					release = False
+					fut.add_done_callback(lambda fut: _release_slot(fut, semaphore))
+					raise
+		finally:
+			if release:
+				semaphore.release()
+		if isinstance(row, Exception):
+			raise row
+		return np.hstack([np.array(fx).flatten() for fx in row])
+
+	async def _aeval_indexed(self, X_norm, kwargs, max_concurrent, timeout):
+		r""" Yield (index, value or exception) pairs as evaluations complete
+		"""
+		keys = None
+		todo = list(range(len(X_norm)))
+		if self.cache is not None:
+			keys, fX, _, todo = self._cache_lookup(X_norm, kwargs)
+			for i, fx in enumerate(fX):
+				if fx is not None:
+					yield i, np.atleast_1d(fx)
+		if len(todo) == 0:
+			return
+
+		X = np.atleast_2d(self.domain_app.unnormalize(X_norm))
+		semaphore = asyncio.Semaphore(max_concurrent if max_concurrent is not None else len(todo))
+		funs_pickle = cloudpickle.dumps(self._funs) if self._afuns is None else None
+
+		async def run(i):
+			try:
+				return i, await self._aeval_row(X[i], kwargs, semaphore, timeout, funs_pickle)
+			except Exception as e:
+				return i, e
+
+		tasks = [asyncio.ensure_future(run(i)) for i in todo]
+		try:
+			for task in asyncio.as_completed(tasks):
+				i, fx = await task
+				if keys is not None and not isinstance(fx, Exception):
+					self.cache.put([keys[i]], fX = [fx])
+				yield i, fx
+		finally:
+			# If the consumer stops early, don't leave evaluations running 
+			for task in tasks:
+				task.cancel()
+
+	async def aeval(self, X_norm, max_concurrent = None, timeout = None, **kwargs):
+		r""" Evaluate the function using asyncio
+
+		Usage: :code:`fX = await fun.aeval(X)`
+
+		Parameters
+		----------
+		X_norm: array-like (M, m) or (m,)
+			Points in the normalized domain at which to evaluate the function
+		max_concurrent: int, optional
+			Maximum number of evaluations running at once; e.g., the number of available licenses or cores.
+			By default, all points are evaluated concurrently.
+		timeout: float, optional
+			Number of seconds after which an individual evaluation is abandoned.
+			Evaluations running on an executor cannot be interrupted, so an abandoned evaluation
+			continues to count against max_concurrent until it finishes.
+		**kwargs: dict
+			Additional keyword arguments passed to the function
+
+		Returns
+		-------
+		fX: np.ndarray
+			Function values, in the same format as :code:`eval`.
+			If any evaluation fails or times out, a :code:`FunctionEvaluationError` 
+			is raised after all other evaluations finish.
+		"""
+		kwargs = merge(self.kwargs, kwargs)
+		X_norm = np.atleast_1d(X_norm)
+		fX = [None for x in np.atleast_2d(X_norm)]
+		errors = {}
+		async for i, fx in self._aeval_indexed(np.atleast_2d(X_norm), kwargs, max_concurrent, timeout):
+			if isinstance(fx, Exception):
+				errors[i] = fx
+			else:
+				fX[i] = fx
+		if len(errors) > 0:
+			raise FunctionEvaluationError(errors)
+		fX = np.vstack(fX)
+		if len(X_norm.shape) == 1:
+			return fX.flatten()
+		return fX
+
+	async def aeval_stream(self, X_norm, max_concurrent = None, timeout = None, **kwargs):
+		r""" Evaluate the function using asyncio, yielding results as they complete
+
+		Usage: 
+
+		.. code::
+
+			async for x, fx in fun.aeval_stream(X):
+				...
+
+		Parameters are the same as :code:`aeval`.
+		If an evaluation fails or times out, a :code:`FunctionEvaluationError` 
+		is raised when that evaluation completes and outstanding evaluations are cancelled.
+
+		Yields
+		------
+		x: np.ndarray (m,)
+			Point in the normalized domain
+		fx: np.ndarray
+			Function value at x
+		"""
+		kwargs = merge(self.kwargs, kwargs)
+		X_norm = np.atleast_2d(X_norm)
+		results = self._aeval_indexed(X_norm, kwargs, max_concurrent, timeout)
+		try:
+			async for i, fx in results:
+				if isinstance(fx, Exception):
+					raise FunctionEvaluationError({i: fx})
+				yield X_norm[i], fx
+		finally:
+			await results.aclose()
+
 	def _shape_grad(self, X, grads):
 		r""" This expects a 3-dimensional array in format [x sample #, fun #, input dim #] 
 		"""
@@ -192,34 +510,45 @@ class Function(BaseFunction):
 			return grads
 
 	def grad(self, X_norm, **kwargs):
+		X_norm = np.atleast_1d(X_norm)
+		
+		# Finite difference gradients are built from (cached) function evaluations
+		if self.cache is None or self.fd_grad:
+			return self._grad(X_norm, **kwargs)
+
+		kwargs = merge(self.kwargs, kwargs)
+		keys, _, grads, miss = self._cache_lookup(X_norm, kwargs, grad = True)
+		D = self.domain_app._unnormalize_scale()
+		if len(miss) > 0:
+			X_miss = np.atleast_2d(X_norm)[miss]
+			grads_miss = self._grad(X_miss, **kwargs).reshape(len(miss), -1, len(self.domain))
+			# Gradients are stored in application units
+			self.cache.put([keys[i] for i in miss], grads = [g/D for g in grads_miss])
+			for i, g in zip(miss, grads_miss):
+				grads[i] = g/D
+		grads = np.array([g*D for g in grads])
+		return self._shape_grad(X_norm, grads)
+
+	def _grad(self, X_norm, **kwargs):
 		kwargs = merge(self.kwargs, kwargs)
 		
 		X_norm = np.atleast_1d(X_norm)
 
 		# If we've asked to use a finite difference gradient
 		if self.fd_grad:
-			h = 1e-7
-			grads = []
-			for x in np.atleast_2d(X_norm):
-				fx = self.eval(x)
-				grad = np.zeros(x.shape)
-				for i in range(len(x)):
-					ei = np.zeros(x.shape)
-					ei[i] = 1.
-					grad[i] = (self.eval(x + h*ei, **kwargs) - fx)/h
-				# This ensures the dimensions match expectation for 
-				grads.append(np.atleast_2d(grad))
-			
-			return self._shape_grad(X_norm, grads)
+			return self._shape_grad(X_norm, self._fd_grad(np.atleast_2d(X_norm), **kwargs))
 
 		X = self.domain_app.unnormalize(X_norm)
-		D = self.domain_app._unnormalize_der() 	
+		D = self.domain_app._unnormalize_scale()
 		
 		# Return gradient if specified
 		if self._grads is not None: 
 			X = np.atleast_2d(X)
 			
-			if self.vectorized:
+			if self.executor is not None:
+				rows = self._map_rows(self._grads, X, kwargs)
+				grads = np.array([ np.vstack(row) for row in rows])
+			elif self.vectorized:
 				# TODO: I don't think this will get dimensions quite right
 				grads = np.array([ np.array(grad(X, **kwargs)) for grad in self._grads])
 				grads = np.transpose(grads, (1,0,2))
@@ -227,19 +556,22 @@ class Function(BaseFunction):
 				grads = np.array([ np.vstack([grad(x, **kwargs) for grad in self._grads]) for x in X])
 		
 			# Correct to apply to normalized domain
-			grads = grads.dot(D.T)
+			grads = grads*D
 			return self._shape_grad(X_norm, grads)
 
 		# Try return_grad the function definition
 		elif self.return_grad:
 			X = np.atleast_2d(X)	
 			
-			if self.vectorized:
+			if self.executor is not None:
+				rows = self._map_rows(self._funs, X, kwargs, return_grad = True)
+				grads = np.array([ np.vstack([gi for fxi, gi in row]) for row in rows])
+			elif self.vectorized:
 				grads = []
 				for fun in self._funs:
 					fXi, gradsi = fun(X, return_grad = True, **kwargs)
-					grads.append(gradsi)
-				grads = np.array([ np.atleast_2d(grad) for grad in grads])
+					grads.append(np.array(gradsi).reshape(X.shape[0], -1, len(self.domain)))
+				grads = np.concatenate(grads, axis = 1)
 			else:
 				grads = []
 				for x in X:
@@ -249,25 +581,102 @@ class Function(BaseFunction):
 						grad.append(gradi)
 					grads.append(np.vstack(grad))
 				grads = np.array(grads)	
-			grads = grads.dot(D.T)
+			grads = grads*D
 			return self._shape_grad(X_norm, grads)
 		else:
 			raise NotImplementedError("Gradient not defined and finite-difference approximation not enabled")
 
 
+	def _fd_grad(self, X, **kwargs):
+		r""" Finite difference approximation of the gradient on the normalized domain
+		
+		The perturbed points for all rows of X are evaluated together in one call to eval 
+		so they can be vectorized, cached, or distributed across an executor. 
+		Steps that would leave the domain are reversed.
+		"""
+		M, m = X.shape
+		h = self.fd_step
+		if h is None:
+			h = {'forward': 1e-7, 'central': 1e-5, 'complex': 1e-20}[self.fd_grad]
+
+		# Perturbed points: X_pert[k, i] = X[k] + H[k,i]*e_i
+		H = h*np.ones((M, m))
+		
+		if self.fd_grad == 'complex':
+			X_pert = X[:,None,:] + 1j*h*np.eye(m)[None,:,:]
+			fX_pert = self._eval(X_pert.reshape(M*m, m), **kwargs)
+			fX_pert = fX_pert.reshape(M, m, -1)
+			return np.transpose(np.imag(fX_pert)/h, (0,2,1))
+		
+		X_pert = X[:,None,:] + H[:,:,None]*np.eye(m)[None,:,:]
+		inside = self.domain_norm.isinside(X_pert.reshape(M*m, m)).reshape(M, m)
+		if self.fd_grad == 'central':
+			X_back = X[:,None,:] - H[:,:,None]*np.eye(m)[None,:,:]
+			inside_back = self.domain_norm.isinside(X_back.reshape(M*m, m)).reshape(M, m)
+			# Use a one-sided difference along coordinates where one side leaves the domain
+			forward = ~inside_back & inside
+			backward = inside_back & ~inside
+			central = ~(forward | backward)
+			X_pert[backward] = X[np.nonzero(backward)[0]]
+			X_back[forward] = X[np.nonzero(forward)[0]]
+			fX = self.eval(np.vstack([X_pert.reshape(M*m, m), X_back.reshape(M*m, m)]), **kwargs)
+			fX = fX.reshape(2, M, m, -1)
+			H = H*np.where(central, 2., 1.)
+			grads = (fX[0] - fX[1])/H[:,:,None]
+		else:
+			H[~inside] = -h
+			X_pert = X[:,None,:] + H[:,:,None]*np.eye(m)[None,:,:]
+			fX = self.eval(np.vstack([X, X_pert.reshape(M*m, m)]), **kwargs)
+			fX0 = fX[:M].reshape(M, 1, -1)
+			grads = (fX[M:].reshape(M, m, -1) - fX0)/H[:,:,None]
+		
+		# Reorder to [x sample #, fun #, input dim #]
+		return np.transpose(grads, (0,2,1))
+
 	def __call__(self, X_norm, return_grad = False, **kwargs):
 		kwargs = merge(self.kwargs, kwargs)
 		if not return_grad:
 			return self.eval(X_norm, **kwargs)
 
+		if self.return_grad and self.cache is not None:
+			# Query the cache for both values and gradients,
+			# only evaluating those points where either is missing  
+			X_norm = np.atleast_1d(X_norm)
+			keys, fX, grads, miss = self._cache_lookup(X_norm, kwargs, grad = True)
+			D = self.domain_app._unnormalize_scale()
+			if len(miss) > 0:
+				X_miss = np.atleast_2d(X_norm)[miss]
+				fX_miss, grads_miss = self._call(X_miss, return_grad = True, **kwargs)
+				grads_miss = grads_miss.reshape(len(miss), -1, len(self.domain))/D
+				self.cache.put([keys[i] for i in miss], fX = fX_miss, grads = grads_miss)
+				for i, fx, g in zip(miss, fX_miss, grads_miss):
+					fX[i] = fx
+					grads[i] = g
+			fX = np.vstack([np.atleast_1d(fx) for fx in fX])
+			grads = np.array([g*D for g in grads])
+			if len(X_norm.shape) == 1:
+				fX = fX.flatten()
+			return fX, self._shape_grad(X_norm, grads)
+		
+		return self._call(X_norm, return_grad = return_grad, **kwargs)
+
+	def _call(self, X_norm, return_grad = False, **kwargs):
+		kwargs = merge(self.kwargs, kwargs)
+		if not return_grad:
+			return self.eval(X_norm, **kwargs)
+
 		if self.return_grad:
 			# If the function can return both the value and gradient simultaneously
 			X = self.domain_app.unnormalize(X_norm)
 			X = np.atleast_2d(X)
-			D = self.domain_app._unnormalize_der() 	
-			if self.vectorized:
+			D = self.domain_app._unnormalize_scale()
+			if self.executor is not None:
+				rows = self._map_rows(self._funs, X, kwargs, return_grad = True)
+				fX = np.vstack([ np.hstack([fxi for fxi, gi in row]) for row in rows])
+				grads = np.array([ np.vstack([gi for fxi, gi in row]) for row in rows])
+			elif self.vectorized:
 				ret = [fun(X, return_grad = True, **kwargs) for fun in self._funs]
-				fX = np.hstack([r[0] for r in ret])
+				fX = np.hstack([np.array(r[0]).reshape(X.shape[0], -1) for r in ret])
 				grads = np.concatenate([r[1].reshape(X.shape[0], -1, len(self.domain)) for r in ret], axis = 1)
 			else:
 				fX = []
@@ -285,7 +694,7 @@ class Function(BaseFunction):
 				fX = np.vstack(fX)
 				grads = np.array(grads)
 			
-			grads = grads.dot(D.T)
+			grads = grads*D
 
 			if len(X_norm.shape) == 1:
 				fX = fX.flatten()
@@ -2,7 +2,7 @@
 """
 from __future__ import print_function
 import numpy as np
-from scipy.spatial import Voronoi 
+from scipy.spatial import Voronoi, cKDTree
 from scipy.spatial.distance import cdist, pdist, squareform
 
 __all__ = ['sample_sphere', 'unique_points', 'sample_simplex']
@@ -49,23 +49,37 @@ def sample_sphere(dim, n, k = 100):
 
 	return X
 
-def unique_points(X):
+def unique_points(X, tol = 1e-8):
 	r""" Compute the unique points from a list
 
+	Two points are considered identical if their Euclidean distance is at most :code:`tol`;
+	of each such group, only the last point in the list is retained.
+	Pairs of nearby points are found using a KD-tree 
+	so that the cost is :math:`\mathcal{O}(M \log M)` with :math:`\mathcal{O}(M)` storage
+	rather than forming the dense distance matrix. 
+
 	Parameters
 	----------
 	X: array-like (M, m)
 		Input points
+	tol: float, optional
+		Distance below which two points are considered the same
 	
 	Returns
 	-------
-	I: np.ndarray (M, dtype = np.bool)
+	I: np.ndarray (M, dtype = bool)
 		List of points with no points close to each other
 	"""
-	D = squareform(pdist(X))
-	I = np.ones(len(X), dtype = np.bool)
-	for i in range(len(X)-1):
-		I[i] = ~np.isclose(np.min(D[i,i+1:]), 0)
+	X = np.array(X, dtype = float)
+	I = np.ones(len(X), dtype = bool)
+	if len(X) < 2:
+		return I
+
+	tree = cKDTree(X)
+	pairs = tree.query_pairs(tol, output_type = 'ndarray')
+	if len(pairs) > 0:
+		# query_pairs returns i < j, so we drop the earlier point
+		I[pairs[:,0]] = False
 	return I
 
 
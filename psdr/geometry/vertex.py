@@ -6,10 +6,11 @@ from __future__ import print_function
 import numpy as np
 from scipy.spatial.distance import cdist, pdist
 import scipy.linalg
+import scipy.spatial.distance
 from cvxopt import matrix, solvers
 solvers.options['show_progress'] = False
 
-from scipy.spatial import HalfspaceIntersection
+from scipy.spatial import HalfspaceIntersection, cKDTree
 from .cdist import cdist
 from .geometry import unique_points
 
@@ -35,88 +36,138 @@ def voronoi_vertex_1d(domain, Xhat, L = None):
 	V = np.hstack([lb, V, ub])
 	return V.reshape(-1,1)
 
-def voronoi_vertex(domain, Xhat, L = None):
+
+def _voronoi_cell(halfspaces, y):
+	r""" Vertices of a single bounded Voronoi cell 
+
+	Parameters
+	----------
+	halfspaces: np.ndarray (n, m+1)
+		Stacked [A, -b] defining the cell A x <= b 
+	y: np.ndarray (m,)
+		Site of the cell, used as the interior point if it is strictly inside the cell
+
+	Returns
+	-------
+	V: np.ndarray (*, m)
+		Vertices of the cell
+	"""
+	if np.all(halfspaces[:,:-1] @ y + halfspaces[:,-1] < 0):
+		try:
+			hs = HalfspaceIntersection(halfspaces, y)
+			return np.copy(hs.intersections)
+		except QhullError:
+			pass
+
+	# The site is not strictly inside the constraints, so we find a point that is
+	# Here we use the code from scipy documentation 
+	norm_vector = np.reshape(np.linalg.norm(halfspaces[:, :-1], axis=1),(halfspaces.shape[0], 1))
+	cc = np.zeros((halfspaces.shape[1],))
+	cc[-1] = -1
+	AA = np.hstack((halfspaces[:, :-1], norm_vector))
+	bb = -halfspaces[:, -1:]
+	
+	# Solve the linear program with CVXOPT as scipy's linprog reports ill-conditioning 
+	sol = solvers.lp(matrix(cc), matrix(AA), matrix(bb))
+	x = np.array(sol['x'][:-1]).flatten()
+	hs = HalfspaceIntersection(halfspaces, x)
+	return np.copy(hs.intersections)
+
+
+def voronoi_vertex(domain, Xhat, L = None, executor = None, return_cells = False):
 	r""" Construct the bounded Voronoi vertices on a domain 
 
+	Each bounded Voronoi cell is constructed independently as the intersection of half spaces
+	using Qhull. As these computations are independent, they can be distributed 
+	across workers using an executor.
 
+	Parameters
+	----------
+	domain: Domain
+		Domain on which to construct the vertices
+	Xhat: array-like (M, m)
+		M points on the domain which define the Voronoi diagram
+	L: array-like (m, m), optional
+		Weight on distance in 2-norm; defaults to the identity matrix	
+	executor: concurrent.futures.Executor, optional
+		If provided, the cells are computed in parallel using this executor's map; 
+		e.g., a ProcessPoolExecutor. 
+	return_cells: bool, optional (default False)
+		If True, return the indices of the vertices belonging to each cell
 
+	Returns
+	-------
+	V: np.ndarray (N, m)
+		Bounded Voronoi vertices
+	cells: list of np.ndarray
+		If return_cells, cells[k] are the indices of the vertices in V of the cell containing Xhat[k]
 
 	Note: 
 	Pro17 claims that these bounded Voronoi vertices can be computed using WP89.  
 	This approach may offer some speedup, but I trust Q-hull more than my own implementation.
 
 	"""
+	Xhat = np.atleast_2d(np.array(Xhat))
 	if len(domain) == 1:
-		return voronoi_vertex_1d(domain, Xhat)
-	
-	assert np.all(domain.isinside(Xhat))
-
-
-	if L is None:
-		L = np.eye(len(domain))
-		Linv = np.eye(len(domain))
+		V = voronoi_vertex_1d(domain, Xhat)
+		owner = None
 	else:
-		U, s, VT = np.linalg.svd(L)
-		Linv = VT.T @ np.diag(1./s) @ U.T
-
-
-
-	# Half spaces from the domain
-	A, b = domain.A_aug, domain.b_aug
+		assert np.all(domain.isinside(Xhat))
 
-	if len(Xhat) == 1:
-		halfspaces = np.hstack([A, -b.reshape(-1,1)])
-		hs = HalfspaceIntersection(halfspaces, Xhat[0])
-		return hs.intersections	
+		if L is None:
+			L = np.eye(len(domain))
+			Linv = np.eye(len(domain))
+		else:
+			U, s, VT = np.linalg.svd(L)
+			Linv = VT.T @ np.diag(1./s) @ U.T
 
-	Yhat = (L @ Xhat.T).T
-	LV = []
-	for k, xhat in enumerate(Xhat):
-		Ak = Yhat - Yhat[k] 
-		#Ak = np.vstack([L @ (Xhat[j] - xhat) for j in range(len(Xhat)) if j != k])
-		center = 0.5 * (Yhat[k] + Yhat)
-		#center = np.vstack([ 0.5*L @ (xhat + Xhat[j]) for j in range(len(Xhat)) if j != k]) 
-		bk = np.sum(Ak * center, axis = 1)
+		# Half spaces from the domain
+		A, b = domain.A_aug, domain.b_aug
 		
-		# If two Xhat are the same, we can end up with a situation 
-		# where the constraint stops  so we filter these out
-		I = np.argwhere(np.sum(Ak**2, axis = 1) > 0).flatten()
-		Ak, bk = Ak[I], bk[I]
-	
-		halfspaces = np.hstack([np.vstack([A @ Linv , Ak  ]) , -np.hstack([b, bk]).reshape(-1,1)])
-
-		try:
-			hs = HalfspaceIntersection(halfspaces, xhat)
-		except QhullError:
-			# The point xhat isn't strictly inside the constraints, so we try with a point that is
-			# Here we use the code from scipy documentation 
-			norm_vector = np.reshape(np.linalg.norm(halfspaces[:, :-1], axis=1),(halfspaces.shape[0], 1))
-			cc = np.zeros((halfspaces.shape[1],))
-			cc[-1] = -1
-			AA = np.hstack((halfspaces[:, :-1], norm_vector))
-			bb = -halfspaces[:, -1:]
+		Yhat = (L @ Xhat.T).T
+
+		if len(Xhat) == 1:
+			halfspaces = [np.hstack([A @ Linv, -b.reshape(-1,1)])]
+		else:
+			halfspaces = []
+			for k in range(len(Xhat)):
+				Ak = Yhat - Yhat[k] 
+				center = 0.5 * (Yhat[k] + Yhat)
+				bk = np.sum(Ak * center, axis = 1)
+				
+				# If two Xhat are the same, we can end up with a situation 
+				# where the constraint stops  so we filter these out
+				I = np.argwhere(np.sum(Ak**2, axis = 1) > 0).flatten()
+				Ak, bk = Ak[I], bk[I]
 			
-			# Solve the linear program with CVXOPT as scipy's linprog reports ill-conditioning 
-			sol = solvers.lp(matrix(cc), matrix(AA), matrix(bb))
-			xhat2 = np.array(sol['x'][:-1]).flatten()
-			
-			try:
-				hs = HalfspaceIntersection(halfspaces, xhat2)
-			except QhullError as e:
-				raise e
+				halfspaces.append(np.hstack([np.vstack([A @ Linv , Ak  ]) , -np.hstack([b, bk]).reshape(-1,1)]))
 
+		if executor is None:
+			results = list(map(_voronoi_cell, halfspaces, Yhat))
+		else:
+			results = list(executor.map(_voronoi_cell, halfspaces, Yhat))
+		
+		LV = np.vstack(results)
+		owner = np.hstack([k*np.ones(len(LVk), dtype = int) for k, LVk in enumerate(results)])
+		V = (Linv @ LV.T).T
 
-		# TODO: Do we want to keep indexing information, or only return the vertices 
-		LV.append(np.copy(hs.intersections))
+	Vall = V	
+	V = V[unique_points(V)]
+	V = V[domain.isinside(V)]
 
-	LV = np.vstack(LV)
-	V = (Linv @ LV.T).T
-	I = unique_points(V)
-	V = V[I]
-	
-	I = domain.isinside(V)
-	V = V[I]
-	return V
+	if not return_cells:
+		return V
+
+	if owner is None:
+		D = cdist(Xhat, V, L = L)
+		d = np.min(D, axis = 0)
+		cells = [np.argwhere(np.isclose(D[k], d)).flatten() for k in range(len(Xhat))]
+	else:
+		# Match the vertices of each cell to the unique vertices
+		dist, idx = cKDTree(V).query(Vall, distance_upper_bound = 1e-8)
+		valid = np.isfinite(dist)
+		cells = [np.unique(idx[valid & (owner == k)]) for k in range(len(Xhat))]
+	return V, cells
 
 def voronoi_vertex_sample(domain, Xhat, X0, L = None, randomize = True):
 	r""" Constructs a subset of the Voronoi vertices on a given domain 
@@ -197,92 +248,54 @@ def voronoi_vertex_sample(domain, Xhat, X0, L = None, randomize = True):
 		L = np.array(L)
 		assert L.shape[1] == m, "Number of columns doesn't match dimension of the space"
 
-	Lrank = np.linalg.matrix_rank(L)
-
+	# Distances in the L-metric only depend on the range of L^T, so we work in the 
+	# coordinates Z = X V_r diag(s_r) where L = U diag(s) V^T; ||L(x1 - x2)|| = ||z1 - z2||. 
+	_, s, VT = np.linalg.svd(L, full_matrices = False)
+	Lrank = int(np.sum(s > s[0]*max(L.shape)*np.finfo(float).eps)) if len(s) > 0 else 0
+	Lz = (VT[:Lrank].T * s[:Lrank])
+	Zhat = Xhat @ Lz 
+	
 	LTL = L.T.dot(L)
+	LTLXhat = Xhat @ LTL
+
+	# The nearest sites are found using a KD-tree when the metric has low rank,
+	# otherwise we use a brute force search
+	tree = cKDTree(Zhat) if 0 < Lrank <= _KDTREE_MAX_DIM else None
 
 	# Linear inequality constraints for the domain (including lower bound/upper bound box constraints)
 	A = domain.A_aug
 	b = domain.b_aug
+	A_eq = domain.A_eq
 
 	# This algorithm terminates when each point has m active constraints as we can have no more improvement
 	# hence we substract the number of equality constraints
 	# we also subtract the rank-deficency of L because this results in zero-steps  	
-	for k in range(m - domain.A_eq.shape[0]):
+	for k in range(m - A_eq.shape[0]):
 		if k >= Lrank and not randomize:
 			break
 
-		# Find the nearest neighbors
-		# As we intend to do this in high dimensions, 
-		# we don't use a tree-based distance approach
-		# as these don't scale well
-		D = cdist(L.dot(X0.T).T, L.dot(Xhat.T).T)
-		I = np.argsort(D, axis = 1)
+		Z0 = X0 @ Lz
+		
+		# We only need the k+1 nearest sites: the closest and possibly k equidistant sites
+		n_near = min(k+1, len(Xhat))
+		D, I = _nearest_sites(Z0, Zhat, n_near, tree = tree)
 
 		# set the search direction to move away from the closest point
-		h = X0 - Xhat[I[:,0]]
-		h = LTL.dot(h.T).T
-			 
+		h = (X0 - Xhat[I[:,0]]) @ LTL
+
+		# Assemble the constraints to project out for each point: 
+		# the equality constraints, active inequality constraints, and the 
+		# hyperplanes separating equidistant sites
+		active = np.isclose(X0 @ A.T, b)
+		hyper = np.isclose(D[:,0:1], D[:,1:min(k+1, len(Xhat))])
+		h = _project_active(h, A_eq, A, active, LTLXhat, I, hyper, randomize)
 
-		# which inequality constraints on the domain are active
-		active = np.isclose(A.dot(X0.T).T , b)
-		
-		for i in range(X0.shape[0]):
-			# For each point, project onto the feasible directions
-			nullspace = [domain.A_eq.T]
-
-			# active inequality constraints
-			for j in range(A.shape[0]):
-				if active[i,j] : nullspace += [A[j].reshape(-1,1)]
-
-			# constraints from other points in the domain
-			for j in range(1, min(k+1, len(Xhat))):
-				if np.isclose(D[i,I[i,0]], D[i,I[i,j]]):	
-					nullspace += [LTL.dot(Xhat[I[i,0]] - Xhat[I[i,j]]).reshape(-1,1)]
-					#h[i] += (X0[i] - Xhat[I[i,j]])
-
-			nullspace = np.hstack(nullspace)
-			# If there are no active constraints, don't do anything
-			if nullspace.shape[1]>0:
-				Q, R = scipy.linalg.qr(nullspace, overwrite_a = True, mode = 'economic')
-				h[i] -= Q.dot(Q.T.dot(h[i]))
-				if np.isclose(np.linalg.norm(h[i]), 0) and randomize:
-					# If L is low-rank we can have situations where h[i]	
-					# as constructed above is in the nullspace of constraints
-					# and hence is approximately zero.  When randomize=True
-					# we choose a random search direction so we can still make 
-					# progress towards satisfying m constraints.
-					h[i] = np.random.randn(*h[i].shape)
-					h[i] -= Q.dot(Q.T.dot(h[i]))
-				#print("k=%d, constraints %d, norm %g" % (k, Q.shape[1], np.linalg.norm(h[i])))
-		
 		# Now we find the furthest we can step along this direction before either hitting a
 		# (1) separating hyperplane separating x0 and points in Xhat or 
 		# (2) the boundary of the domain
 
-		alpha = np.inf*np.ones(X0.shape[0])
-
 		# (1) Take a step until we run into a separating hyperplane
-		for xhat in Xhat:
-			# we setup a hyperplane (p - p0)^* n  = 0 
-			# where p0 is a point on the hyperplane
-			# separating the closest point Xhat[:,I[:,0]] and xhat
-			p0 = 0.5*(L.dot( (xhat + Xhat[I[:,0]]).T).T)
-			n = L.dot( (xhat - Xhat[I[:,0]]).T).T
-
-			# Inner product of normal n with search direction h
-			nh = np.sum(n*L.dot(h.T).T, axis = 1)
-
-			# Inner product for the numerator (x0 - p0)^* n
-			numerator = -np.sum( (L.dot(X0.T).T - p0)*n, axis = 1)
-			
-			alpha_c = np.inf*np.ones(alpha.shape)
-			act = ~np.isclose(np.abs(nh), 0) 
-			alpha_c[act] = numerator[act]/nh[act]
-			# When xhat is the closest point, we get a divide by zero error
-			# We cannot move backwards, so these are also set to infinity
-			alpha_c[alpha_c < 0 ] = np.inf
-			alpha = np.minimum(alpha, alpha_c)
+		alpha = _hyperplane_step(Z0, Zhat, I[:,0], h @ Lz)
 
 		# (2) Find intersection with the domain
 		# cf., Domain._extent_ineq 
@@ -292,6 +305,9 @@ def voronoi_vertex_sample(domain, Xhat, X0, L = None, randomize = True):
 			alpha_c = (b - AX0)/Ah
 		alpha_c[~np.isfinite(alpha_c)] = np.inf
 		alpha_c[alpha_c <= 0] = np.inf
+		# Active constraints have been projected out of h, so any remaining
+		# component of Ah is roundoff and must not limit the step
+		alpha_c[active] = np.inf
 		# When the step size is near zero, the above formula is inaccurate
 		# causing points to emerge outside of the domain. Hence, we zero the
 		# step size for these points.
@@ -312,3 +328,133 @@ def voronoi_vertex_sample(domain, Xhat, X0, L = None, randomize = True):
 	#X0 = X0[domain.isinside(X0)]
 
 	return X0
+
+
+# Largest dimension of the range of L for which we use a KD-tree for nearest site queries
+_KDTREE_MAX_DIM = 10
+
+# Maximum number of entries in the temporary distance matrices 
+_CHUNK_SIZE = 2**20
+
+
+def _nearest_sites(Z0, Zhat, n_near, tree = None):
+	r""" Distances and indices of the n_near closest sites Zhat to each point Z0, sorted by distance 
+	"""
+	if tree is not None:
+		D, I = tree.query(Z0, k = n_near)
+		return D.reshape(len(Z0), n_near), I.reshape(len(Z0), n_near)
+
+	D = np.zeros((len(Z0), n_near))
+	I = np.zeros((len(Z0), n_near), dtype = int)
+	chunk = max(1, _CHUNK_SIZE // max(len(Zhat),1))
+	for start in range(0, len(Z0), chunk):
+		stop = min(start + chunk, len(Z0))
+		Dc = scipy.spatial.distance.cdist(Z0[start:stop], Zhat) 
+		if n_near < Dc.shape[1]:
+			Ic = np.argpartition(Dc, n_near - 1, axis = 1)[:,:n_near]
+		else:
+			Ic = np.tile(np.arange(Dc.shape[1]), (stop - start, 1))
+		Dc = np.take_along_axis(Dc, Ic, axis = 1)
+		J = np.argsort(Dc, axis = 1)
+		D[start:stop] = np.take_along_axis(Dc, J, axis = 1)
+		I[start:stop] = np.take_along_axis(Ic, J, axis = 1)
+	return D, I
+
+
+def _project_active(h, A_eq, A, active, LTLXhat, I, hyper, randomize):
+	r""" Project each search direction h[i] onto the orthogonal complement of its active constraints
+
+	For each block of points the active constraint normals are gathered into a stacked (n, m, c) array, 
+	with zero padding after the active columns, 
+	and an orthonormal basis for each is computed using a batched factorization.
+	"""
+	N, m = h.shape
+	# Static normals (equality and inequality constraints) share one table;
+	# hyperplane normals depend on the nearest sites of each point 
+	static = np.vstack([A_eq.reshape(-1, m), A.reshape(-1, m)])
+	n_static = static.shape[0]
+	mask = np.hstack([np.ones((N, A_eq.shape[0]), dtype = bool), active, hyper])
+	n_active = np.sum(mask, axis = 1)
+	c = int(np.max(n_active)) if N > 0 else 0
+	if c == 0:
+		return h
+	
+	h = np.array(h, dtype = float)
+	chunk = max(1, _CHUNK_SIZE // max(m*c, 1))
+	for start in range(0, N, chunk):
+		stop = min(start + chunk, N)
+		if np.max(n_active[start:stop]) == 0:
+			continue
+		h[start:stop] = _project_active_block(h[start:stop], static, n_static, mask[start:stop], 
+			LTLXhat, I[start:stop], randomize)
+	return h
+
+
+def _project_active_block(h, static, n_static, mask, LTLXhat, I, randomize):
+	r""" Project a block of search directions; see _project_active
+	"""
+	n, m = h.shape
+	n_active = np.sum(mask, axis = 1)
+	c = int(np.max(n_active))
+
+	# Indices of the active candidates first, truncated to the largest number of active constraints 
+	order = np.argsort(~mask, axis = 1, kind = 'stable')[:,:c]
+	valid = np.take_along_axis(mask, order, axis = 1)
+	is_static = order < n_static
+	B = static[np.minimum(order, max(n_static-1, 0))] if n_static > 0 else np.zeros((n, c, m))
+	if np.any(~is_static):
+		# Normal of the hyperplane separating the closest site from site k
+		k = np.clip(order - n_static, 0, I.shape[1] - 2) + 1
+		Bh = LTLXhat[I[:,0:1]] - LTLXhat[np.take_along_axis(I, k, axis = 1)]
+		B = np.where(is_static[:,:,None], B, Bh)
+	B = (B * valid[:,:,None]).transpose(0,2,1)
+
+	# An SVD rather than a QR so that dependent and zero padding columns do not contribute 
+	Q, s, _ = np.linalg.svd(B, full_matrices = False)
+	rank = s > (np.max(s, axis = 1, keepdims = True)*max(m, c)*np.finfo(float).eps)
+	Q = Q * rank[:,None,:]
+
+	has_constraints = n_active > 0
+	h = np.where(has_constraints[:,None], h - np.einsum('nij,nj->ni', Q, np.einsum('nij,ni->nj', Q, h)), h)
+	
+	if randomize:
+		# If L is low-rank we can have situations where h[i]	
+		# as constructed above is in the nullspace of constraints
+		# and hence is approximately zero.  When randomize=True
+		# we choose a random search direction so we can still make 
+		# progress towards satisfying m constraints.
+		redo = has_constraints & np.isclose(np.linalg.norm(h, axis = 1), 0)
+		if np.any(redo):
+			hr = np.random.randn(np.sum(redo), m)
+			Qr = Q[redo]
+			h[redo] = hr - np.einsum('nij,nj->ni', Qr, np.einsum('nij,ni->nj', Qr, hr))
+	return h
+
+
+def _hyperplane_step(Z0, Zhat, I0, Zh):
+	r""" Largest step alpha >= 0 along Zh before Z0 + alpha Zh crosses a hyperplane
+	separating its closest site Zhat[I0] from any other site 
+	"""
+	alpha = np.inf*np.ones(len(Z0))
+	chunk = max(1, _CHUNK_SIZE // max(Zhat.shape[0]*Zhat.shape[1],1))
+	for start in range(0, len(Z0), chunk):
+		stop = min(start + chunk, len(Z0))
+		z0, zh, y0 = Z0[start:stop], Zh[start:stop], Zhat[I0[start:stop]]
+		# we setup a hyperplane (p - p0)^* n  = 0 
+		# where p0 is a point on the hyperplane separating the closest point y0 and each zhat;
+		# the differences are formed explicitly as for equidistant sites both nh and 
+		# the numerator should vanish  
+		n = Zhat[None,:,:] - y0[:,None,:]
+		p0 = 0.5*(Zhat[None,:,:] + y0[:,None,:])
+		# Inner product of normal n with search direction h
+		nh = np.einsum('nij,nj->ni', n, zh)
+		# Inner product for the numerator (x0 - p0)^* n
+		numerator = -np.einsum('nij,nij->ni', z0[:,None,:] - p0, n)
+		alpha_c = np.inf*np.ones(nh.shape)
+		act = ~np.isclose(np.abs(nh), 0) 
+		alpha_c[act] = numerator[act]/nh[act]
+		# When xhat is the closest point, we get a divide by zero error
+		# We cannot move backwards, so these are also set to infinity
+		alpha_c[alpha_c < 0 ] = np.inf
+		alpha[start:stop] = np.min(alpha_c, axis = 1)
+	return alpha
@@ -388,7 +388,7 @@ class PolynomialRidgeApproximation(PolynomialRidgeFunction):
 
 		U = b[0:-1].reshape(-1,1)
 		# Correct for transform 
-		U = dom._normalize_der().dot(U)
+		U = dom._normalize_scale()[:,None]*U
 		# Force to have unit norm
 		U /= np.linalg.norm(U)
 		return U	
@@ -1,8 +1,9 @@
 from __future__ import print_function
 import numpy as np
 import scipy.linalg
+from scipy.special import binom
 
-__all__ = ['gauss']
+__all__ = ['gauss', 'clenshaw_curtis', 'smolyak', 'smolyak_size']
 
 def gauss(N, a = 0, b = 1):
 	r""" Gauss-Legendre quadrature rule 
@@ -46,3 +47,214 @@ def gauss(N, a = 0, b = 1):
 
 	return x, w
 
+
+def clenshaw_curtis(N, a = 0, b = 1):
+	r""" Clenshaw-Curtis quadrature rule
+
+	This rule samples at the :math:`N` Chebyshev extreme points
+	:math:`x_j = -\cos(\pi j/(N-1))`
+	and uses weights that integrate the Chebyshev polynomials of degree less than :math:`N` exactly [Wal06]_.
+	With :math:`N = 2^{\ell-1}+1` points the rules are nested:
+	each rule contains all the points of the rules on coarser levels.
+
+	Parameters
+	----------
+	N: int
+		number of samples to use in quadrature rule
+	a: float, default 0
+		left endpoint
+	b: float, default 1
+		right endpoint
+
+	Returns
+	-------
+	x: np.ndarray
+		locations at which to sample
+	w: np.ndarray
+		weights
+
+	References
+	----------
+	.. [Wal06] Jorg Waldvogel.
+		Fast Construction of the Fejer and Clenshaw-Curtis Quadrature Rules.
+		BIT Numerical Mathematics 46 (2006) pp. 195--202.
+	"""
+	a, b = float(a), float(b)
+	N = int(N)
+	if N == 1:
+		return np.array([(a + b)/2.]), np.array([b - a])
+
+	n = N - 1
+	theta = np.pi*np.arange(N)/n
+	x = -np.cos(theta)
+	if n % 2 == 0:
+		x[n//2] = 0
+
+	k = np.arange(1, n//2 + 1)
+	bk = 2.*np.ones(len(k))
+	if n % 2 == 0:
+		bk[-1] = 1.
+	w = 1 - np.cos(2*np.outer(theta, k)) @ (bk/(4*k**2 - 1))
+	w *= 2./n
+	w[0] /= 2
+	w[-1] /= 2
+
+	x = a + (b - a)/2.*(1.+x)
+	w = ((b-a)/2.)*w
+	return x, w
+
+
+def _cc_size(level):
+	r""" Number of points in the nested Clenshaw-Curtis rule on a level (starting at zero)
+	"""
+	return 1 if level == 0 else 2**level + 1
+
+
+def _tensor_rule(xs, ws):
+	r""" Tensor product of one-dimensional quadrature rules
+
+	Each column of the points is filled by broadcasting the one-dimensional nodes
+	and the weights are formed by successive outer products,
+	rather than forming a meshgrid of every coordinate and weight.
+	"""
+	shape = tuple(len(x) for x in xs)
+	m = len(xs)
+	X = np.empty(shape + (m,))
+	for i, x in enumerate(xs):
+		X[...,i] = x.reshape([-1 if j == i else 1 for j in range(m)])
+	w = ws[0]
+	for wi in ws[1:]:
+		w = np.multiply.outer(w, wi)
+	return X.reshape(-1, m), np.asarray(w).reshape(-1)
+
+
+def smolyak_size(m, level):
+	r""" Number of distinct points in a Smolyak sparse grid with nested Clenshaw-Curtis rules
+
+	This is computed without constructing the grid, so that the level can be chosen to fit a budget.
+
+	Parameters
+	----------
+	m: int
+		dimension
+	level: int
+		level of the sparse grid (zero is the single point in the center)
+
+	Returns
+	-------
+	int
+		number of points in the sparse grid
+	"""
+	# Number of points added by each one-dimensional level
+	new = [1, 2] + [2**(k-1) for k in range(2, level + 1)]
+	new = new[:level+1]
+	# Coefficients of the product of m copies of the generating polynomial, truncated at the level
+	count = [1] + [0]*level
+	for i in range(m):
+		count = [sum(count[j]*new[k-j] for j in range(k+1)) for k in range(level+1)]
+	return int(sum(count))
+
+
+def _multi_indices(m, lo, hi):
+	r""" Multi-indices of length m with sum between lo and hi, stored sparsely as (axes, levels)
+	"""
+	def recurse(start, remaining):
+		yield [], []
+		for i in range(start, m):
+			for k in range(1, remaining + 1):
+				for axes, levels in recurse(i + 1, remaining - k):
+					yield [i] + axes, [k] + levels
+
+	for axes, levels in recurse(0, hi):
+		if sum(levels) >= lo:
+			yield axes, levels
+
+
+def smolyak(m, level, lb = None, ub = None):
+	r""" Smolyak sparse grid quadrature rule with nested Clenshaw-Curtis rules
+
+	The sparse grid [GG98]_ is constructed using the combination technique
+
+	.. math::
+
+		Q_\ell^m = \sum_{\ell - m + 1 \le |\mathbf k| \le \ell} (-1)^{\ell - |\mathbf k|}
+			\binom{m-1}{\ell - |\mathbf k|} Q_{k_1} \otimes \cdots \otimes Q_{k_m}
+
+	where :math:`Q_k` is the Clenshaw-Curtis rule with :math:`2^k+1` points (one point when :math:`k=0`).
+	As these one-dimensional rules are nested, the points of the tensor products coincide
+	and each point is stored once with the sum of its weights.
+	Each tensor product only involves the (few) axes with :math:`k_i > 0`;
+	all other coordinates are at the center.
+	The rule integrates polynomials of total degree :math:`2\ell+1` exactly.
+
+	Note that unlike a Gauss rule, some of the weights will be negative.
+
+	Parameters
+	----------
+	m: int
+		dimension
+	level: int
+		level of the sparse grid; see :meth:`smolyak_size` for the number of points
+	lb: array-like (m,), optional
+		lower bounds of the box to integrate over; defaults to zeros
+	ub: array-like (m,), optional
+		upper bounds of the box to integrate over; defaults to ones
+
+	Returns
+	-------
+	X: np.ndarray (M, m)
+		locations at which to sample
+	w: np.ndarray (M,)
+		weights
+
+	References
+	----------
+	.. [GG98] Thomas Gerstner and Michael Griebel.
+		Numerical integration using sparse grids.
+		Numerical Algorithms 18 (1998) pp. 209--232.
+	"""
+	m = int(m)
+	level = int(level)
+	lb = np.zeros(m) if lb is None else np.array(lb, dtype = float).reshape(m)
+	ub = np.ones(m) if ub is None else np.array(ub, dtype = float).reshape(m)
+
+	# Points on each level are indexed by their position on the finest one-dimensional grid
+	nfine = _cc_size(level)
+	center = nfine//2
+	rules = []
+	for k in range(level + 1):
+		# Weights of a rule on the unit interval, so the center has weight one
+		x, w = clenshaw_curtis(_cc_size(k), 0, 1)
+		idx = np.array([center]) if k == 0 else np.arange(_cc_size(k))*2**(level - k)
+		rules.append((idx, w))
+
+	idxs = []
+	weights = []
+	for axes, levels in _multi_indices(m, max(level - m + 1, 0), level):
+		total = sum(levels)
+		coef = (-1)**(level - total)*binom(m - 1, level - total)
+		if coef == 0:
+			continue
+		if len(axes) == 0:
+			idx = np.full((1, m), center)
+			w = np.ones(1)
+		else:
+			I, w = _tensor_rule([rules[k][0] for k in levels], [rules[k][1] for k in levels])
+			idx = np.full((len(I), m), center)
+			idx[:,axes] = I
+		idxs.append(idx)
+		weights.append(coef*w)
+
+	# Merge coincident points; comparing rows as raw bytes of small integers is far faster than unique(axis = 0)
+	idxs = np.vstack(idxs).astype(np.min_scalar_type(nfine))
+	rows = np.ascontiguousarray(idxs).view(np.dtype((np.void, idxs.dtype.itemsize*m))).reshape(-1)
+	_, first, inv = np.unique(rows, return_index = True, return_inverse = True)
+	idx = idxs[first]
+	w = np.bincount(inv.reshape(-1), weights = np.hstack(weights), minlength = len(idx))
+
+	# Map from [-1,1]^m to the box
+	xfine = -np.cos(np.pi*np.arange(nfine)/max(nfine - 1, 1)) if nfine > 1 else np.zeros(1)
+	xfine[center] = 0
+	X = lb + (ub - lb)/2.*(1 + xfine[idx])
+	w *= np.prod(ub - lb)
+	return X, w
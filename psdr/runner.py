@@ -0,0 +1,316 @@
+r""" Runners that evaluate simulations on a pool of long-lived workers
+"""
+from __future__ import print_function
+import os
+import time
+import json
+import queue
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .exceptions import FunctionEvaluationError
+
+__all__ = ['SimulationRunner', 'LocalRunner', 'DockerRunner']
+
+
+class SimulationRunner(object):
+	r""" Abstract base class for running batches of simulations on a pool of workers
+
+	A runner owns a fixed number of long-lived workers
+	(e.g., a Docker container or a local process) that each accept many jobs.
+	Calling the runner with a matrix of inputs splits the rows into batches,
+	sends each batch to an idle worker, and returns the outputs in the same order as the rows.
+	Jobs that fail or exceed the timeout are retried;
+	if a job still fails, a :code:`FunctionEvaluationError` is raised after all other jobs finish.
+
+	As a runner is callable with a matrix of inputs, it can be wrapped
+	in a :class:`psdr.Function` with :code:`vectorized = True`.
+
+	Parameters
+	----------
+	workers: int, optional
+		Number of workers
+	batch_size: int, optional
+		Number of jobs sent to a worker at once
+	timeout: float, optional
+		Number of seconds after which a job is considered to have failed
+	retries: int, optional
+		Number of times to retry a failed job
+	"""
+	def __init__(self, workers = 1, batch_size = 1, timeout = None, retries = 0):
+		self.workers = workers
+		self.batch_size = batch_size
+		self.timeout = timeout
+		self.retries = retries
+		self._started = False
+
+	def start(self):
+		r""" Start the workers; called automatically on first use
+		"""
+		for worker in range(self.workers):
+			self._start_worker(worker)
+		self._started = True
+
+	def close(self):
+		r""" Stop the workers
+		"""
+		if self._started:
+			for worker in range(self.workers):
+				self._stop_worker(worker)
+		self._started = False
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def _start_worker(self, worker):
+		pass
+
+	def _stop_worker(self, worker):
+		pass
+
+	def _handle_failure(self, worker, error):
+		r""" Called after a job on this worker fails, e.g., to replace a hung process
+		"""
+		pass
+
+	def _run_job(self, worker, x, kwargs):
+		r""" Run a single job on the given worker and return its output
+		"""
+		raise NotImplementedError
+
+	def _run_batch(self, worker, X, kwargs):
+		r""" Run a batch of jobs on the given worker, returning either the output or the final exception of each
+		"""
+		results = []
+		for x in X:
+			for attempt in range(self.retries + 1):
+				try:
+					results.append(self._run_job(worker, x, kwargs))
+					break
+				except Exception as e:
+					error = e
+					self._handle_failure(worker, e)
+			else:
+				results.append(error)
+		return results
+
+	def run(self, X, **kwargs):
+		r""" Run a job for each row of X
+
+		Parameters
+		----------
+		X: array-like (M, m)
+			Inputs of each job
+		**kwargs: dict
+			Additional arguments describing the jobs
+
+		Returns
+		-------
+		outputs: list
+			Output of each job in the same order as the rows of X
+		"""
+		if not self._started:
+			self.start()
+		X = np.atleast_2d(X)
+
+		# Each batch claims an idle worker for its duration
+		idle = queue.Queue()
+		for worker in range(self.workers):
+			idle.put(worker)
+
+		def run_batch(Xb):
+			worker = idle.get()
+			try:
+				return self._run_batch(worker, Xb, kwargs)
+			finally:
+				idle.put(worker)
+
+		batches = [X[start:start + self.batch_size] for start in range(0, len(X), self.batch_size)]
+		with ThreadPoolExecutor(self.workers) as executor:
+			outputs = [out for outs in executor.map(run_batch, batches) for out in outs]
+
+		errors = {i: out for i, out in enumerate(outputs) if isinstance(out, Exception)}
+		if len(errors) > 0:
+			raise FunctionEvaluationError(errors)
+		return outputs
+
+	def __call__(self, X, **kwargs):
+		X = np.array(X)
+		outputs = self.run(X, **kwargs)
+		if len(X.shape) == 1:
+			return outputs[0]
+		# Outputs returning values and gradients are stacked separately
+		if isinstance(outputs[0], tuple):
+			return tuple(np.array([out[i] for out in outputs]) for i in range(len(outputs[0])))
+		return np.array(outputs)
+
+
+class LocalRunner(SimulationRunner):
+	r""" A runner evaluating a Python function in-process
+
+	This serves as a stand-in for an expensive simulation, e.g., using a cheap surrogate,
+	so that a pipeline built around a :class:`SimulationRunner` can be tested and
+	benchmarked without the simulation installed.
+	Each worker is a thread in this process.
+
+	Note that jobs running in-process cannot be interrupted;
+	a job that exceeds the timeout is treated as failed only after it finishes.
+
+	Parameters
+	----------
+	fun: callable
+		Function evaluated for each job
+	vectorized: bool, optional
+		If True, fun is called once per batch with a matrix of inputs;
+		if this fails, each job is retried on its own as a matrix with one row
+	**kwargs:
+		Arguments of :class:`SimulationRunner`
+	"""
+	def __init__(self, fun, vectorized = False, **kwargs):
+		SimulationRunner.__init__(self, **kwargs)
+		self.fun = fun
+		self.vectorized = vectorized
+
+	def _check_timeout(self, start):
+		if self.timeout is not None and time.time() - start > self.timeout:
+			raise TimeoutError("Job exceeded timeout of %g seconds" % self.timeout)
+
+	def _run_job(self, worker, x, kwargs):
+		start = time.time()
+		if self.vectorized:
+			# Evaluate a single row as a matrix with one row
+			out = self.fun(np.asarray(x).reshape(1,-1), **kwargs)
+			if isinstance(out, tuple):
+				out = tuple(o[0] for o in out)
+			else:
+				out = out[0]
+		else:
+			out = self.fun(x, **kwargs)
+		self._check_timeout(start)
+		return out
+
+	def _run_batch(self, worker, X, kwargs):
+		if self.vectorized:
+			try:
+				start = time.time()
+				out = self.fun(X, **kwargs)
+				self._check_timeout(start)
+				if isinstance(out, tuple):
+					return [tuple(o[i] for o in out) for i in range(len(X))]
+				return [o for o in out]
+			except Exception:
+				# Fall back to running the jobs individually so only failing jobs are retried
+				pass
+		return SimulationRunner._run_batch(self, worker, X, kwargs)
+
+
+class DockerRunner(SimulationRunner):
+	r""" A runner executing jobs inside long-lived Docker containers
+
+	Rather than starting a new container for every evaluation,
+	each worker is a container started once that sleeps in the background;
+	jobs are run inside it using :code:`docker exec` with the image's entrypoint.
+	Each worker has a directory on the host mounted at :code:`/workdir` in the container
+	and each job is given a subdirectory of a per-batch directory;
+	the inputs for all jobs in a batch are written before the first job starts
+	and the outputs of each job are read as soon as it finishes.
+	A job that times out causes the container to be replaced.
+
+	Parameters
+	----------
+	image: str
+		Docker image, e.g., :code:`jeffreyhokanson/naca0012:v1`
+	write_input: callable
+		:code:`write_input(jobdir, x, **kwargs)` writes the input files for one job to the host directory jobdir
+	command: callable
+		:code:`command(jobdir, **kwargs)` returns the list of arguments passed to the entrypoint,
+		where jobdir is the path of the job directory inside the container
+	read_output: callable
+		:code:`read_output(jobdir, **kwargs)` reads the output of one job from the host directory jobdir
+	keep_data: bool, optional
+		If True, do not delete the working directories when the runner is closed
+	verbose: bool, optional
+		If True, print the output of each job
+	**kwargs:
+		Arguments of :class:`SimulationRunner`
+	"""
+	def __init__(self, image, write_input, command, read_output, keep_data = False, verbose = False, **kwargs):
+		SimulationRunner.__init__(self, **kwargs)
+		self.image = image
+		self.write_input = write_input
+		self.command = command
+		self.read_output = read_output
+		self.keep_data = keep_data
+		self.verbose = verbose
+		self._containers = {}
+		self._workdirs = {}
+		self._nbatches = {}
+		self._entrypoint = None
+
+	@property
+	def entrypoint(self):
+		if self._entrypoint is None:
+			out = subprocess.check_output(['docker', 'inspect', '--format', '{{json .Config.Entrypoint}}', self.image])
+			self._entrypoint = json.loads(out.decode()) or []
+		return self._entrypoint
+
+	def _start_worker(self, worker):
+		if worker not in self._workdirs:
+			self._workdirs[worker] = tempfile.mkdtemp(dir = '/tmp')
+		out = subprocess.check_output(['docker', 'run', '-d', '--rm',
+			'--mount', 'type=bind,source=%s,target=/workdir' % self._workdirs[worker],
+			'--user', '%d' % os.getuid(),
+			'--entrypoint', 'sleep', self.image, 'infinity'])
+		self._containers[worker] = out.decode().strip()
+
+	def _stop_worker(self, worker):
+		if worker in self._containers:
+			subprocess.call(['docker', 'rm', '-f', self._containers.pop(worker)],
+				stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+		if worker in self._workdirs and not self.keep_data:
+			shutil.rmtree(self._workdirs.pop(worker), ignore_errors = True)
+
+	def _handle_failure(self, worker, error):
+		# The process inside the container may still be running after a timeout
+		if isinstance(error, subprocess.TimeoutExpired):
+			subprocess.call(['docker', 'rm', '-f', self._containers.pop(worker)],
+				stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+			self._start_worker(worker)
+
+	def _run_batch(self, worker, X, kwargs):
+		# Only one batch runs on a worker at a time, so each worker can keep its own count
+		self._nbatches[worker] = self._nbatches.get(worker, 0) + 1
+		batch = 'batch_%06d' % self._nbatches[worker]
+		jobs = []
+		for i, x in enumerate(X):
+			job = os.path.join(batch, 'job_%06d' % i)
+			os.makedirs(os.path.join(self._workdirs[worker], job))
+			self.write_input(os.path.join(self._workdirs[worker], job), x, **kwargs)
+			jobs.append(job)
+
+		results = SimulationRunner._run_batch(self, worker, jobs, kwargs)
+
+		if not self.keep_data:
+			shutil.rmtree(os.path.join(self._workdirs[worker], batch), ignore_errors = True)
+		return results
+
+	def _run_job(self, worker, job, kwargs):
+		jobdir = '/workdir/' + job
+		args = ['docker', 'exec', '--workdir', jobdir, self._containers[worker]] \
+			+ self.entrypoint + self.command(jobdir, **kwargs)
+		with open(os.path.join(self._workdirs[worker], job, 'output.log'), 'ab') as log:
+			p = subprocess.run(args, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, timeout = self.timeout)
+			log.write(p.stdout)
+		if self.verbose:
+			print(p.stdout.decode(errors = 'replace'))
+		if p.returncode != 0:
+			raise RuntimeError("Job %s exited with error code %d" % (job, p.returncode))
+		return self.read_output(os.path.join(self._workdirs[worker], job), **kwargs)
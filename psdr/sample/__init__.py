@@ -12,6 +12,7 @@ from .projection import *
 from .random_sample import *
 from .sample import *
 from .poisson import *
+from .discrete import *
 from .maximin_coffeehouse import *
 from .minimax_scale import *
 from .stretch import *
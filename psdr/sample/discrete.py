@@ -0,0 +1,264 @@
+from __future__ import print_function, division
+
+import heapq
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .util import low_rank_L
+
+__all__ = ['greedy_maximin_discrete', 'greedy_minimax_discrete', 'greedy_covering_discrete']
+
+
+def _metric_coordinates(X, L = None):
+	r""" Coordinates of the candidates in which the L-norm is the Euclidean norm
+	"""
+	X = np.atleast_2d(np.array(X, dtype = float))
+	if L is None:
+		return X
+	return X.dot(low_rank_L(L).T)
+
+
+def _chunks(M, chunk):
+	return [slice(start, min(start + chunk, M)) for start in range(0, M, int(chunk))]
+
+
+def _update_nearest(YT, y, d2, chunk = 2**16, executor = None):
+	r""" Update the squared distance from each candidate to its nearest selected point after selecting y
+
+	The candidates are stored by coordinate (YT has shape (k, M)) and processed in chunks 
+	to limit the size of temporary arrays; if an executor is provided, chunks are processed in parallel.
+	"""
+	def update(I):
+		acc = np.zeros(I.stop - I.start)
+		for yt, yj in zip(YT, y):
+			diff = yt[I] - yj
+			diff *= diff
+			acc += diff
+		np.minimum(d2[I], acc, out = d2[I])
+
+	if executor is None:
+		for I in _chunks(YT.shape[1], chunk):
+			update(I)
+	else:
+		list(executor.map(update, _chunks(YT.shape[1], chunk)))
+	return d2
+
+
+def _farthest_first(Y, N, start, d2, chunk, executor):
+	r""" Greedily select the candidate farthest from those already selected
+	"""
+	N = min(int(N), len(Y))
+	YT = np.ascontiguousarray(Y.T)
+	I = []
+	i = start
+	while len(I) < N:
+		if d2[i] == 0:
+			# Every candidate coincides with a selected point
+			break
+		I.append(i)
+		_update_nearest(YT, Y[i], d2, chunk = chunk, executor = executor)
+		i = int(np.argmax(d2))
+	return np.array(I, dtype = int)
+
+
+def greedy_maximin_discrete(X, N, L = None, X0 = None, chunk = 2**16, executor = None):
+	r""" Greedy maximin design selected from a set of candidates
+
+	Starting from the candidate farthest from the centroid of the candidates
+	(or, if provided, from an existing design X0), this repeatedly selects the candidate
+	farthest from all points selected so far in the metric :math:`\| \mathbf L (\mathbf x - \mathbf x')\|_2`.
+	This farthest point strategy yields a design whose minimum pairwise distance
+	is at least half that of the best maximin design chosen from the candidates [Gon85]_.
+
+	Only a vector of distances from each candidate to its nearest selected point is stored,
+	and updating it after each selection takes :math:`\mathcal{O}(M)` operations
+	for M candidates; this update is performed in chunks to bound memory use
+	and optionally in parallel.
+
+	Parameters
+	----------
+	X: array-like (M, m)
+		Candidate points
+	N: int
+		Number of points to select
+	L: array-like (*, m), optional
+		Matrix defining the metric; defaults to the identity
+	X0: array-like (M0, m), optional
+		Points already in the design that the selected points should be far from
+	chunk: int, optional
+		Number of candidates to process at once
+	executor: concurrent.futures.Executor, optional
+		If provided, process chunks in parallel using this executor's map,
+		e.g., a ThreadPoolExecutor.
+
+	Returns
+	-------
+	I: np.ndarray (N,)
+		Indices of the selected candidates in the order they were selected;
+		fewer than N if every remaining candidate coincides with a selected point or a point in X0
+
+	References
+	----------
+	.. [Gon85] Teofilo F. Gonzalez.
+		Clustering to Minimize the Maximum Intercluster Distance.
+		Theoretical Computer Science 38 (1985) 293-306
+	"""
+	Y = _metric_coordinates(X, L)
+	d2 = np.full(len(Y), np.inf)
+	if X0 is not None and len(X0) > 0:
+		YT = np.ascontiguousarray(Y.T)
+		for y0 in _metric_coordinates(X0, L):
+			_update_nearest(YT, y0, d2, chunk = chunk, executor = executor)
+		start = int(np.argmax(d2))
+	else:
+		center = np.mean(Y, axis = 0)
+		start = int(np.argmax(np.sum((Y - center)**2, axis = 1)))
+	return _farthest_first(Y, N, start, d2, chunk, executor)
+
+
+def greedy_minimax_discrete(X, N, L = None, chunk = 2**16, executor = None, return_radius = False):
+	r""" Greedy minimax design (k-center) selected from a set of candidates
+
+	This chooses N candidates such that the maximum distance from any candidate to
+	its nearest selected point is small using the greedy k-center algorithm [Gon85]_:
+	starting from the candidate closest to the centroid of the candidates,
+	this repeatedly selects the candidate farthest from all points selected so far.
+	The resulting covering radius is at most twice the optimal radius
+	for any N points selected from the candidates.
+
+	As in :meth:`psdr.greedy_maximin_discrete`, only the distance from each candidate
+	to its nearest selected point is stored and updated after each selection.
+
+	Parameters
+	----------
+	X: array-like (M, m)
+		Candidate points
+	N: int
+		Number of points to select
+	L: array-like (*, m), optional
+		Matrix defining the metric; defaults to the identity
+	chunk: int, optional
+		Number of candidates to process at once
+	executor: concurrent.futures.Executor, optional
+		If provided, process chunks in parallel using this executor's map
+	return_radius: bool, optional
+		If True, also return the maximum distance from a candidate to its nearest selected point
+
+	Returns
+	-------
+	I: np.ndarray (N,)
+		Indices of the selected candidates in the order they were selected;
+		fewer than N if every remaining candidate coincides with a selected point
+	radius: float
+		Covering radius of the selected points, if return_radius is True
+	"""
+	Y = _metric_coordinates(X, L)
+	center = np.mean(Y, axis = 0)
+	start = int(np.argmin(np.sum((Y - center)**2, axis = 1)))
+	d2 = np.full(len(Y), np.inf)
+	I = _farthest_first(Y, N, start, d2, chunk, executor)
+	if return_radius:
+		return I, float(np.sqrt(np.max(d2)))
+	return I
+
+
+def greedy_covering_discrete(X, r, L = None, N = None, chunk = 2**16, workers = 1):
+	r""" Select candidates such that every candidate is within r of a selected point
+
+	This approximately solves the covering problem of :meth:`psdr.minimax_covering_discrete`
+	using the greedy algorithm: it repeatedly selects the candidate whose ball of radius r
+	contains the most candidates not already covered.
+	The number of points selected is within a logarithmic factor of the smallest covering.
+	As the number of newly covered candidates can only decrease as points are selected,
+	we use lazy evaluation [Min78]_: candidates are kept in a priority queue
+	ordered by a possibly stale count, and counts are only recomputed for candidates at the top of the queue.
+
+	Uncovered candidates are stored in a KD-tree, in coordinates where the L-norm
+	is the Euclidean norm, which is rebuilt as candidates are covered.
+	Stale counts are recomputed in batches using this tree, giving upper bounds on the 
+	number of newly covered candidates; exact counts are only computed for the candidate 
+	at the top of the queue.
+	The cost is dominated by counting the candidates in each ball, and so grows with
+	the number of candidates times the number of candidates inside a ball of radius r.
+
+	Parameters
+	----------
+	X: array-like (M, m)
+		Candidate points
+	r: float, positive
+		Covering radius
+	L: array-like (*, m), optional
+		Matrix defining the metric; defaults to the identity
+	N: int, optional
+		Maximum number of points to select
+	chunk: int, optional
+		Number of candidates to process at once
+	workers: int, optional
+		Number of threads used to query the KD-tree; -1 uses all processors
+
+	Returns
+	-------
+	I: np.ndarray
+		Indices of the selected candidates in the order they were selected
+
+	References
+	----------
+	.. [Min78] Michel Minoux.
+		Accelerated Greedy Algorithms for Maximizing Submodular Set Functions.
+		Optimization Techniques, Lecture Notes in Control and Information Sciences 7, 1978, 234-243
+	"""
+	Y = _metric_coordinates(X, L)
+	M = len(Y)
+	N = M if N is None else min(int(N), M)
+	covered = np.zeros(M, dtype = bool)
+
+	# Tree over the candidates uncovered when it was built;
+	# n_stale counts those covered since then
+	unc = np.arange(M)
+	tree = cKDTree(Y)
+	n_stale = 0
+
+	gain = np.zeros(M, dtype = int)
+	for J in _chunks(M, chunk):
+		gain[J] = tree.query_ball_point(Y[J], r, return_length = True, workers = workers)
+
+	# Python's heap is a min-heap, so we store negated counts.
+	# Each entry is stamped with 2*epoch + exact, where epoch is the number of points selected
+	# when the count was computed, and exact indicates if the count or only an upper bound is known.
+	heap = [(-g, i, 1) for i, g in enumerate(gain)]
+	heapq.heapify(heap)
+
+	epoch = 0
+	n_covered = 0
+	I = []
+	while len(I) < N and n_covered < M:
+		g, i, stamp = heap[0]
+		if stamp == 2*epoch + 1:
+			# The count is exact and no other candidate can cover more
+			heapq.heappop(heap)
+			nbrs = unc[tree.query_ball_point(Y[i], r)]
+			new = nbrs[~covered[nbrs]]
+			covered[new] = True
+			n_covered += len(new)
+			n_stale += len(new)
+			I.append(i)
+			epoch += 1
+			if n_stale > len(unc)//20 and n_covered < M:
+				unc = np.flatnonzero(~covered)
+				tree = cKDTree(Y[unc])
+				n_stale = 0
+		elif stamp == 2*epoch:
+			# Replace the upper bound with the exact count
+			heapq.heappop(heap)
+			nbrs = unc[tree.query_ball_point(Y[i], r)]
+			heapq.heappush(heap, (-int(np.sum(~covered[nbrs])), i, 2*epoch + 1))
+		else:
+			# Recompute a batch of stale counts from the top of the queue
+			batch = []
+			while len(heap) > 0 and len(batch) < 256 and heap[0][2] < 2*epoch:
+				batch.append(heapq.heappop(heap)[1])
+			counts = tree.query_ball_point(Y[batch], r, return_length = True, workers = workers)
+			for c, j in zip(counts, batch):
+				heapq.heappush(heap, (-int(c), j, 2*epoch + int(n_stale == 0)))
+
+	return np.array(I, dtype = int)
@@ -54,7 +54,9 @@ def latin_hypercube_maximin(domain, N, maxiter = 1000):
 	of uniform projection onto the coordinate axes as well as 
 	samples that maximize the minimum pairwise distance.  
 
-	
+	On box domains the design is optimized using the enhanced stochastic evolutionary 
+	algorithm of [JCS05]_ on the :math:`\phi_p` criterion, 
+	returning the design with the best (lexicographic) maximin score found.
 
 	Parameters
 	----------
@@ -63,7 +65,15 @@ def latin_hypercube_maximin(domain, N, maxiter = 1000):
 	N: int
 		Number of samples to take
 	maxiter: int, optional
-		Number of iterations to perform trying to find the best design
+		Number of iterations to perform trying to find the best design;
+		on box domains, each iteration considers a batch of candidate exchanges
+		and accepts at most one.
+
+	References
+	----------
+	.. [JCS05] An efficient algorithm for constructing optimal design of computer experiments.
+		Ruichen Jin, Wei Chen, and Agus Sudjianto.
+		Journal of Statistical Planning and Inference 134 (2005) 268--287.
 	"""
 	if domain.is_box_domain:
 		return _latin_hypercube_maximin_box(domain, N, maxiter = maxiter)
@@ -72,53 +82,158 @@ def latin_hypercube_maximin(domain, N, maxiter = 1000):
 		return projection_sample(domain, N, None, maxiter = maxiter, _lhs = True) 
 
 
-def _latin_hypercube_maximin_box(domain, N, maxiter = 1000):
+def _latin_hypercube_maximin_box(domain, N, maxiter = 1000, p = 50):
 	r""" Construct a maximin distance Latin hypercube design
 
+	Each step of the enhanced stochastic evolutionary (ESE) algorithm proposes
+	a batch of exchanges of two entries in a single column of the design.
+	As an exchange only moves two points, we keep the (squared) pairwise distance matrix 
+	and only update the two affected rows and columns, along with 
+	:math:`\phi_p = (\sum_{i<j} d_{ij}^{-p})^{1/p}`,
+	the nearest neighbor distance of each point,
+	and the sorted nearest neighbor distances defining the maximin score.
+	Each step costs :math:`\mathcal{O}(N)` rather than the 
+	:math:`\mathcal{O}(N^2 \log N)` of rescoring the design.
+
 	Parameters
 	----------
 	domain: Domain
 		Domain on which to construct the design
+	N: int
+		Number of samples to take
+	maxiter: int
+		Number of steps, each proposing a batch of up to 50 exchanges
+	p: float
+		Exponent in the :math:`\phi_p` criterion guiding the search
 	"""
 
 	assert domain.is_box_domain, "This only works on box domains"
-	
+	N = int(N)
+	m = len(domain)
 
 	# Coordinates along each axis we'll be sampling at
 	xs = []
-	for i in range(len(domain)):
+	for i in range(m):
 		xi = np.linspace(domain.norm_lb[i], domain.norm_ub[i], N + 1)
 		xi = (xi[1:]+xi[0:-1])/2.
 		xs.append(xi)
-	
-	score_best = tuple(np.zeros(N))
-	X_best = None
+
 	# Generate random initial permutations
-	perms_best = np.vstack([np.random.permutation(N) for i in range(len(domain))])
+	X = np.vstack([ xs[i][np.random.permutation(N)] for i in range(m)]).T
+	if N < 2:
+		return X
+
+	# Distances are scaled by the smallest possible distance between two points in the design
+	# so that d_ij >= 1 and d_ij^{-p} cannot overflow
+	h2 = np.sum([ (xi[1] - xi[0])**2 for xi in xs])
+	D2 = squareform(pdist(X, 'sqeuclidean'))/h2
+	np.fill_diagonal(D2, np.inf)
+	Dp = D2**(-p/2.)
+	S = np.sum(Dp)/2.
 	
-	for it in range(maxiter):
-		# Generate new permutation of the permutations
-		i, j = np.random.permutation(N)[0:2]
+	nn = np.min(D2, axis = 1)
+	nn_sorted = np.sort(nn)
+	X_best = np.copy(X)
+	nn_best = np.copy(nn_sorted)
 	
-		r = np.random.rand(len(domain))
-		I = r >= min(max(r), 0.5)
-		perms = np.copy(perms_best)
-		perms[I,i] = perms_best[I,j]
-		perms[I,j] = perms_best[I,i]
+	# ESE parameters following JCS05 
+	n_pairs = N*(N-1)//2
+	J = int(min(max(n_pairs//5, 1), 50))
+	M_inner = int(min(max(2*n_pairs*m//J, 1), 100))
+	phi = S**(1./p)
+	T = 0.005*phi
+	rows = np.arange(N)
 
-		# Generate samples 
-		X = np.array([ [xs[i][j] for j in perms[i]] for i in range(len(domain))]).T
+	it = 0
+	while it < maxiter:
+		n_accept = 0
+		n_improve = 0
+		for inner in range(M_inner):
+			if it >= maxiter:
+				break
+			# J exchanges of entries i and j in column c
+			c = inner % m
+			it += 1
+			I = np.random.randint(0, N, size = J)
+			K = (I + np.random.randint(1, N, size = J)) % N
+			col = X[:,c]
+			# Change in squared distance from points i and j to all others
+			delta = ((col[K,None] - col[None,:])**2 - (col[I,None] - col[None,:])**2)/h2
+			Di = D2[I] + delta
+			Dk = D2[K] - delta
+			Di[np.arange(J), I] = np.inf
+			Dk[np.arange(J), K] = np.inf
+			Di[np.arange(J), K] = D2[I,K]
+			Dk[np.arange(J), I] = D2[I,K]
+			# The pair (i,j) does not change distance, but appears in both rows
+			dS = np.sum(Di**(-p/2.) - Dp[I], axis = 1) + np.sum(Dk**(-p/2.) - Dp[K], axis = 1)
+			
+			r = np.argmin(dS)
+			S_try = max(S + dS[r], 0)
+			phi_try = S_try**(1./p)
+			if phi_try - phi > T*np.random.rand():
+				continue
 
-		score = _score_maximin(X)
+			# Accept the exchange
+			i, k = I[r], K[r]
+			n_accept += 1
+			X[[i,k],c] = X[[k,i],c]
+			old_i, old_k = np.copy(D2[i]), np.copy(D2[k])
+			D2[i], D2[k] = Di[r], Dk[r]
+			D2[:,i], D2[:,k] = Di[r], Dk[r]
+			Dp[i] = Dp[:,i] = Di[r]**(-p/2.)
+			Dp[k] = Dp[:,k] = Dk[r]**(-p/2.)
+			S, phi = S_try, phi_try
 
-		if score > score_best:
-			perms_best = perms
-			X_best = X
-			score_best = score
+			# Update nearest neighbor distances; only rows whose nearest neighbor was i or k 
+			# can increase and so must be recomputed
+			nn_new = np.minimum(nn, np.minimum(Di[r], Dk[r]))
+			redo = (nn == old_i) | (nn == old_k)
+			redo[[i,k]] = True
+			nn_new[redo] = np.min(D2[redo], axis = 1)
+			changed = rows[nn_new != nn]
+			nn_sorted = _update_sorted(nn_sorted, nn[changed], nn_new[changed])
+			nn = nn_new
 
+			# Lexicographic comparison of the maximin score with the best design
+			diff = np.flatnonzero(nn_sorted != nn_best)
+			if len(diff) > 0 and nn_sorted[diff[0]] > nn_best[diff[0]]:
+				X_best[:,:] = X
+				nn_best[:] = nn_sorted
+				n_improve += 1
+
+		# Update the threshold
+		accept_ratio = n_accept/M_inner
+		if n_improve > 0:
+			# Improving process
+			if accept_ratio > 0.1 and n_improve < n_accept:
+				T *= 0.8
+			elif accept_ratio <= 0.1:
+				T /= 0.8
+		else:
+			# Exploration process
+			if accept_ratio < 0.1:
+				T /= 0.7
+			elif accept_ratio > 0.8:
+				T *= 0.9
 		
 	return X_best	
 
+
+def _update_sorted(x_sorted, old, new):
+	r""" Replace the values old in the sorted array x_sorted with the values new
+	"""
+	if len(old) == 0:
+		return x_sorted
+	old = np.sort(old)
+	# Entries with repeated values are removed from consecutive locations
+	pos = np.searchsorted(x_sorted, old, side = 'left') + np.arange(len(old)) - np.searchsorted(old, old, side = 'left')
+	keep = np.ones(len(x_sorted), dtype = bool)
+	keep[pos] = False
+	x_sorted = x_sorted[keep]
+	new = np.sort(new)
+	return np.insert(x_sorted, np.searchsorted(x_sorted, new), new)
+
 # JMH: I am depreciating this version because it produces far worse designs than the other code
 
 #def latin_hypercube_random(domain, N, metric = 'maximin', maxiter = 100, jiggle = False):
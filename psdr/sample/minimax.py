@@ -3,6 +3,7 @@ from __future__ import print_function, division
 import numpy as np
 import cvxpy as cp
 from scipy.spatial.distance import cdist, pdist, squareform
+from scipy.spatial import cKDTree
 from scipy.optimize import linear_sum_assignment
 import scipy.special
 from functools import lru_cache
@@ -10,8 +11,10 @@ from iterprinter import IterationPrinter
 
 from ..domains.domain import DEFAULT_CVXPY_KWARGS
 
+from .util import low_rank_L
 from .poisson import poisson_disk_sample
 from .sobol import sobol_sequence
+from .discrete import greedy_minimax_discrete
 
 def _align_vector(X, Xhat, L = None):
 	r""" Returns Xhat aligned to the order of X
@@ -102,6 +105,121 @@ def _cq_center_cvxpy(Y, L, q = 10, xhat = None, solver_opts = {'warm_start': Tru
 	return np.array(xhat.value)
 
 
+def _cq_centers(Y, I, Yhat, q = 10, maxiter = 50, tol = 1e-10):
+	r""" Compute the C_q centers of all clusters at once using Newton's method
+
+	For each cluster i this minimizes
+
+	.. math::
+
+		\sum_{j : I_j = i} \| \widehat{\mathbf y}_i - \mathbf y_j\|_2^q
+
+	starting from the current center. All clusters take a Newton step simultaneously,
+	with sums over each cluster computed as segmented reductions over the points sorted by cluster,
+	followed by a backtracking line search.
+	Distances in each cluster are scaled by their initial maximum to avoid overflow in large powers.
+
+	Parameters
+	----------
+	Y: np.ndarray (M, k)
+		Points to cluster
+	I: np.ndarray (M,)
+		Index of the cluster containing each point
+	Yhat: np.ndarray (N, k)
+		Initial cluster centers
+	q: float, at least 2
+		Power of the distance
+	maxiter: int
+		Maximum number of Newton steps
+	tol: float
+		Stop a cluster when its step is smaller than this relative to its scale
+
+	Returns
+	-------
+	Yhat: np.ndarray (N, k)
+		New cluster centers; empty clusters are unchanged
+	converged: np.ndarray (N,)
+		True for the clusters whose Newton iteration converged
+	"""
+	N, k = Yhat.shape
+	order = np.argsort(I, kind = 'stable')
+	Y, I = Y[order], I[order]
+	counts = np.bincount(I, minlength = N)
+	nonempty = counts > 0
+
+	def cluster_reduce(ufunc, V, clusters):
+		# V holds values on the points of the given clusters, which are contiguous as the points are sorted
+		c = counts*clusters
+		out = np.zeros((N,) + V.shape[1:])
+		out[c > 0] = ufunc.reduceat(V, (np.cumsum(c) - c)[c > 0], axis = 0)
+		return out
+
+	Yhat = np.array(Yhat, dtype = float)
+	scale = np.ones(N)
+	if len(Y) > 0:
+		scale = cluster_reduce(np.maximum, np.linalg.norm(Yhat[I] - Y, axis = 1), nonempty)
+	scale = np.maximum(scale, np.finfo(float).tiny**(1./q))
+
+	def objective(Yhat, clusters = None):
+		# Scaled squared distances and objective, only evaluated on the given clusters
+		J = slice(None) if clusters is None else clusters[I]
+		rho2 = np.sum((Yhat[I[J]] - Y[J])**2, axis = 1)/scale[I[J]]**2
+		return rho2, np.bincount(I[J], weights = rho2**(q/2.), minlength = N)
+
+	converged = ~nonempty
+	failed = np.zeros(N, dtype = bool)
+	rho2, f = objective(Yhat)
+	eye = np.eye(k)
+	with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+		for it in range(maxiter):
+			active = ~(converged | failed)
+			if not np.any(active):
+				break
+
+			# Gradient and Hessian, both divided by q scale^(q-2)
+			J = active[I]
+			rho2J = rho2[J]
+			R = (Yhat[I[J]] - Y[J])/scale[I[J]].reshape(-1,1)
+			w = rho2J**((q - 2)/2.)
+			g = cluster_reduce(np.add, w.reshape(-1,1)*R, active)
+			RR = R[:,:,None]*R[:,None,:]/np.where(rho2J > 0, rho2J, 1).reshape(-1,1,1)
+			H = cluster_reduce(np.add, w.reshape(-1,1,1)*(eye + (q - 2)*RR), active)
+			step = np.zeros_like(Yhat)
+			try:
+				step[active] = np.linalg.solve(H[active], g[active][:,:,None])[:,:,0]*scale[active].reshape(-1,1)
+			except np.linalg.LinAlgError:
+				failed |= active
+				break
+			bad = active & ~np.all(np.isfinite(step), axis = 1)
+			failed |= bad
+			active &= ~bad
+
+			step_norm = np.linalg.norm(step, axis = 1)
+
+			# Backtracking line search in each cluster
+			t = np.ones(N)
+			pending = np.copy(active)
+			accepted = np.zeros(N, dtype = bool)
+			Yhat_new = np.copy(Yhat)
+			for ls in range(30):
+				Yhat_new[pending] = Yhat[pending] - t[pending].reshape(-1,1)*step[pending]
+				_, f_new = objective(Yhat_new, pending)
+				accepted |= pending & (f_new <= f)
+				pending &= ~accepted
+				t[pending] /= 2
+				pending &= t*step_norm > tol*scale
+				if not np.any(pending):
+					break
+			# Clusters where no step decreases the objective are at the minimizer to working precision
+			rejected = active & ~accepted
+			Yhat_new[rejected] = Yhat[rejected]
+			converged |= rejected | (accepted & (t*step_norm <= tol*scale))
+			Yhat = Yhat_new
+			rho2, f = objective(Yhat)
+
+	return Yhat, converged
+
+
 def minimax_optimal_cover(domain, r, L = None, X = None, **kwargs):
 	r""" Compute a minimax clustering with a specified max distance
 
@@ -124,7 +242,8 @@ def minimax_optimal_cover(domain, r, L = None, X = None, **kwargs):
 		Yhat = (L.T @ Xhat.T).T
 		return np.max(np.min(cdist(Yhat, Y), axis = 0))
 		
-	domain_volume = domain.volume()
+	# Only a rough volume is needed to bound the covering number
+	domain_volume = domain.volume(rtol = 0.1)
 	ball_volume = np.pi**(len(domain)/2)/scipy.special.gamma(len(domain)/2 + 1)
 
 	# These are the lower and upper bounds on the covering number
@@ -273,13 +392,17 @@ def minimax_cluster_pso(domain, N, L = None, maxiter = 10, X = None, N0 = None,
 
 
 def minimax_cluster(domain, N, L = None, maxiter = 50, N0 = None, xtol = 1e-5, 
-	verbose = True, q = 10, solver_opts = {}, X = None, Xhat = None):
+	verbose = True, q = 10, solver_opts = {}, X = None, Xhat = None, polish = False):
 	r"""Identifies an approximate minimax design using a clustering technique due to Mak and Joseph
 
 	This function implements a clustering based approach for minimax sampling following [MJ18]_.
 	We do not implement the particle swarm optimization here; only the clustering approach.
-	Futher, we do not use their recommended gradient descent approach to find the C_q cluster centers,
-	instead relying on CVXPY (and by default, ECOS) to solve this problem efficiently and accurately.
+	Points are assigned to their nearest cluster center using a KD-tree
+	in coordinates where the L-norm is the Euclidean norm.
+	Rather than their recommended gradient descent approach, the C_q cluster centers are found
+	using Newton's method applied to all clusters simultaneously.
+	Any cluster where this fails to converge is solved using CVXPY instead,
+	as are all clusters when polishing the final design.
 
 
 	References
@@ -306,9 +429,14 @@ def minimax_cluster(domain, N, L = None, maxiter = 50, N0 = None, xtol = 1e-5,
 	q: positive float
 		Power to raise the 2-norm to, such that we better approximate sup-norm
 	solver_opts: dict
-		Additional arguments to pass to cvxpy when solving each step	
+		Additional arguments to pass to cvxpy when solving for a cluster center
 	X: array-like (M,m)
 		Discretization of the domain to use for clustering
+	Xhat: array-like (N,m), optional
+		Initial cluster centers
+	polish: bool
+		If True, recompute the centers of the best design using CVXPY 
+		and keep them if they improve the design
 	"""
 
 	if N0 is None:
@@ -326,22 +454,27 @@ def minimax_cluster(domain, N, L = None, maxiter = 50, N0 = None, xtol = 1e-5,
 	# NOTE: In the original paper used Sobol sequence to generate these points
 	if X is None:
 		X = sobol_sequence(domain, N0)	
-		# Initial cluster centers
-		# We use the first N random points so that we don't end up with 
-		# empty regions. This also has the consequence of spreading these initial points
-		# well as the leading terms of the Sobol' sequence are widely separated
-		if Xhat is None: 
-			Xhat = X[0:N]
-	else:
-		if Xhat is None:
-			# For the same reason as above, we choose Xhat 
-			# from the nearest points to the Sobol sequence
-			Xhat = sobol_sequence(domain, N)
-			D = cdist(Xhat, X)
-			_, col = linear_sum_assignment(D)
-			Xhat = X[col]
-
-	Y = L.dot(X.T).T
+	
+	if Xhat is None:
+		# Initial cluster centers are chosen from the samples by the greedy k-center algorithm
+		# so that they are spread out in the L-norm and we don't end up with empty regions
+		I = greedy_minimax_discrete(X, N, L = L)
+		if len(I) < N:
+			raise ValueError("The discretization X has only %d points distinct in the L-norm; "
+				"at least N = %d are required" % (len(I), N))
+		Xhat = X[I]
+
+	# Cluster in coordinates of the same (low) dimension as the rank of L;
+	# centers only move in the directions the L-norm measures
+	B = low_rank_L(L)
+	Binv = np.linalg.pinv(B)
+	Y = X.dot(B.T)
+	Xhat = np.array(Xhat, dtype = float)
+
+	def assign(Xhat):
+		# Assign each point to its nearest neighbor in L-norm
+		dist, I = cKDTree(Xhat.dot(B.T)).query(Y)
+		return I, float(np.max(dist))
 
 	# movement cluster centers
 	dx = np.nan
@@ -355,27 +488,26 @@ def minimax_cluster(domain, N, L = None, maxiter = 50, N0 = None, xtol = 1e-5,
 	best_dist = np.inf
 
 	for it in range(maxiter):
-		Yhat = L.dot(Xhat.T).T
-		# Assign each point to its nearest neighbor in L-norm
-		D = cdist(Yhat, Y)
-		I = np.argmin(D, axis = 0)
-		dist = np.max(np.min(D, axis = 0))
+		I, dist = assign(Xhat)
 
 		if dist < best_dist:
 			best_Xhat = np.copy(Xhat)
-			best_dist = float(dist)
+			best_dist = dist
 
 		if verbose:
-			printer.print_iter(it = it, obj = np.max(np.min(D, axis = 0)), move = dx) 
+			printer.print_iter(it = it, obj = dist, move = dx) 
 
 		if np.all(I_old == I):
 			if verbose: print("point sets unchanged")
 			break
 
-		# TODO: This is easy to parallelize, but attempts have not improved wall clock time
-		Xhat_new = [ _cq_center_cvxpy(Y[I == i], L, q = q, xhat = Xhat[i], solver_opts = solver_opts) for i in range(N)]
-		Xhat_new = np.array(Xhat_new)
-		dx = np.max(Xhat_new - Xhat)	
+		Yhat = Xhat.dot(B.T)
+		Yhat_new, converged = _cq_centers(Y, I, Yhat, q = q)
+		for i in np.flatnonzero(~converged):
+			Yhat_new[i] = B.dot(_cq_center_cvxpy(Y[I == i], B, q = q, xhat = Xhat[i], solver_opts = solver_opts))
+		# Move only within the directions measured by the L-norm
+		Xhat_new = Xhat + (Yhat_new - Yhat).dot(Binv.T)
+		dx = np.max(np.abs(Xhat_new - Xhat))
 		Xhat = Xhat_new
 
 		if dx < xtol:
@@ -384,6 +516,14 @@ def minimax_cluster(domain, N, L = None, maxiter = 50, N0 = None, xtol = 1e-5,
 
 		I_old = I
 
+	if polish:
+		I, _ = assign(best_Xhat)
+		Xhat = np.array([_cq_center_cvxpy(Y[I == i], B, q = q, xhat = best_Xhat[i], solver_opts = solver_opts) 
+			if np.any(I == i) else best_Xhat[i] for i in range(N)])
+		_, dist = assign(Xhat)
+		if dist < best_dist:
+			best_Xhat = Xhat
+
 	return best_Xhat
 
 def minimax_covering(domain, r, L = None, **kwargs):
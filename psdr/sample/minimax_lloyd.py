@@ -5,6 +5,7 @@ from iterprinter import IterationPrinter
 from ..geometry import voronoi_vertex, voronoi_vertex_sample, unique_points, cdist
 from .maximin_coffeehouse import maximin_coffeehouse
 from .maximin import maximin_block
+from .discrete import greedy_maximin_discrete
 from .minimax import minimax_design_1d
 
 
@@ -27,6 +28,13 @@ def _update_voronoi_sample(domain, Xhat, X0, L, M0):
 		Lipschitz matrix
 	M0: int
 		Target number of queries
+
+	Returns
+	-------
+	V: np.array (*, len(domain))
+		Estimated Voronoi vertices
+	cells: list of np.array
+		Indices of the vertices in V closest to each point in Xhat
 	"""
 
 	# Update the estimate Voronoi vertices
@@ -48,19 +56,52 @@ def _update_voronoi_sample(domain, Xhat, X0, L, M0):
 			V = np.vstack([V, Vnew])
 
 	# Remove duplicates
-	return V[unique_points(V)]
+	V = V[unique_points(V)]
+	return V, _voronoi_cells(Xhat, V, L)
 
 
-def _update_voronoi_full(domain, Xhat, X0, L, M0):
-	return voronoi_vertex(domain, Xhat, L = L)
+def _voronoi_cells(Xhat, V, L):
+	r""" Indices of the vertices V closest to each point in Xhat
+	"""
+	D = cdist(Xhat, V, L = L)
+	d = np.min(D, axis = 0)
+	return [np.argwhere(np.isclose(D[k], d)).flatten() for k in range(len(Xhat))]
 
 
-def minimax_lloyd(domain, M, L = None, maxiter = 100, Xhat = None, verbose = True, xtol = 1e-5, full = None):
+def minimax_lloyd(domain, M, L = None, maxiter = 100, Xhat = None, verbose = True, xtol = 1e-5, full = None, executor = None,
+	init = 'coffeehouse'):
 	r""" A fixed point iteration for a minimax design
 
 	This algorithm can be interpreted as a block coordinate descent type algorithm
 	for the optimal minimax experimental design on the given domain.
 
+	Parameters
+	----------
+	domain: Domain
+		Domain on which to construct the design
+	M: int
+		Number of points in the design
+	L: array-like (*,m), optional
+		Lipschitz matrix defining a distance metric
+	maxiter: int
+		Maximum number of iterations
+	Xhat: array-like (M, m), optional
+		Initial design; if not provided, a maximin design is used
+	verbose: bool
+		If True, print convergence information
+	xtol: float
+		Stop when the largest change in a point of the design is less than this
+	full: [None, True, False]
+		If True, compute all the bounded Voronoi vertices, otherwise compute a subsample.	
+		If None, all the vertices are computed when len(domain) < 3.
+	executor: concurrent.futures.Executor, optional
+		When computing all the bounded Voronoi vertices, 
+		construct each Voronoi cell in parallel using this executor. 	
+	init: ['coffeehouse', 'discrete']
+		If Xhat is not provided, how to construct the initial maximin design
+		that is then improved by :meth:`psdr.maximin_block`: either a coffeehouse design
+		(:meth:`psdr.maximin_coffeehouse`), or a greedy maximin design selected from samples of the domain
+		(:meth:`psdr.greedy_maximin_discrete`), which is much less expensive to construct.
 	
 	SD96.	
 	"""
@@ -71,14 +112,7 @@ def minimax_lloyd(domain, M, L = None, maxiter = 100, Xhat = None, verbose = Tru
 		pass
 
 	if full is None:
-		if len(domain) < 3:
-			_update_voronoi = _update_voronoi_full
-		else:
-			_update_voronoi = _update_voronoi_sample
-	elif full is True:
-		_update_voronoi = _update_voronoi_full
-	elif full is False:
-		_update_voronoi = _update_voronoi_sample
+		full = len(domain) < 3
 
 	if L is None:
 		L = np.eye(len(domain))
@@ -87,8 +121,16 @@ def minimax_lloyd(domain, M, L = None, maxiter = 100, Xhat = None, verbose = Tru
 	X0 = domain.sample(M0)
 
 	if Xhat is None:
-		if verbose: print(10*'='+" Building Coffeehouse Design " + 10*'=')
-		Xhat = maximin_coffeehouse(domain, M, L, verbose = verbose)
+		if init == 'discrete':
+			if verbose: print(10*'='+" Building Discrete Maximin Design " + 10*'=')
+			I = greedy_maximin_discrete(X0, M, L = L)
+			if len(I) < M:
+				raise ValueError("Only %d samples of the domain are distinct in the L-norm; "
+					"at least M = %d are required" % (len(I), M))
+			Xhat = X0[I]
+		else:
+			if verbose: print(10*'='+" Building Coffeehouse Design " + 10*'=')
+			Xhat = maximin_coffeehouse(domain, M, L, verbose = verbose)
 		if verbose: print('\n'+10*'='+" Building Maximin Design " + 10*'=')
 		Xhat = maximin_block(domain, M, L = L, maxiter = 50, verbose =verbose, X0 = Xhat)
 		# The Shrinkage suggested by Pro17 hasn't been demonstrated to be useful with this initialization, so we avoid it
@@ -109,17 +151,21 @@ def minimax_lloyd(domain, M, L = None, maxiter = 100, Xhat = None, verbose = Tru
 
 	for it in range(maxiter):
 
-		# Compute new Voronoi vertices
-		V = _update_voronoi(domain, Xhat, V, L, M0)	
-		D = cdist(Xhat, V, L = L)
-		d = np.min(D, axis = 0)
-	
+		# Compute new Voronoi vertices and the vertices belonging to each cell
+		if full:
+			V, cells = voronoi_vertex(domain, Xhat, L = L, executor = executor, return_cells = True)
+		else:
+			V, cells = _update_voronoi_sample(domain, Xhat, V, L, M0)
+		
+		d = np.zeros(M)	
 		for k in range(M):
 			# Identify closest points to Xhat[k]
-			I = np.isclose(D[k], d)
+			I = cells[k]
+			if len(I) > 0:
+				d[k] = np.max(cdist(Xhat[k], V[I], L = L))
 		
 			# Move the Xhat[k] to the circumcenter 	
-			ones = np.ones((1, np.sum(I)))
+			ones = np.ones((1, len(I)))
 			obj = cp.mixed_norm( (L @ ( cp.reshape(x,(len(domain),1)) @ ones - V[I].T)).T, 2, np.inf)
 			prob = cp.Problem(cp.Minimize(obj), constraints)
 			prob.solve()
@@ -1,147 +1,178 @@
 from __future__ import print_function, division
 import numpy as np
 import itertools
-from scipy.spatial.distance import cdist
+import scipy.linalg
 
-def poisson_disk_sample(domain, r, L = None, Ntries = 100):
-	r""" Implements a Poisson disk sampling on an arbitrary domain
+__all__ = ['poisson_disk_sample', 'poisson_disk_sample_grid']
+
+
+class _HashGrid(object):
+	r""" Sparse background grid for neighbor searches
+
+	Points are stored in a dictionary keyed by the integer coordinates of the cell containing them,
+	so only occupied cells use memory.  Any point within distance :math:`s` times the cell width
+	of a query point lies in one of the :math:`(2s+1)^k` cells around the query's cell.
+	"""
+	def __init__(self, dim, width, span):
+		self.width = width
+		self.offsets = np.array(list(itertools.product(range(-span, span+1), repeat = dim)), dtype = int)
+		self.cells = {}
+
+	def _cell(self, z):
+		return np.floor(z/self.width).astype(int)
+
+	def insert(self, z, i):
+		self.cells.setdefault(tuple(self._cell(z)), []).append(i)
+
+	def neighbors(self, z):
+		r""" Indices of the points that can lie within span cell widths of z
+		"""
+		idx = []
+		get = self.cells.get
+		for cell in (self._cell(z) + self.offsets).tolist():
+			idx.extend(get(tuple(cell), ()))
+		return idx
+
+
+def _step_basis(domain, L):
+	r""" Map from steps in the image of L to steps in the domain
+
+	Returns an orthonormal basis U for the image under L of the directions the domain allows,
+	a matrix M such that a step :math:`\mathbf x + \mathbf M \mathbf u`
+	moves by :math:`\mathbf U \mathbf u` under L,
+	and an orthonormal basis K for the allowed directions that L maps to zero.
+	"""
+	Qeq = domain._A_eq_basis
+	N = scipy.linalg.null_space(Qeq.T) if Qeq.shape[1] > 0 else np.eye(len(domain))
+	U, s, VT = scipy.linalg.svd(L @ N, full_matrices = True)
+	rank = int(np.sum(s > s[0]*max(L.shape)*np.finfo(float).eps)) if len(s) > 0 else 0
+	K = N @ VT[rank:].T
+	U, s, VT = U[:,:rank], s[:rank], VT[:rank]
+	M = N @ (VT.T/s)
+	return U, M, K
 
 
+def poisson_disk_sample(domain, r, L = None, Ntries = 100):
+	r""" Poisson disk sampling on an arbitrary domain
+
+	This constructs a maximal set of points inside the domain
+	such that no two points are closer than r in the metric :math:`\| \mathbf L(\mathbf x - \mathbf x')\|_2`
+	using the algorithm of Bridson [Bri07]_ carried out in the image of :math:`\mathbf L`.
+	Starting from a random point, each iteration picks a random active point and generates
+	Ntries candidates uniformly distributed in the annulus between r and 2r around it.
+	When :math:`\mathbf L` has a nontrivial null space, each candidate is also moved
+	a random distance along a random direction in this null space so that candidates
+	can reach every point of the domain's image under :math:`\mathbf L`.
+	The first candidate inside the domain that is far enough from every other point is added;
+	if no candidate is acceptable, the point is no longer active.
+
+	All candidates around a point are tested at once: the points that can be within r
+	of any candidate are found using a sparse hash grid, so only occupied cells use memory
+	even when :math:`\mathbf L` has many rows.
+	When the number of cells to search exceeds the number of points,
+	distances to all points are computed instead.
+
 	Parameters
 	----------
 	domain: Domain
-		Domain on which to construct the sampling 
+		Domain on which to construct the sampling
 	r: float, positive
 		Minimum separation between points
-	"""
-
-
-	if L is None:
-		L = np.eye(len(domain))
-
-
-	X = [domain.sample()]
-	active = [True]
+	L: array-like (*, m), optional
+		Matrix defining the metric; defaults to the identity
+	Ntries: int, optional
+		Number of candidates generated around each active point
 
-	while True:
-		# Pick a random active elemenit
-		try:
-			i = int(np.random.permutation(np.argwhere(active))[0])
-		except IndexError:
-			break
-		success = False
-
-		LX = L.dot(np.array(X).T).T
-		for it in range(Ntries):
-			# Generate a random direction
-			p = domain.random_direction(X[i])
-			p /= np.linalg.norm(L.dot(p))
-
-			# TODO: Change distribution to sample annulus uniformly
-			ri = np.random.uniform(r, 2*r)
-	
-			# Generate trial point
-			xc = X[i] + ri*p
-
-			if domain.isinside(xc):
-				d = cdist(L.dot(xc).reshape(1,-1), LX)
-				
-				if np.min(d) > r:
-					X.append(xc)
-					active.append(True)
-					success = True
-					break
-
-		if not success:
-			active[i] = False
-
-	return np.array(X)
-
-
-def poisson_disk_sample_grid(domain, r, L = None, Ntries = 100):
-	r"""
+	Returns
+	-------
+	X: np.ndarray (M, m)
+		Samples inside the domain
 
 	References
 	----------
-	[Bri07]_ Fast Poisson Disk Sampling in Arbitrary Dimensions. 
-		Robert Bridson.  Siggraph 2007	 
+	.. [Bri07] Fast Poisson Disk Sampling in Arbitrary Dimensions.
+		Robert Bridson.  Siggraph 2007
 		https://www.cs.ubc.ca/~rbridson/docs/bridson-siggraph07-poissondisk.pdf
-	"""	
-	# Use the grid approach to limit searches
-
+	"""
 	if L is None:
 		L = np.eye(len(domain))
+	L = np.atleast_2d(np.array(L, dtype = float))
+
+	# Coordinates z = U.T L x are an isometry of the L-metric on the domain
+	U, M, K = _step_basis(domain, L)
+	k = U.shape[1]
+
+	x0 = domain.sample()
+	X = np.zeros((64, len(domain)))
+	Z = np.zeros((64, k))
+	X[0] = x0
+	Z[0] = U.T @ (L @ x0)
+	n = 1
+	if k == 0:
+		return X[:n]
+
+	# Candidates are within 2r of their active point, so their neighbors within r
+	# are inside the cells within 3r of that point
+	grid = None
+	active = [0]
+
+	while len(active) > 0:
+		j = np.random.randint(len(active))
+		i = active[j]
+
+		# Candidates uniformly distributed in the annulus r <= |z - z_i| <= 2r
+		u = np.random.randn(Ntries, k)
+		u /= np.linalg.norm(u, axis = 1).reshape(-1,1)
+		rho = r*(1 + np.random.uniform(size = Ntries)*(2**k - 1))**(1./k)
+		u *= rho.reshape(-1,1)
+		Xc = X[i] + u @ M.T
+		Zc = Z[i] + u
+		if K.shape[1] > 0:
+			# Steps in the null space of L do not change z, but the points of the domain 
+			# mapping near z_i + u need not lie on the slice through x_i;
+			# so we move each candidate a random distance along a random direction in this null space
+			# chosen along the chord through x_i, which stays inside the domain
+			V = np.random.randn(Ntries, K.shape[1]) @ K.T
+			fwd, bwd = domain.extents(X[i], V)
+			Xc += np.random.uniform(-bwd, fwd).reshape(-1,1)*V
+
+		accept = None
+		inside = np.flatnonzero(domain.isinside(Xc))
+		if len(inside) > 0:
+			if grid is None and 7**k < n:
+				grid = _HashGrid(k, r, 3)
+				for ii in range(n):
+					grid.insert(Z[ii], ii)
+			idx = grid.neighbors(Z[i]) if grid is not None else slice(0, n)
+			Zn = Z[idx]
+			# Squared distances between candidates and nearby points
+			d2 = np.sum(Zc[inside]**2, axis = 1).reshape(-1,1) - 2*Zc[inside] @ Zn.T + np.sum(Zn**2, axis = 1)
+			far = np.flatnonzero(np.min(d2, axis = 1, initial = np.inf) >= r**2)
+			if len(far) > 0:
+				accept = inside[far[0]]
+
+		if accept is None:
+			# Remove i from the active list
+			active[j] = active[-1]
+			active.pop()
+			continue
+
+		if n == len(X):
+			X = np.vstack([X, np.zeros_like(X)])
+			Z = np.vstack([Z, np.zeros_like(Z)])
+		X[n] = Xc[accept]
+		Z[n] = Zc[accept]
+		if grid is not None:
+			grid.insert(Z[n], n)
+		active.append(n)
+		n += 1
+
+	return X[:n]
+
 
-	
-	# This radius is chosen so that no more than one point is in each grid cell
-	grid_size = r/np.sqrt(L.shape[0]) 	# Step 0, Bri07
-	grid_start = np.zeros(L.shape[0])
-	grid_dims = np.zeros(L.shape[0], dtype = np.int)
-	for i in range(L.shape[0]):
-		c1 = domain.corner(L[i,:])
-		c2 = domain.corner(-L[i,:])
-		if L[i,:].dot(c1) > L[i,:].dot(c2):
-			c1, c2 = c2, c1
-		grid_start[i] = L[i,:].dot(c1)
-		grid_dims[i] = int(np.ceil((L[i,:].dot(c2) - L[i,:].dot(c1))/grid_size))
-
-	# Setup the grid
-	grid = np.zeros(grid_dims, dtype = np.uint32)
-
-	def grid_coord(x):
-		""" location of x on the grid"""
-		Lx = L.dot(x).flatten()
-		idx = np.floor((Lx - grid_start)/grid_size)
-		return idx.astype(np.int)
-
-	X = [domain.sample()]
-	active = [True]
-
-	idx = grid_coord(X[0])
-	grid[tuple(idx)] = 1
-	while True:
-		# Pick a random active elemenit
-		try:
-			i = int(np.random.permutation(np.argwhere(active))[0])
-		except IndexError:
-			break
-		
-		LX = L.dot(np.array(X).T).T
-		print(active)
-		success = False
-		for it in range(Ntries):
-			# Generate a random direction
-			p = domain.random_direction(X[i])
-			p /= np.linalg.norm(L.dot(p))
-			# TODO: Change distribution to sample annulus uniformly
-			ri = np.random.uniform(r, 2*r)
-	
-			# Generate trial point
-			xc = X[i] + ri*p
-			if domain.isinside(xc):
-				idxc = grid_coord(xc)
-				neighbors = []
-				grid_rad = int(2*np.ceil(np.sqrt(L.shape[0])))+1
-				for idx in itertools.product(*[ (j+k for k in range(-grid_rad, grid_rad+1)) for j in idxc]):
-					try:
-						if min(idx) < 0: raise IndexError
-						n = grid[idx]
-						if n != 0:
-							neighbors.append(n-1)
-					except IndexError:
-						pass
-				if len(neighbors) > 0:
-					d = cdist(L.dot(xc).reshape(1,-1), LX[neighbors])
-				else:
-					d = [2*r]
-			
-				if np.min(d) > r:
-					X.append(xc)
-					active.append(True)
-					success = True
-					grid[tuple(idxc)] = len(X)
-					break
-		if not success:
-			active[i] = False
-
-	return np.array(X)
+def poisson_disk_sample_grid(domain, r, L = None, Ntries = 100):
+	r""" Poisson disk sampling using a background grid
+
+	This is an alias for :meth:`psdr.poisson_disk_sample`, which already uses a background grid.
+	"""
+	return poisson_disk_sample(domain, r, L = L, Ntries = Ntries)
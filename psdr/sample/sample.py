@@ -7,6 +7,7 @@ from scipy.spatial.distance import cdist, pdist, squareform
 from scipy.spatial import Delaunay
 import cvxpy as cp
 import itertools
+import asyncio
 
 from satyrn import picosat
 
@@ -14,8 +15,10 @@ from satyrn import picosat
 from ..geometry import voronoi_vertex_sample 
 from ..geometry import sample_sphere, unique_points, sample_simplex
 from ..domains import LinIneqDomain, ConvexHullDomain
+from ..checkpoint import Checkpoint
 
 from .initial import initial_sample
+from .seqmaximin import seq_maximin_sample
 
 __all__ = ['Sampler', 'SequentialMaximinSampler', 'StretchedSampler']
 
@@ -34,8 +37,13 @@ class Sampler:
 		Existing samples from the domain
 	fX: array-like (?,nfun)
 		Existing evaluations of the function at the points in X
+	checkpoint: Checkpoint or str, optional
+		If provided, each new sample and its function value are appended to this checkpoint
+		along with the state of the random number generator.
+		If the checkpoint already contains samples, X and fX are restored from it
+		(ignoring the X and fX arguments) so an interrupted run resumes where it left off.
 	"""
-	def __init__(self, fun, X = None, fX = None):
+	def __init__(self, fun, X = None, fX = None, checkpoint = None):
 		self._fun = fun
 		
 		if X is None:
@@ -52,6 +60,19 @@ class Sampler:
 
 		self._fX = fX
 
+		if isinstance(checkpoint, str):
+			checkpoint = Checkpoint(checkpoint)
+		self._checkpoint = checkpoint
+		if checkpoint is not None:
+			if 'X' in checkpoint:
+				self._X = checkpoint['X']
+				self._fX = checkpoint.get('fX')
+				state = checkpoint.state
+				if 'random_state' in state:
+					np.random.set_state(state['random_state'])
+			elif len(self._X) > 0:
+				self._save_checkpoint(self._X, self._fX)
+
 	def sample(self, draw = 1, verbose = False):
 		r""" Sample the function
 
@@ -63,23 +84,88 @@ class Sampler:
 		"""
 		return self._sample(draw = draw, verbose = verbose)
 	
-	def sample_async(self, draw = 1):
-		r""" Sample the function asynchronously updating the search parameters
+	async def sample_async(self, draw = 1, max_pending = 1, timeout = None, verbose = False):
+		r""" Sample the function asynchronously, keeping several evaluations in flight
+
+		Usage: :code:`await sampler.sample_async(draw, max_pending = K)`
+
+		Rather than choosing a batch of points and then waiting for all to be evaluated,
+		this keeps up to :code:`max_pending` evaluations running at once. 
+		Whenever an evaluation finishes, its result is appended to :code:`X` and :code:`fX`
+		and the next point is chosen immediately, treating the points still being evaluated 
+		as if they were already sampled.  
+		Hence samples are appended in the order their evaluations complete.
 
+		If the function provides an :code:`aeval` coroutine (e.g., :class:`psdr.Function`),
+		it is used for each evaluation; otherwise :code:`eval` is called on the event loop's default executor.
 
 		Parameters
 		----------
 		draw: int, default 1
 			Number of samples to take
+		max_pending: int, default 1
+			Maximum number of evaluations running at once
+		timeout: float, optional
+			Number of seconds after which an individual evaluation is abandoned;
+			the resulting error is raised after cancelling the remaining evaluations
+		verbose: bool, default False
+			If True, print each point as it is proposed
 		"""
-		return self._sample_async(draw = draw)
+		pending = {}
+		submitted = 0
+		try:
+			while submitted < draw or len(pending) > 0:
+				while submitted < draw and len(pending) < max_pending:
+					Xpending = np.array(list(pending.values())).reshape(-1, len(self._fun.domain))
+					xnew = self._propose(Xpending)
+					if verbose:
+						print('%3d: ' % (submitted,),  ' '.join(['%8.3f' % x for x in xnew]))
+					pending[asyncio.ensure_future(self._aeval(xnew, timeout))] = xnew
+					submitted += 1
+
+				done, _ = await asyncio.wait(list(pending.keys()), return_when = asyncio.FIRST_COMPLETED)
+				for task in done:
+					xnew = pending.pop(task)
+					self._append(xnew.reshape(1,-1), np.atleast_1d(task.result()).reshape(1,-1))
+		finally:
+			for task in pending:
+				task.cancel()
+
+	async def _aeval(self, x, timeout):
+		if hasattr(self._fun, 'aeval'):
+			return await self._fun.aeval(x, timeout = timeout)
+		loop = asyncio.get_running_loop()
+		return await asyncio.wait_for(loop.run_in_executor(None, self._fun.eval, x), timeout)
 
 	def _sample(self, draw = 1, verbose = False):
 		raise NotImplementedError
 	
-	def _sample_async(self, draw = 1):
+	def _propose(self, Xpending):
+		r""" Choose the next point given points whose evaluations have not yet finished
+		"""
 		raise NotImplementedError
 
+	def _save_checkpoint(self, Xnew, fXnew):
+		if fXnew is None:
+			self._checkpoint.append(X = Xnew)
+		else:
+			self._checkpoint.append(X = Xnew, fX = fXnew)
+		self._checkpoint.save_state(random_state = np.random.get_state())
+
+	def _append(self, Xnew, fXnew):
+		r""" Add new samples and their function values
+		"""
+		if self._checkpoint is not None:
+			self._save_checkpoint(Xnew, fXnew)
+		self._X = np.vstack([self._X, Xnew])
+		if self._fX is None:
+			self._fX = fXnew
+		else:
+			if len(fXnew.shape) > 1:
+				self._fX = np.vstack([self._fX, fXnew])
+			else:
+				self._fX = np.hstack([self._fX, fXnew])
+
 	@property
 	def X(self):
 		r""" Samples from the function's domain"""
@@ -117,10 +203,12 @@ class SequentialMaximinSampler(Sampler):
 		Existing samples from the domain
 	fX: array-like (?,nfun)
 		Existing evaluations of the function at the points in X
+	checkpoint: Checkpoint or str, optional
+		Checkpoint from which to resume and to which to save samples; see :class:`Sampler`
 
 	"""
-	def __init__(self, fun, L = None, X = None, fX = None):
-		Sampler.__init__(self, fun, X = X, fX = fX)
+	def __init__(self, fun, L = None, X = None, fX = None, checkpoint = None):
+		Sampler.__init__(self, fun, X = X, fX = fX, checkpoint = checkpoint)
 		if L is None:
 			L = np.eye(len(fun.domain))
 		else:
@@ -128,26 +216,22 @@ class SequentialMaximinSampler(Sampler):
 			assert L.shape[1] == len(fun.domain), "Dimension of L does not match domain"
 		self._L = L
 
+	def _propose(self, Xpending):
+		return seq_maximin_sample(self._fun.domain, np.vstack([self._X, Xpending]), Ls = [self._L])
+
 	def _sample(self, draw = 1, verbose = False):
 		Xnew = []
 		# As L is fixed, we can draw these samples at once
 		for i in range(draw):
-			xnew = seq_maximin_sample(self._fun.domain, self._X, Ls = [self._L])
+			xnew = self._propose(np.array(Xnew).reshape(-1, len(self._fun.domain)))
 			Xnew.append(xnew)
 			if verbose:
 				print('%3d: ' % (i,),  ' '.join(['%8.3f' % x for x in xnew]))
-			self._X = np.vstack([self._X, xnew])
 
 		# Now we evaluate the function at these new points
 		# (this takes advantage of potential vectorization of fun)
-		fXnew = self._fun.eval(Xnew)
-		if self._fX is None:
-			self._fX = fXnew
-		else:
-			if len(fXnew.shape) > 1:
-				self._fX = np.vstack([self._fX, fXnew])
-			else:
-				self._fX = np.hstack([self._fX, fXnew])
+		Xnew = np.array(Xnew)
+		self._append(Xnew, self._fun.eval(Xnew))
 
 
 class StretchedSampler(Sampler):
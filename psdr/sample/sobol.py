@@ -1,59 +1,198 @@
 from __future__ import print_function, division
 
+import warnings
 import numpy as np
-import sobol_seq
-	
-from ..domains import RandomDomain	
-	
-def sobol_sequence(domain, n):
+from scipy.stats import qmc
+from scipy.spatial import Delaunay, HalfspaceIntersection
+from scipy.optimize import linprog
+from scipy.special import gammaln
+
+from ..domains import RandomDomain
+from ..exceptions import EmptyDomainException
+
+__all__ = ['sobol_sequence']
+
+
+def _sobol_engine(m, scramble, seed, skip):
+	engine = qmc.Sobol(m, scramble = scramble, seed = seed)
+	if skip > 0:
+		engine.fast_forward(skip)
+	return engine
+
+def _sobol_draw(engine, n):
+	with warnings.catch_warnings():
+		# Balance properties only hold for powers of two, but any prefix is still low discrepancy
+		warnings.simplefilter('ignore', UserWarning)
+		return engine.random(n)
+
+
+def _polytope_simplices(domain):
+	r""" Triangulate a bounded polytope into simplices
+
+	Returns
+	-------
+	simplices: np.ndarray (k, m+1, m)
+		Vertices of each simplex in the normalized domain
+	cdf: np.ndarray (k,)
+		Cumulative fraction of the volume of the domain in each simplex
+	"""
+	m = len(domain)
+	lb, ub = domain.lb_norm, domain.ub_norm
+	if m == 1:
+		A = np.vstack([domain.A_norm, -np.eye(1), np.eye(1)])
+		b = np.hstack([domain.b_norm, -lb, ub])
+		lo = max([b[i]/A[i,0] for i in range(len(b)) if A[i,0] < 0 and np.isfinite(b[i])], default = -np.inf)
+		hi = min([b[i]/A[i,0] for i in range(len(b)) if A[i,0] > 0 and np.isfinite(b[i])], default = np.inf)
+		return np.array([[[lo], [hi]]]), np.ones(1)
+
+	I = np.eye(m)
+	Ilb, Iub = np.isfinite(lb), np.isfinite(ub)
+	A = np.vstack([domain.A_norm, -I[Ilb], I[Iub]])
+	b = np.hstack([domain.b_norm, -lb[Ilb], ub[Iub]])
+
+	# Chebyshev center as an interior point for the halfspace intersection
+	normA = np.linalg.norm(A, axis = 1)
+	c = np.zeros(m+1)
+	c[-1] = -1
+	res = linprog(c, A_ub = np.hstack([A, normA.reshape(-1,1)]), b_ub = b, bounds = [(None, None)]*m + [(0, None)])
+	if res.status != 0 or res.x[-1] <= 0:
+		raise ValueError("Could not find an interior point of the domain")
+
+	hs = HalfspaceIntersection(np.hstack([A, -b.reshape(-1,1)]), res.x[:m])
+	vertices = hs.intersections
+	simplices = vertices[Delaunay(vertices).simplices]
+
+	# Volume of each simplex
+	logvol = np.linalg.slogdet(simplices[:,1:,:] - simplices[:,0:1,:])[1] - gammaln(m + 1)
+	vol = np.exp(logvol - np.max(logvol))
+	cdf = np.cumsum(vol)/np.sum(vol)
+	cdf[-1] = 1.
+	return simplices, cdf
+
+
+def _map_to_simplices(U, simplices, cdf):
+	r""" Map points in the unit cube to the union of simplices preserving uniform measure
+
+	The first coordinate selects the simplex (proportional to its volume) and is then rescaled
+	to the unit interval; all coordinates are then mapped into the selected simplex
+	using the recursive construction :math:`r_k = u_k^{1/(m-k+1)}`.
+	"""
+	N, m = U.shape
+	U = np.copy(U)
+	j = np.minimum(np.searchsorted(cdf, U[:,0], side = 'right'), len(cdf) - 1)
+	lower = np.hstack([0, cdf])[j]
+	U[:,0] = np.clip((U[:,0] - lower)/(cdf[j] - lower), 0, 1)
+
+	if m == 1:
+		lam = np.hstack([1 - U, U])
+	else:
+		r = U**(1./(m - np.arange(m)))
+		P = np.cumprod(r, axis = 1)
+		lam = np.empty((N, m+1))
+		lam[:,0] = 1 - r[:,0]
+		lam[:,1:m] = P[:,:-1]*(1 - r[:,1:])
+		lam[:,m] = P[:,-1]
+	return np.einsum('ni,nij->nj', lam, simplices[j])
+
+
+def sobol_sequence(domain, n, scramble = False, seed = None, skip = None, method = 'reject', out = None,
+	max_draws = 2**24):
 	r""" Generate samples from a Sobol sequence on a domain
 
 	A Sobol sequence is a low-discrepancy sequence [Sobol_wiki]_;
-	here we generate this sequence using a library descended from 
-	ACM TOMS algorithms 647 and 659 [sobol_seq]_. 
-	Although Sobol sequences generated on :math:`[0,1]^m`, for domains 
-	that are not a simple box, here we simply reject those samples
-	falling outside the domain (after scaling). 
+	here we generate this sequence using :code:`scipy.stats.qmc.Sobol` [scipy_qmc]_,
+	which supports scrambling and dimensions well beyond 40.
+	Although Sobol sequences generated on :math:`[0,1]^m`, for domains
+	that are not a simple box there are two approaches to placing these points inside the domain:
+
+	* :code:`'reject'`: points are generated in the box defined by the normalization bounds and
+	  those points falling outside the domain are rejected. Points are drawn
+	  from a single sequence in batches sized using the observed acceptance rate
+	  until enough points are found.
+	* :code:`'triangulate'`: a polytope (a domain with only linear inequality constraints) is
+	  split into simplices, and each point of the sequence is mapped into one simplex
+	  using a transformation that preserves the uniform measure. No points are wasted,
+	  but the triangulation is only tractable in modest dimensions.
 
-	*Warning*: when the domain occupies only a small fraction of its enclosing
-	hypercube, this function can take a while to execute.
+	*Warning*: when using rejection and the domain occupies only a small fraction of its enclosing
+	hypercube, this function can take a while to execute; after :code:`max_draws` points
+	have been drawn without finding enough inside the domain, an EmptyDomainException is raised.
 
 
 	Parameters
 	----------
 	domain: Domain
 		Domain on which to construct the Sobol sequence
-	
 	n: int
 		Number of elements from the Sobol sequence to return
+	scramble: bool, optional
+		If True, apply an Owen-type scrambling to the sequence
+	seed: None, int, or np.random.Generator, optional
+		Seed for the scrambling
+	skip: int, optional
+		Number of elements at the start of the sequence to skip.
+		By default, the first element of an unscrambled sequence (the corner of the box) is skipped;
+		scrambled sequences skip nothing.
+	method: ['reject', 'triangulate'], optional
+		How to generate points inside domains that are not boxes (see above)
+	out: np.array (n, len(domain)), optional
+		Array in which to store the samples
+	max_draws: int, optional
+		Maximum number of points of the sequence drawn when using rejection
 
 	Returns
 	-------
 	np.array (n, len(domain))
-		The samples from the Sobol sequence inside the domain	
+		The samples from the Sobol sequence inside the domain
 
 	References
 	----------
-	.. [Sobol_wiki] (Sobol Sequence)[https://en.wikipedia.org/wiki/Sobol_sequence]	
-	.. [sobol_seq] https://github.com/naught101/sobol_seq
+	.. [Sobol_wiki] (Sobol Sequence)[https://en.wikipedia.org/wiki/Sobol_sequence]
+	.. [scipy_qmc] https://docs.scipy.org/doc/scipy/reference/stats.qmc.html
 	"""
 	assert len(domain.A_eq) == 0, "Currently equality constraints on the domain are not supported"
 	assert not isinstance(domain, RandomDomain), "Currently does not support random domains"
+	assert method in ['reject', 'triangulate'], "Invalid method"
+
+	n = int(n)
+	m = len(domain)
+	if skip is None:
+		skip = 0 if scramble else 1
+	if out is None:
+		out = np.empty((n, m))
+	engine = _sobol_engine(m, scramble, seed, skip)
+
+	if method == 'triangulate' and not domain.is_box_domain:
+		if not domain.is_linineq_domain:
+			raise NotImplementedError("Triangulation only applies to domains with linear inequality constraints")
+		simplices, cdf = _polytope_simplices(domain)
+		X_norm = _map_to_simplices(_sobol_draw(engine, n), simplices, cdf)
+		return domain.unnormalize(X_norm, out = out)
+
+	lb, ub = domain.norm_lb, domain.norm_ub
+	filled = 0
+	rate = 1.
+	ndraw = 0
+	while filled < n:
+		# Size the next batch using the fraction of points accepted so far,
+		# limiting the growth when few points have been accepted and the memory of each batch
+		batch = min(int(np.ceil(1.1*(n - filled)/rate)), 16*max(ndraw, n), max(2**20//m, 1), max_draws - ndraw)
+		if batch <= 0:
+			raise EmptyDomainException("Only %d of %d points were inside the domain after %d draws; "
+				"try method = 'triangulate'" % (filled, n, ndraw))
+		X = _sobol_draw(engine, batch)
+		ndraw += batch
 
-	skip = 1
-	Xsamp = np.zeros((0, len(domain)))
-	while True:
-		# Generate a Sobol sequence on the cube [0,1]^m
-		X_norm = sobol_seq.i4_sobol_generate(len(domain), n, skip = skip) 
-		skip += n
-		
 		# Scale into the domain
-		X = (domain.norm_ub - domain.norm_lb)*X_norm + domain.norm_lb	
-		
-		# Add only those points inside the domain
-		Xsamp = np.vstack([Xsamp, X[domain.isinside(X)]])
-		if Xsamp.shape[0] >= n:	
-			break
+		X *= (ub - lb)
+		X += lb
 
-	return Xsamp[0:n]
+		# Add only those points inside the domain
+		if not domain.is_box_domain:
+			X = X[domain.isinside(X)]
+		k = min(len(X), n - filled)
+		out[filled:filled+k] = X[:k]
+		filled += k
+		rate = max(filled, 1)/ndraw
 
+	return out
@@ -2,7 +2,11 @@
 import numpy as np
 from scipy.linalg import subspace_angles
 
-def subspace_convergence(sdr, fun, sampler, Ns,  domain = None, data = 'eval', subspace_dimension = 1):
+from .checkpoint import Checkpoint
+
+__all__ = ['subspace_convergence']
+
+def subspace_convergence(sdr, fun, sampler, Ns,  domain = None, data = 'eval', subspace_dimension = 1, checkpoint = None):
 	r""" Measure the convergence of a subspace-based dimension reduction technique
 
 	This is a convience wrapper 
@@ -21,6 +25,11 @@ def subspace_convergence(sdr, fun, sampler, Ns,  domain = None, data = 'eval', s
 		What data to sample
 	subspace_dimension: int
 		Number of subspace dimensions to compare
+	checkpoint: Checkpoint or str, optional
+		If provided, after each sample size the samples, function values or gradients,
+		fitted subspace, and random number generator state are appended to this checkpoint.
+		If the checkpoint already contains results, the completed sample sizes are skipped
+		and the study resumes with the same random state.
 
 	Returns
 	-------
@@ -34,9 +43,17 @@ def subspace_convergence(sdr, fun, sampler, Ns,  domain = None, data = 'eval', s
 
 	assert data in ['eval', 'grad'], "Data must be one of either eval or gradient"
 
+	if isinstance(checkpoint, str):
+		checkpoint = Checkpoint(checkpoint)
+
 	Us = []
 	Ms = []
-	for N in Ns:
+	if checkpoint is not None and 'U' in checkpoint:
+		Us = list(checkpoint['U'])
+		Ms = list(checkpoint['M'])
+		np.random.set_state(checkpoint.state['random_state'])
+
+	for N in Ns[len(Us):]:
 		# Evaluate sampling scheme
 		X = sampler(domain, N).reshape(-1, len(domain))
 		# Compute the number of points actually sampled
@@ -46,11 +63,17 @@ def subspace_convergence(sdr, fun, sampler, Ns,  domain = None, data = 'eval', s
 		if data == 'eval':
 			fX = fun(X)
 			sdr.fit(X = X, fX = fX)
+			values = {'fX': fX}
 		elif data == 'grad':
 			grads = fun.grad(X)
 			sdr.fit(grads = grads)
+			values = {'grads': grads}
 
 		Us.append(np.copy(sdr.U[:,:subspace_dimension]))
+		
+		if checkpoint is not None:
+			checkpoint.append(X = X, M = [len(X)], U = Us[-1][None,:,:], **values)
+			checkpoint.save_state(random_state = np.random.get_state())
 
 	# Compute angles
 	angles = [np.pi/2] + [np.max(subspace_angles(Us[i], Us[i+1])) for i in range(len(Us)-1)]
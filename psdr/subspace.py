@@ -13,6 +13,7 @@ import numpy as np
 import scipy.linalg
 import scipy.optimize
 import scipy.sparse
+import scipy.stats
 
 
 import cvxpy as cp
@@ -26,6 +27,13 @@ __all__ = ['SubspaceBasedDimensionReduction',
 	'ActiveSubspace', 
 	]
 
+def _block_triu_indices(M, start, stop):
+	r""" Indices (i,j) with i < j of the upper triangle of an M x M matrix restricted to rows start:stop
+	"""
+	I, J = np.triu_indices(stop - start, k = 1, m = M - start)
+	return I + start, J + start
+
+
 class SubspaceBasedDimensionReduction(object):
 	r""" Abstract base class for Subspace-Based Dimension Reduction
 
@@ -260,19 +268,81 @@ class SubspaceBasedDimensionReduction(object):
 		else:
 			return self._fix_subspace_signs_samps(U, X, fX)	
 
-	def _fix_subspace_signs_samps(self, U, X, fX):
-		sgn = np.zeros(len(U[0]))
-		for k in range(len(U[0])):
-			for i in range(len(X)):
-				for j in range(i+1, len(X)):
-					denom = U[:,k] @ (X[i] - X[j])
-					if np.abs(denom) > 0:
-						sgn[k] += (fX[i] - fX[j])/denom
+	def _fix_subspace_signs_samps(self, U, X, fX, chunk_size = 2**18, max_pairs = None, confidence = 0.99, seed = 0):
+		r""" Orient the subspace using the average finite difference slope between samples
+
+		For each direction :math:`\mathbf{u}_k` this sums the slopes
+		:math:`(f(\mathbf{x}_i) - f(\mathbf{x}_j))/\mathbf{u}_k^\top(\mathbf{x}_i - \mathbf{x}_j)`
+		over all pairs :math:`i<j`. The pairs are processed in blocks of rows so that
+		at most roughly :code:`chunk_size` pair-direction slopes are held in memory at once.
+
+		Parameters
+		----------
+		U: np.ndarray (m, n)
+			Subspace to orient
+		X: array-like (M, m)
+			Input coordinates
+		fX: array-like (M,)
+			Function values at X
+		chunk_size: int
+			Approximate number of pairs times directions processed at once
+		max_pairs: int or None
+			If the number of pairs exceeds this, first estimate the slope from
+			a random subsample of :code:`max_pairs` pairs. Any direction whose sign is not
+			determined at the requested confidence level is then computed exactly.
+		confidence: float in (0,1)
+			Confidence level used to accept the sign from the subsampled estimate
+		seed: int
+			Seed for the random number generator used to select the subsample;
+			results are deterministic for a fixed seed.
+		"""
+		X = np.atleast_2d(np.array(X))
+		fX = np.array(fX).flatten()
+		M = len(X)
+		n_pairs = M*(M-1)//2
+
+		sgn = np.zeros(U.shape[1])
+		exact = np.ones(U.shape[1], dtype = bool)
+
+		if max_pairs is not None and n_pairs > max_pairs:
+			rng = np.random.RandomState(seed)
+			I = rng.randint(0, M, size = int(max_pairs))
+			J = rng.randint(0, M, size = int(max_pairs))
+			mask = I != J
+			I, J = I[mask], J[mask]
+			slopes = self._pair_slopes(U, X, fX, I, J)
+			mean = np.mean(slopes, axis = 0)
+			se = np.std(slopes, axis = 0)/np.sqrt(max(len(I),1))
+			z = scipy.stats.norm.ppf(0.5 + confidence/2.)
+			sgn = mean
+			exact = ~(np.abs(mean) > z*se)
+
+		if np.any(exact):
+			# Row blocks of the upper triangle of pairs (i < j)
+			Y = X @ U[:,exact]
+			sgn_exact = np.zeros(Y.shape[1])
+			block = max(1, int(chunk_size // max(M*Y.shape[1],1)))
+			for start in range(0, M, block):
+				stop = min(start + block, M)
+				I, J = _block_triu_indices(M, start, stop)
+				sgn_exact += np.sum(self._pair_slopes(None, Y, fX, I, J), axis = 0)
+			sgn[exact] = sgn_exact
 
 		# If the sign is zero, keep the current orientation
 		sgn[sgn == 0] = 1
 		return U.dot(np.diag(np.sign(sgn)))	
 
+	@staticmethod
+	def _pair_slopes(U, X, fX, I, J):
+		r""" Slope along each column of U between pairs X[I] and X[J]; zero if the projected distance vanishes
+		"""
+		Y = X if U is None else X @ U
+		denom = Y[I] - Y[J]
+		df = (fX[I] - fX[J]).reshape(-1,1)
+		slopes = np.zeros(denom.shape)
+		np.divide(df, denom, out = slopes, where = np.abs(denom) > 0)
+		return slopes
+
 	def _fix_subspace_signs_grads(self, U, grads):
 		return U.dot(np.diag(np.sign(np.mean(grads.dot(U), axis = 0))))
 
@@ -330,9 +400,18 @@ class ActiveSubspace(SubspaceBasedDimensionReduction):
 			weights = np.ones(N)/N
 			
 		self._weights = np.array(weights)
-		self._U, self._s, VT = scipy.linalg.svd(np.sqrt(self._weights)*self._grads.T)
-		# Pad s with zeros if we don't have as many gradient samples as dimension of the space
-		self._s = np.hstack([self._s, np.zeros(self._dimension - len(self._s))])
+		if np.all(self._weights >= 0):
+			self._U, self._s, VT = scipy.linalg.svd(np.sqrt(self._weights)*self._grads.T)
+			# Pad s with zeros if we don't have as many gradient samples as dimension of the space
+			self._s = np.hstack([self._s, np.zeros(self._dimension - len(self._s))])
+		else:
+			# Quadrature rules such as sparse grids have negative weights, 
+			# so we form C explicitly and drop any (small) negative eigenvalues
+			C = self._grads.T @ (self._weights.reshape(-1,1)*self._grads)
+			ew, self._U = scipy.linalg.eigh(C)
+			I = np.argsort(-ew)
+			self._U = self._U[:,I]
+			self._s = np.sqrt(np.maximum(ew[I], 0))
 		self._C = self._U @ np.diag(self._s**2) @ self._U.T
 
 		# Fix +/- scaling so average gradient is positive	
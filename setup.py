@@ -10,7 +10,6 @@ install_requires = [
 		'tqdm',
 		'dask',
 		'distributed',
-		'sobol_seq',
 		'satyrn>=0.3.2',
 		'iterprinter',
 		'polyrat',
@@ -18,7 +17,7 @@ install_requires = [
 
 install_requires += [
 	'matplotlib',
-	'scipy>=1.1.0',
+	'scipy>=1.7.0',
 	]
 
 try:
@@ -0,0 +1,65 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.spatial.distance import cdist, pdist
+import psdr
+
+
+def test_greedy_maximin_discrete(M = 2000, N = 20, m = 3):
+	np.random.seed(0)
+	X = np.random.rand(M, m)
+	L = np.random.randn(2, m)
+	I = psdr.greedy_maximin_discrete(X, N, L = L, chunk = 333)
+	assert len(np.unique(I)) == N
+	
+	# Each point is the candidate farthest from those selected before it
+	Y = X.dot(L.T)
+	for k in range(1, N):
+		d = np.min(cdist(Y, Y[I[:k]]), axis = 1)
+		assert np.isclose(d[I[k]], np.max(d))
+
+	with ThreadPoolExecutor(2) as executor:
+		I2 = psdr.greedy_maximin_discrete(X, N, L = L, chunk = 333, executor = executor)
+	assert np.all(I == I2)
+
+	# Points already in the design are avoided
+	I3 = psdr.greedy_maximin_discrete(X, N, L = L, X0 = X[I[:5]])
+	assert np.min(cdist(Y[I3], Y[I[:5]])) > 0
+
+	# Repeated candidates are never selected twice
+	X5 = X[:5]
+	I4 = psdr.greedy_maximin_discrete(np.repeat(X5, 10, axis = 0), 8)
+	assert len(I4) == 5
+	assert len(np.unique(I4//10)) == 5
+	I5, radius = psdr.greedy_minimax_discrete(np.repeat(X5, 10, axis = 0), 8, return_radius = True)
+	assert len(I5) == 5 and radius == 0
+
+
+def test_greedy_minimax_discrete(M = 2000, N = 20, m = 3):
+	np.random.seed(0)
+	X = np.random.rand(M, m)
+	I, radius = psdr.greedy_minimax_discrete(X, N, return_radius = True)
+	assert np.isclose(radius, np.max(np.min(cdist(X, X[I]), axis = 1)))
+	
+	# The greedy k-center algorithm is within a factor of two of the optimal covering radius,
+	# which is at least half the minimum distance between the points selected
+	assert radius <= np.min(pdist(X[I]))
+
+
+def test_greedy_covering_discrete(M = 2000, m = 2, r = 0.2):
+	np.random.seed(0)
+	X = np.random.rand(M, m)
+	L = np.diag([1, 2])
+	I = psdr.greedy_covering_discrete(X, r, L = L, chunk = 333)
+	d = np.min(cdist(X.dot(L.T), X[I].dot(L.T)), axis = 1)
+	assert np.all(d <= r)
+
+	# Each selection should cover the most candidates not yet covered
+	covered = np.zeros(M, dtype = bool)
+	D = cdist(X.dot(L.T), X.dot(L.T)) <= r
+	for i in I[:10]:
+		gain = np.sum(D[:, ~covered], axis = 1)
+		assert gain[i] == np.max(gain)
+		covered |= D[i]
+
+	# Limit the number of points
+	assert len(psdr.greedy_covering_discrete(X, r, L = L, N = 5)) == 5
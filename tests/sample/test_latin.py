@@ -1,6 +1,8 @@
 import numpy as np
 import psdr
 import pytest
+from scipy.spatial.distance import pdist, squareform
+from psdr.sample.latin import _update_sorted
 
 def test_latin_hypercube_maximin(m = 3, N = 5):
 	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
@@ -9,11 +11,69 @@ def test_latin_hypercube_maximin(m = 3, N = 5):
 
 	assert all(dom.isinside(X))
 
+def test_latin_hypercube_maximin_improves(m = 3, N = 20):
+	np.random.seed(0)
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	X0 = psdr.latin_hypercube_maximin(dom, N, maxiter = 1)
+	X = psdr.latin_hypercube_maximin(dom, N, maxiter = 5000)
+
+	# Each coordinate should still be a Latin hypercube 
+	for i in range(m):
+		assert np.allclose(np.sort(X[:,i]), np.sort(X0[:,i]))
+
+	assert np.min(pdist(X)) >= np.min(pdist(X0))
+
+def _latin_hypercube_maximin_swap(dom, N, maxiter = 1000):
+	# The previous random exchange search, kept as a reference for design quality
+	m = len(dom)
+	xs = []
+	for i in range(m):
+		xi = np.linspace(dom.norm_lb[i], dom.norm_ub[i], N + 1)
+		xs.append((xi[1:] + xi[:-1])/2.)
+	perms_best = np.vstack([np.random.permutation(N) for i in range(m)])
+	score_best = tuple(np.zeros(N))
+	X_best = None
+	for it in range(maxiter):
+		i, j = np.random.permutation(N)[0:2]
+		r = np.random.rand(m)
+		I = r >= min(max(r), 0.5)
+		perms = np.copy(perms_best)
+		perms[I,i] = perms_best[I,j]
+		perms[I,j] = perms_best[I,i]
+		X = np.array([ [xs[i][j] for j in perms[i]] for i in range(m)]).T
+		score = tuple(np.sort(np.min(squareform(pdist(X)) + np.diag(np.inf*np.ones(N)), axis = 0)))
+		if score > score_best:
+			perms_best, X_best, score_best = perms, X, score
+	return X_best
+
+@pytest.mark.parametrize("N", [20, 100])
+def test_latin_hypercube_maximin_quality(N, m = 5):
+	# With the default number of iterations, designs should be no worse than the previous search
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	d_new, d_old = [], []
+	for seed in range(5):
+		np.random.seed(seed)
+		d_new.append(np.min(pdist(psdr.latin_hypercube_maximin(dom, N))))
+		np.random.seed(seed)
+		d_old.append(np.min(pdist(_latin_hypercube_maximin_swap(dom, N))))
+	# The enhanced stochastic evolutionary search should clearly improve on random swaps
+	assert np.mean(d_new) >= 1.05*np.mean(d_old)
+
+def test_update_sorted(N = 20):
+	np.random.seed(0)
+	x = np.random.randint(0, 5, size = N).astype(float)
+	I = np.random.permutation(N)[:5]
+	x_new = np.copy(x)
+	x_new[I] = np.random.randint(0, 5, size = len(I))
+	x_sorted = _update_sorted(np.sort(x), x[I], x_new[I])
+	assert np.all(x_sorted == np.sort(x_new))
+
 def test_latin_hypercube_box():
 	N = 1
 	domain = psdr.BoxDomain(-np.ones(3), np.ones(3))
 	X = psdr.latin_hypercube_sample(domain, N)
-	print(X)
+	assert X.shape == (N, 3)
+	assert np.all(domain.isinside(X))
 
 if __name__ == '__main__':
 	test_latin_hypercube_box()
@@ -4,7 +4,7 @@ from scipy.spatial.distance import cdist
 import cvxpy as cp
 
 import psdr
-from psdr.sample.minimax import _cq_center_cvxpy
+from psdr.sample.minimax import _cq_center_cvxpy, _cq_centers
 
 
 def test_cq_center(m = 3, q = 10):
@@ -33,6 +33,21 @@ def test_cq_center(m = 3, q = 10):
 		assert np.linalg.norm(L.dot(xhat1 - xhat2)) < 1e-5
 
 
+def test_cq_centers(k = 3, N = 10, M = 500, q = 10):
+	np.random.seed(0)
+	Y = np.random.randn(M, k)
+	# Leave the last cluster empty
+	I = np.random.randint(N - 1, size = M)
+	Yhat0 = np.random.randn(N, k)
+	Yhat, converged = _cq_centers(Y, I, Yhat0, q = q)
+	assert np.all(converged)
+	assert np.allclose(Yhat[-1], Yhat0[-1])
+	for i in range(N - 1):
+		yhat = _cq_center_cvxpy(Y[I == i], np.eye(k), q = q)
+		obj = lambda y: np.sum(np.linalg.norm(Y[I == i] - y, axis = 1)**q)
+		assert obj(Yhat[i]) <= obj(yhat)*(1 + 1e-6)
+
+
 def test_minimax(m = 3, N = 5):
 	np.random.seed(1)
 	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
@@ -49,6 +64,18 @@ def test_minimax(m = 3, N = 5):
 	assert minimax_score(Xhat) <= minimax_score(Xhat2)
 
 
+def test_minimax_duplicates(m = 3, N = 5):
+	# A discretization with fewer distinct points than N cannot provide N initial centers
+	np.random.seed(0)
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	X = np.repeat(dom.sample(3), 10, axis = 0)
+	try:
+		psdr.minimax_cluster(dom, N, X = X)
+		assert False, "should have raised"
+	except ValueError:
+		pass
+
+
 def test_minimax_conditioning(m = 5, N = 200):
 	np.random.seed(0)
 	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.spatial.distance import pdist, squareform
+from scipy.spatial.distance import pdist, squareform, cdist
 import psdr
 
 
@@ -20,7 +20,30 @@ def test_poisson_disk_sample_grid(m = 2, r = 0.6):
 	d = np.nanmin(D, axis = 1)
 	print(d)
 	assert np.all(d >= r) and np.all(d <= 2*r)
-	
+
+def test_poisson_disk_sample_lowrank(m = 20, r = 0.1):
+	np.random.seed(0)
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	L = np.random.randn(2, m)/4
+	X = psdr.poisson_disk_sample(dom, r, L = L)
+	assert np.all(dom.isinside(X))
+	D = squareform(pdist(X.dot(L.T)))
+	D += np.diag(np.nan*np.ones(D.shape[0]))
+	d = np.nanmin(D, axis = 1)
+	assert np.all(d >= r) and np.all(d <= 2*r)
+
+	# The design should cover the image of the whole domain, not just a slice through it
+	d = np.min(cdist(dom.sample(10000).dot(L.T), X.dot(L.T)), axis = 1)
+	assert np.mean(d > r) < 0.005
+	assert np.max(d) < 2*r
+
+def test_poisson_disk_sample_eq(m = 3, r = 0.3):
+	np.random.seed(0)
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m)).add_constraints(A_eq = np.ones((1,m)), b_eq = [0])
+	X = psdr.poisson_disk_sample(dom, r)
+	assert np.all(dom.isinside(X))
+	assert np.min(pdist(X)) >= r
+
 
 if __name__ == '__main__':
 	test_poisson_disk_sample_grid()	
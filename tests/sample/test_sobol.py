@@ -11,5 +11,40 @@ def test_sobol(m=3):
 	assert len(X) == 100
 	assert np.all(dom.isinside(X))
 
+def test_sobol_empty(m=10):
+	# The corner simplex occupies a negligible fraction of the box
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	dom = dom.add_constraints(A = np.ones((1,m)), b = [-m + 1e-3])
+	try:
+		psdr.sobol_sequence(dom, 10, max_draws = 10000)
+		assert False, "should have raised"
+	except psdr.EmptyDomainException:
+		pass
+
+def test_sobol_triangulate(m=3):
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	dom = dom.add_constraints(A = np.ones((1,m)), b = [-2.5])
+	
+	X = psdr.sobol_sequence(dom, 1000, method = 'triangulate')
+	assert X.shape == (1000, m)
+	assert np.all(dom.isinside(X))
+	
+	# The domain is a simplex with vertex (-1,-1,-1) and edges of length 0.5
+	# whose centroid is at -1 + 0.5/4
+	assert np.allclose(np.mean(X, axis = 0), -1 + 0.5/4, atol = 1e-2)
+
+def test_sobol_stream(m=50):
+	dom = psdr.BoxDomain(np.zeros(m), np.ones(m))
+	out = np.empty((64, m))
+	X = psdr.sobol_sequence(dom, 64, scramble = True, seed = 0, out = out)
+	assert X is out
+	assert np.all(dom.isinside(X))
+	assert np.allclose(X, psdr.sobol_sequence(dom, 64, scramble = True, seed = 0))
+	
+	# Skipping ahead continues the sequence
+	X1 = psdr.sobol_sequence(dom, 32)
+	X2 = psdr.sobol_sequence(dom, 32, skip = 17)
+	assert np.allclose(X1[16:], X2[:16])
+
 if __name__ == '__main__':
 	test_sobol()
@@ -0,0 +1,76 @@
+from __future__ import print_function
+import os
+import numpy as np
+import psdr
+from psdr import BoxDomain, Function, Checkpoint, SequentialMaximinSampler
+
+
+def test_checkpoint(tmp_path):
+	path = str(tmp_path / 'ckpt')
+	ckpt = Checkpoint(path)
+	assert len(ckpt) == 0
+	assert ckpt.state == {}
+	
+	ckpt.append(X = np.zeros((2,3)), fX = np.ones(2))
+	ckpt.append(X = np.ones((1,3)), fX = 2*np.ones(1))
+	ckpt.save_state(it = 2)
+	assert np.all(ckpt['X'] == np.vstack([np.zeros((2,3)), np.ones((1,3))]))
+	
+	# Reopening reads everything back; new data only adds a new file
+	ckpt = Checkpoint(path)
+	assert len(ckpt) == 2
+	assert np.all(ckpt['fX'] == [1,1,2])
+	assert ckpt.state['it'] == 2
+	ckpt.append(X = np.ones((1,3)))
+	assert ckpt['X'].shape == (4,3)
+	assert ckpt.get('grads') is None
+	assert sorted(os.listdir(path)) == ['chunk_00000000.npz', 'chunk_00000001.npz', 'chunk_00000002.npz', 'state.pkl']
+
+
+def test_checkpoint_crash(tmp_path):
+	path = str(tmp_path / 'ckpt')
+	ckpt = Checkpoint(path)
+	ckpt.append(X = np.zeros((2,3)))
+	ckpt.save_state(it = 1)
+	# A crash between writing a chunk and saving the state
+	ckpt.append(X = np.ones((1,3)))
+
+	# The unsaved chunk is ignored on resume and replaced by the next chunk
+	ckpt = Checkpoint(path)
+	assert len(ckpt) == 1
+	assert ckpt['X'].shape == (2,3)
+	assert ckpt.state['it'] == 1
+	ckpt.append(X = 2*np.ones((3,3)))
+	ckpt.save_state(it = 2)
+	ckpt = Checkpoint(path)
+	assert np.all(ckpt['X'] == np.vstack([np.zeros((2,3)), 2*np.ones((3,3))]))
+
+
+def test_sampler_resume(tmp_path, m = 2):
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	calls = []
+	def f(x):
+		calls.append(x)
+		return np.sum(x)
+	fun = Function(f, dom)
+	path = str(tmp_path / 'ckpt')
+	
+	np.random.seed(0)
+	samp = SequentialMaximinSampler(fun)
+	samp.sample(5)
+	X_ref = samp.X
+	
+	np.random.seed(0)
+	samp = SequentialMaximinSampler(fun, checkpoint = path)
+	samp.sample(3)
+	
+	# Resume after an "interruption" without re-evaluating the function
+	np.random.seed(1)
+	ncalls = len(calls)
+	samp = SequentialMaximinSampler(fun, checkpoint = path)
+	assert samp.X.shape == (3, m)
+	assert len(calls) == ncalls
+	samp.sample(2)
+	assert len(calls) == ncalls + 2
+	assert np.allclose(samp.X, X_ref)
+	assert np.allclose(samp.fX.flatten(), np.sum(samp.X, axis = 1))
@@ -70,5 +70,37 @@ def test_constraints(m=3):
 	assert np.all(dom_con.isinside(X))
 
 
+def test_isinside_batch():
+	np.random.seed(0)
+	# Low dimensional hulls use a half-space representation; 
+	# higher dimensional hulls use NNLS 
+	for m, n in [(2, 30), (7, 15)]:
+		hull = ConvexHullDomain(np.random.randn(n, m))
+		dom = hull.to_linineq()
+		X = np.random.randn(1000, m)
+		inside = hull.isinside(X)
+		assert 0 < np.sum(inside) < len(X)
+		# Points far from the boundary should agree 
+		slack = np.min(dom.b - X.dot(dom.A.T), axis = 1)/np.max(np.linalg.norm(dom.A, axis = 1))
+		I = np.abs(slack) > 1e-3
+		assert np.all(inside[I] == (slack[I] > 0))
+
+
+def test_volume_thin(m = 8):
+	# The hull of points near a line fills almost none of its bounding box,
+	# so rejection stops at its sample budget and the interval reflects the accuracy reached
+	import warnings
+	np.random.seed(0)
+	t = np.random.rand(30, 1)
+	dom = ConvexHullDomain(t*np.ones((1,m)) + 1e-2*np.random.randn(30, m))
+	with warnings.catch_warnings(record = True) as w:
+		warnings.simplefilter('always')
+		vol, (lo, hi) = dom.volume(rtol = 0.1, return_interval = True)
+	assert len(w) == 1
+	assert 0 < lo < vol < hi
+	# The budget-limited estimate is reused rather than recomputed
+	assert dom.volume(rtol = 0.1) == vol
+
+
 if __name__ == '__main__':
 	test_sphere()
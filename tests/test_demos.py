@@ -43,5 +43,23 @@ def test_golinski():
 	assert np.all(fun.grad(X) == fun2.grad(X))
 	assert np.all(fun.grad(X) == fun2(X, return_grad = True)[1])
 
+def test_vectorized_grad():
+	np.random.seed(0)
+	for fun in [Borehole(), GolinskiGearbox(), OTLCircuit(), Piston(), RobotArm(), WingWeight(), NowackiBeam(), HartmannMHD()]:
+		X = fun.domain.sample(20)
+		fX, grads = fun(X, return_grad = True)
+		assert np.allclose(fX, fun(X))
+		assert np.allclose(grads, fun.grad(X))
+		
+		# Vectorized value and gradient should match those evaluated point-by-point
+		for x, fx, grad in zip(X, fX, grads):
+			assert np.allclose(fx, fun(x))
+			assert np.allclose(grad, fun.grad(x))
+			
+		# Compare against a finite difference approximation
+		fun_fd = type(fun)()
+		fun_fd.fd_grad = 'central'
+		assert np.allclose(grads, fun_fd.grad(X), rtol = 1e-5, atol = 1e-6*np.max(np.abs(grads)))
+
 if __name__ == '__main__':
 	test_golinski()
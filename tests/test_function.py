@@ -1,4 +1,5 @@
 from __future__ import print_function
+import threading
 import numpy as np
 from psdr import BoxDomain, Function
 
@@ -103,6 +104,35 @@ def test_finite_diff():
 	grads = fun.grad(X)
 	for i, x in enumerate(X):
 		assert np.all(np.isclose(grads[i], fun.grad(x)))
+
+
+def test_finite_diff_schemes(m = 4):
+	np.random.seed(0)
+	A = np.random.randn(2, m)
+	def func(x):
+		return np.exp(A.dot(x))
+	def grad(x):
+		return np.exp(A.dot(x))[:,None]*A
+
+	dom = BoxDomain(-np.ones(m), 2*np.ones(m))
+	fun_ref = Function(func, dom, grads = grad)
+	# Include points on the boundary, where steps must be taken inward
+	X = np.vstack([fun_ref.domain.sample(5), fun_ref.domain.corner(np.ones(m)), fun_ref.domain.corner(-np.ones(m))])
+	grads_ref = fun_ref.grad(X)
+
+	for fd_grad, tol in [(True, 1e-5), ('central', 1e-8), ('complex', 1e-12)]:
+		fun = Function(func, dom, fd_grad = fd_grad)
+		grads = fun.grad(X)
+		assert grads.shape == grads_ref.shape
+		assert np.allclose(grads, grads_ref, rtol = tol, atol = tol), fd_grad
+
+	calls = []
+	def func_count(X):
+		calls.append(X.shape[0])
+		return np.exp(X.dot(A[0]))
+	fun = Function(func_count, dom, vectorized = True, fd_grad = 'central', fd_step = 1e-4)
+	fun.grad(X)
+	assert len(calls) == 1
 	
 
 def test_return_grad(m=3):
@@ -223,6 +253,267 @@ def test_return_grad2(m=3):
 		assert np.all(np.isclose(grad, fun.grad(x)))
 
 
+def test_cache(tmp_path, m = 3):
+	from psdr import FunctionCache
+	import pickle
+	A = np.random.randn(m, m)
+	A += A.T
+	calls = []
+	def func(x, return_grad = False):
+		calls.append(x)
+		fx = 0.5*x.dot(A.dot(x))
+		if return_grad:
+			return fx, A.dot(x)
+		return fx
+
+	dom = BoxDomain(-2*np.ones(m), 2*np.ones(m))
+	fun_ref = Function(func, dom, return_grad = True)
+	filename = str(tmp_path / 'cache.db')
+	fun = Function(func, dom, return_grad = True, cache = filename)
+	
+	X = fun.domain.sample(5)
+	fX = fun(X)
+	assert len(calls) == 5
+	assert np.allclose(fX, fun_ref(X))
+	assert fun.cache.stats['misses'] == 5
+	
+	# Repeated and new points: only the new ones are evaluated
+	X2 = np.vstack([X, fun.domain.sample(2)])
+	fX2 = fun(X2)
+	assert np.allclose(fX2[:5], fX)
+	assert fun.cache.stats['hits'] == 5
+	assert fun.cache.stats['entries'] == 7
+	
+	# Single points have the same shape as without a cache
+	assert fun(X[0]).shape == fun_ref(X[0]).shape
+
+	# Gradients are cached along with values 
+	grads_ref = fun_ref.grad(X)
+	ncalls = len(calls)
+	fX, grads = fun(X, return_grad = True)
+	assert np.allclose(grads, grads_ref)
+	assert np.allclose(fun.grad(X), grads_ref)
+	assert np.allclose(fun.grad(X[0]), grads_ref[0])
+	assert len(calls) == ncalls + 5
+
+	# A new function sharing the cache file does not re-evaluate anything
+	cache = pickle.loads(pickle.dumps(FunctionCache(filename)))
+	fun2 = Function(func, dom, return_grad = True, cache = cache)
+	ncalls = len(calls)
+	fX, grads = fun2(X, return_grad = True)
+	assert np.allclose(grads, grads_ref)
+	assert len(calls) == ncalls
+
+	# Changing the version or keyword arguments invalidates the cache
+	fun3 = Function(func, dom, return_grad = True, cache = FunctionCache(filename, version = '2'))
+	fun3(X)
+	assert len(calls) == ncalls + 5 
+	
+	def func_kw(x, scale = 1.):
+		calls.append(x)
+		return scale*np.sum(x)
+	fun4 = Function(func_kw, dom, cache = filename)
+	fun4(X)
+	ncalls = len(calls)
+	fun4(X)
+	assert len(calls) == ncalls
+	fX = fun4(X, scale = 2.)
+	assert len(calls) == ncalls + 5
+	assert np.allclose(fX.flatten(), 2*np.sum(dom.unnormalize(X), axis = 1))
+	
+
+def test_cache_identity(tmp_path, m = 2):
+	from psdr import FunctionCache
+	dom = BoxDomain(np.zeros(m), np.ones(m))
+	cache = FunctionCache(str(tmp_path / 'cache.db'))
+	x = dom.normalize(0.5*np.ones(m))
+
+	# Distinct lambdas share a name, but must not share cache entries
+	fun1 = Function(lambda x: np.sum(x), dom, cache = cache)
+	fun2 = Function(lambda x: np.prod(x), dom, cache = cache)
+	assert np.isclose(fun1(x), 1.)
+	assert np.isclose(fun2(x), 0.25)
+
+	# Likewise for closures capturing different values
+	def make(c):
+		def f(x):
+			return c*np.sum(x)
+		return f
+	assert np.isclose(Function(make(1.), dom, cache = cache)(x), 1.)
+	assert np.isclose(Function(make(3.), dom, cache = cache)(x), 3.)
+	assert cache.stats['hits'] == 0
+	assert np.isclose(Function(make(3.), dom, cache = cache)(x), 3.)
+	assert cache.stats['hits'] == 1
+
+
+def quad_grad(x, return_grad = False):
+	fx = [np.sum(x**2), np.sum(np.sin(x))]
+	if return_grad:
+		return fx, [2*x, np.cos(x)]
+	return fx
+
+def fails_outside_ball(x):
+	if np.linalg.norm(x) > 1:
+		raise ValueError("outside")
+	return np.sum(x)
+
+def test_executor(m = 3):
+	from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+	from psdr import FunctionEvaluationError
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	fun_ref = Function(quad_grad, dom, return_grad = True)
+	X = fun_ref.domain.sample(11)
+	fX_ref, grads_ref = fun_ref(X, return_grad = True)
+
+	for executor in [ThreadPoolExecutor(4), ProcessPoolExecutor(2)]:
+		with executor:
+			fun = Function(quad_grad, dom, return_grad = True, executor = executor, batch_size = 3)
+			assert np.allclose(fun.eval(X), fX_ref)
+			assert np.allclose(fun.grad(X), grads_ref)
+			fX, grads = fun(X, return_grad = True)
+			assert np.allclose(fX, fX_ref)
+			assert np.allclose(grads, grads_ref)
+			res = fun.call_async(X)
+			for r, fx in zip(res, fX_ref):
+				assert np.allclose(np.hstack(r.result()), fx)
+
+			# Failures are reported per point after all others finish
+			fun = Function(fails_outside_ball, dom, executor = executor, batch_size = 2)
+			Xf = np.vstack([0.1*X, X[0]/np.linalg.norm(X[0])*2, 0.1*X])
+			try:
+				fun.eval(Xf)
+				assert False, "should have raised"
+			except FunctionEvaluationError as e:
+				assert list(e.errors.keys()) == [len(X)]
+				assert isinstance(e.errors[len(X)], ValueError)
+	
+	# Vectorized functions receive whole batches
+	fun_ref = Function(lambda X: np.sum(X**2, axis = 1), dom, vectorized = True)
+	with ThreadPoolExecutor(2) as executor:
+		fun = Function(lambda X: np.sum(X**2, axis = 1), dom, vectorized = True, executor = executor, batch_size = 4)
+		assert np.allclose(fun(X), fun_ref(X))
+
+
+def test_aeval(m = 2):
+	import asyncio
+	from psdr import FunctionEvaluationError
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	
+	running = []
+	peak = [0]
+	async def slow_sum(x, hang = False):
+		running.append(1)
+		peak[0] = max(peak[0], len(running))
+		# Yield control so that other evaluations can start
+		await asyncio.sleep(0)
+		if hang and x[0] > -0.5:
+			await asyncio.Event().wait()
+		running.pop()
+		return np.sum(x)
+
+	fun = Function(lambda x, hang = False: np.sum(x), dom, afuns = slow_sum)
+	X = fun.domain.sample(10)
+	fX = asyncio.run(fun.aeval(X, max_concurrent = 3))
+	assert peak[0] == 3
+	assert np.allclose(fX, fun.eval(X))
+	assert np.isclose(asyncio.run(fun.aeval(X[0])), np.sum(X[0]))
+
+	# Results arrive in order of completion; here, each evaluation waits 
+	# for the one with the next smaller first coordinate
+	order = np.argsort(X[:,0])
+	async def chained_sum(x):
+		k = int(np.argmin(np.abs(X[order,0] - x[0])))
+		if k > 0:
+			await events[k-1].wait()
+		events[k].set()
+		return np.sum(x)
+	fun_chained = Function(lambda x: np.sum(x), dom, afuns = chained_sum)
+
+	async def stream():
+		events[:] = [asyncio.Event() for x in X]
+		return [(x, fx) async for x, fx in fun_chained.aeval_stream(X)]
+	events = []
+	results = asyncio.run(stream())
+	assert len(results) == len(X)
+	for x, fx in results:
+		assert np.isclose(fx, np.sum(x))
+	assert np.all(np.diff([x[0] for x, fx in results]) >= 0)
+
+	# Timeouts are reported per point; evaluations that never finish time out
+	try:
+		asyncio.run(fun.aeval(X, timeout = 0.5, hang = True))
+		assert False, "should have raised"
+	except FunctionEvaluationError as e:
+		assert sorted(e.errors.keys()) == list(np.argwhere(X[:,0] > -0.5).flatten())
+
+	# Without async functions, evaluations run on a thread pool 
+	fun = Function(quad_grad, dom)
+	assert np.allclose(asyncio.run(fun.aeval(X)), fun(X))
+
+
+_blocking_state = {'running': 0, 'peak': 0, 'calls': 0}
+_blocking_lock = threading.Lock()
+_blocking_release = threading.Event()
+
+def _blocking_sum(x):
+	with _blocking_lock:
+		_blocking_state['calls'] += 1
+		first = _blocking_state['calls'] == 1
+		_blocking_state['running'] += 1
+		_blocking_state['peak'] = max(_blocking_state['peak'], _blocking_state['running'])
+	if first:
+		_blocking_release.wait(10)
+	with _blocking_lock:
+		_blocking_state['running'] -= 1
+	return np.sum(x)
+
+def test_aeval_timeout_executor(m = 2):
+	import asyncio
+	from concurrent.futures import ThreadPoolExecutor
+	from psdr import FunctionEvaluationError
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	X = dom.sample(3)
+
+	async def run(fun):
+		# Let the abandoned first evaluation finish once the others are waiting
+		asyncio.get_running_loop().call_later(0.5, _blocking_release.set)
+		return await fun.aeval(X, max_concurrent = 1, timeout = 0.1)
+
+	with ThreadPoolExecutor(2) as executor:
+		fun = Function(_blocking_sum, dom, executor = executor)
+		try:
+			asyncio.run(run(fun))
+			assert False, "should have raised"
+		except FunctionEvaluationError as e:
+			assert list(e.errors.keys()) == [0]
+	
+	# The abandoned evaluation kept its slot until it finished
+	assert _blocking_state['calls'] == 3
+	assert _blocking_state['peak'] == 1
+
+
+def test_run_subprocess_async(tmp_path):
+	import sys, asyncio
+	from psdr.demos._subprocess import run_subprocess, run_subprocess_async
+	log = str(tmp_path / 'output.log')
+	assert run_subprocess([sys.executable, '-c', 'print("hello")'], log) == 0
+	assert asyncio.run(run_subprocess_async([sys.executable, '-c', 'print("world")'], log)) == 0
+	with open(log) as f:
+		assert f.read().split() == ['hello', 'world']
+	
+	# On timeout the cleanup command is run after the command is killed
+	marker = tmp_path / 'cleaned'
+	try:
+		asyncio.run(run_subprocess_async([sys.executable, '-c', 'import time; time.sleep(10)'], log, timeout = 0.5,
+			cleanup = [sys.executable, '-c', 'open(%r, "w").close()' % str(marker)]))
+		assert False, "should have raised"
+	except asyncio.TimeoutError:
+		pass
+	assert marker.exists()
+
+
 if __name__ == '__main__':
 	#test_mult_output()
 	#test_finite_diff()	
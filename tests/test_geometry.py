@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.spatial.distance import pdist
+from scipy.spatial.distance import pdist, squareform
 import psdr
 
 def test_unique_points(M = 100, m = 5):
@@ -11,6 +11,18 @@ def test_unique_points(M = 100, m = 5):
 	d = pdist(X2)
 	assert np.min(d) > 0, "Points not unique"
 
+def test_unique_points_tol(M = 50, m = 3):
+	np.random.seed(0)
+	X = np.random.randn(M, m)
+	X = np.vstack([X, X[::2] + 1e-10, X[:5] + 1e-3])
+	
+	I = psdr.geometry.unique_points(X)
+	# Compare against the dense distance matrix: keep the last of each group of close points 
+	D = squareform(pdist(X))
+	I_true = np.array([ ~np.any(D[i,i+1:] <= 1e-8) for i in range(len(X))])
+	assert np.all(I == I_true)
+	assert np.sum(I) == M + 5
+
 
 def test_sample_sphere():
 	X = psdr.geometry.sample_sphere(10, 100)
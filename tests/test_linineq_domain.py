@@ -41,3 +41,25 @@ def test_convex_combo(m=10):
 
 if __name__ == '__main__':
 	test_convex_combo()
+
+
+def test_volume():
+	np.random.seed(0)
+	from scipy.special import factorial
+
+	# Exact volume of a simplex in low dimensions 
+	m = 4
+	dom = LinIneqDomain(A = np.ones((1,m)), b = np.ones(1), lb = np.zeros(m), ub = np.ones(m))
+	assert np.isclose(dom.volume(), 1./factorial(m))
+
+	# A simplex only occupies a small fraction of its bounding box in higher dimensions,
+	# requiring the multiphase estimator
+	m = 8
+	dom = LinIneqDomain(A = np.ones((1,m)), b = np.ones(1), lb = np.zeros(m), ub = np.ones(m))
+	vol, (lo, hi) = dom.volume(rtol = 0.1, confidence = 0.99, return_interval = True)
+	print(vol, lo, hi, 1./factorial(m))
+	assert lo <= 1./factorial(m) <= hi
+	assert hi/lo < 1.25
+
+	# The estimate is cached
+	assert dom.volume(rtol = 0.2, confidence = 0.99) == vol
@@ -20,6 +20,27 @@ def test_isinside():
 	assert np.all(~dom.isinside(1.1*X))
 
 
+def test_isinside_slack(m = 4):
+	np.random.seed(0)
+	dom = LinQuadDomain(lb = -np.ones(m), ub = np.ones(m), A = np.random.randn(3, m), b = 0.5*np.ones(3),
+		A_eq = np.ones((1,m)), b_eq = [0], Ls = [np.diag(np.arange(1, m+1))], ys = [np.zeros(m)], rhos = [2])
+	
+	X = np.random.uniform(-1.2, 1.2, size = (5000, m))
+	X -= np.mean(X, axis = 1, keepdims = True)*(np.random.rand(5000,1) < 0.9)
+	
+	# Compare against checking one point at a time
+	inside = np.array([
+		np.all(x >= dom.lb - 1e-10) and np.all(x <= dom.ub + 1e-10) and np.all(dom.A.dot(x) <= dom.b + 1e-10)
+		and np.abs(np.sum(x)) < 1e-10 and np.linalg.norm(dom.Ls[0].dot(x)) <= 2 + 1e-10 for x in X])
+	assert np.any(inside) and not np.all(inside)
+	assert np.all(dom.isinside(X, tol = 1e-10) == inside)
+
+	slack = dom.slack(X)
+	assert slack.shape == (len(X), len(dom.b_aug) + 1)
+	assert np.allclose(slack[:,:len(dom.b_aug)], dom.b_aug - X.dot(dom.A_aug.T))
+	assert np.allclose(slack[:,-1], 2 - np.linalg.norm(X.dot(dom.Ls[0].T), axis = 1))
+	assert np.all(np.all(slack >= -1e-10, axis = 1)[inside])
+
 def test_extent_quad(m = 5):
 	L = np.eye(m)
 	y = np.random.randn(m)
@@ -147,3 +168,47 @@ def test_bad_scaling():
 
 if __name__ == '__main__':
 	test_constrained_least_squares()	
+
+
+def test_volume(m = 7):
+	np.random.seed(0)
+	from scipy.special import gammaln
+	dom = LinQuadDomain(Ls = [np.eye(m)], ys = [np.zeros(m)], rhos = [1.], lb = -0.5*np.ones(m), ub = 10*np.ones(m))
+	# The ball restricted to the positive orthant and the slab x_i >= -0.5 has at least this volume
+	vol_orthant = np.exp(m/2.*np.log(np.pi) - gammaln(m/2. + 1))/2**m
+	vol, (lo, hi) = dom.volume(rtol = 0.05, return_interval = True)
+	print(vol, lo, hi, vol_orthant)
+	assert vol_orthant < lo and hi < 2**m*vol_orthant
+	
+	# Compare against the multiphase estimator
+	vol2, sd = dom._volume_multiphase(0.05/1.96)
+	print(vol2)
+	assert np.isclose(vol, vol2, rtol = 0.15)
+
+
+def test_extents(m = 4):
+	np.random.seed(0)
+	dom1 = LinQuadDomain(A = np.ones((1,m)), b = [1.], lb = -np.ones(m), ub = np.ones(m),
+		Ls = [np.diag(np.arange(1, m+1))], ys = [0.1*np.ones(m)], rhos = [2.])
+	dom2 = psdr.ConvexHullDomain(np.random.randn(20, 2))
+	dom3 = BoxDomain(-np.ones(2), np.ones(2))
+	for dom in [dom1, dom1*dom2*dom3]:
+		X = dom.sample(50)
+		P = np.random.randn(50, len(dom))
+		fwd, bwd = dom.extents(X, P)
+		assert np.all(fwd > 0) and np.all(bwd > 0)
+		# Each end of the chord should be on the boundary
+		for alpha, sign in [(fwd, 1), (bwd, -1)]:
+			assert np.all(dom.isinside(X + sign*(alpha*(1 - 1e-7)).reshape(-1,1)*P))
+			assert not np.any(dom.isinside(X + sign*(alpha*(1 + 1e-3) + 1e-3).reshape(-1,1)*P))
+
+		# A single point with many directions, and the scalar version
+		fwd1, bwd1 = dom.extents(X[0], P)
+		assert np.isclose(fwd1[0], fwd[0]) and np.isclose(bwd1[0], bwd[0])
+		assert np.isclose(dom.extent(X[1], P[1]), fwd[1])
+
+	# A point just outside a face cannot step further outside it
+	x = np.array([-1 - 1e-12, 0., 0., 0.])
+	fwd, bwd = dom1.extents(x, np.vstack([-np.eye(m)[0], np.eye(m)[0]]))
+	assert fwd[0] == 0 and 0 < bwd[0] < np.inf
+	assert 0 < fwd[1] < np.inf and bwd[1] == 0
@@ -159,6 +159,40 @@ def test_lipschitz_bound_domain():
 	assert lb <= np.min(lbs)
 	assert ub >= np.max(ubs)
 
+def test_fix_subspace_signs_samps(M = 40, m = 5):
+	np.random.seed(0)
+	X = np.random.randn(M, m)
+	fX = np.random.randn(M)
+	U, _ = np.linalg.qr(np.random.randn(m, m))
+
+	# Reference implementation looping over all pairs
+	sgn = np.zeros(m)
+	for k in range(m):
+		for i in range(M):
+			for j in range(i+1, M):
+				denom = U[:,k] @ (X[i] - X[j])
+				if np.abs(denom) > 0:
+					sgn[k] += (fX[i] - fX[j])/denom
+	sgn[sgn == 0] = 1
+	U_true = U.dot(np.diag(np.sign(sgn)))
+
+	lip = LipschitzMatrix()
+	U1 = lip._fix_subspace_signs_samps(U, X, fX, chunk_size = 100)
+	assert np.allclose(U1, U_true)
+
+	# Subsampled pairs are deterministic for a fixed seed
+	U2 = lip._fix_subspace_signs_samps(U, X, fX, max_pairs = 50, seed = 1)
+	U3 = lip._fix_subspace_signs_samps(U, X, fX, max_pairs = 50, seed = 1)
+	assert np.allclose(U2, U3)
+
+	# For a ridge function the subsampled estimate should orient the ridge direction 
+	a = np.arange(1, m+1)
+	U[:,0] = -a/np.linalg.norm(a)
+	fX = X.dot(a)
+	U4 = lip._fix_subspace_signs_samps(U, X, fX, max_pairs = 200)
+	assert np.allclose(U4[:,0], a/np.linalg.norm(a))
+
+
 if __name__ == '__main__':
 	#test_lipschitz_bound_domain()
 	#test_lipschitz_grad()
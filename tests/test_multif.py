@@ -22,7 +22,9 @@ def test_multif_domain():
 		#	print("%10.7f %10.7f %10.7f" % (xi, lbi, ubi), name)
 		# TODO: This fails to due to some tolerances that are not respected, perhaps due to a scaling issue
 		assert dom.isinside(x), "Corner should be inside the domain"
-		assert dom.extent(x, -p) > 0, "extent must be positive"
+		# A corner lies on constraints that -p may leave, but we can always step towards the interior 
+		assert dom.extent(x, X[i] - x) > 0, "extent must be positive"
+		assert dom.extent(x, -p) >= 0
 
 def test_multif():
 	multif = MULTIF()
@@ -1,5 +1,6 @@
 from __future__ import division, print_function
 import numpy as np
+import scipy.stats
 from psdr import NormalDomain
 
 def test_sampling(m = 5):
@@ -91,3 +92,46 @@ def test_corner():
 #	assert False	
 
 	
+
+def test_constrained_sampling():
+	np.random.seed(0)
+	mean = np.ones(2)
+	cov = np.array([[2, 0.5], [0.5, 1]])
+	dom = NormalDomain(mean, cov, truncate = 1e-3)
+	dom_con = dom.add_constraints(lb = [0.5, -np.inf], A = [[1, 1]], b = [3])
+	assert isinstance(dom_con, NormalDomain)
+
+	X = dom_con.sample(2e4)
+	assert np.all(dom_con.isinside(X))
+
+	# Compare against rejection sampling from the unconstrained distribution
+	Y = dom.sample(4e5)
+	Y = Y[dom_con.isinside(Y)]
+	assert np.allclose(np.mean(X, axis = 0), np.mean(Y, axis = 0), atol = 2e-2)
+	assert np.allclose(np.cov(X.T), np.cov(Y.T), atol = 3e-2)
+
+	# In one dimension the distribution is a truncated normal
+	dom1 = NormalDomain(0., 1., lb = -0.5, ub = 2.)
+	X1 = dom1.sample(2e4).flatten()
+	assert np.all((X1 >= -0.5) & (X1 <= 2))
+	assert np.isclose(np.mean(X1), scipy.stats.truncnorm.mean(-0.5, 2.), atol = 2e-2)
+	assert np.isclose(np.var(X1), scipy.stats.truncnorm.var(-0.5, 2.), atol = 2e-2)
+
+
+def test_constrained_tail():
+	np.random.seed(0)
+	# Bounds far from the mean
+	for lb in [4., 6.]:
+		dom = NormalDomain(np.zeros(1), np.eye(1)).add_constraints(lb = [lb])
+		X = dom.sample(2000).flatten()
+		assert np.all(dom.isinside(X.reshape(-1,1)))
+		assert np.isclose(np.mean(X), scipy.stats.truncnorm.mean(lb, np.inf), atol = 2e-2)
+		x = np.array([[lb + 0.1]])
+		assert np.isclose(dom.pdf(x), scipy.stats.norm.pdf(lb + 0.1)/scipy.stats.norm.sf(lb))
+
+	# With correlated variables, the probability of the domain is estimated
+	cov = np.array([[1, 0.5], [0.5, 1]])
+	dom = NormalDomain(np.zeros(2), cov, lb = [5, -np.inf])
+	assert np.all(dom.isinside(dom.sample(1000)))
+	mass = np.exp(dom._log_mass)
+	assert 0.5 < mass/scipy.stats.norm.sf(5) < 2
@@ -2,7 +2,7 @@ from __future__ import print_function
 
 import numpy as np
 import psdr
-from psdr.quadrature import gauss
+from psdr.quadrature import gauss, clenshaw_curtis, smolyak, smolyak_size
 import scipy.integrate
 
 def test_gauss():
@@ -52,6 +52,55 @@ def test_sphere(m = 3):
 	print(np.sum(w), 4./3*np.pi)
 	assert np.isclose(np.sum(w), 4./3.*np.pi, rtol = 5e-2)
 
+	# Test using a scrambled Sobol sequence
+	X, w = dom.quadrature_rule(1e3, method = 'qmc' )
+	print(np.sum(w), 4./3*np.pi)
+	assert np.isclose(np.sum(w), 4./3.*np.pi, rtol = 5e-2)
+
+
+def test_clenshaw_curtis():
+	for N in [1, 2, 5, 8, 17]:
+		x, w = clenshaw_curtis(N, -1, 2)
+		for d in range(N):
+			assert np.isclose(np.sum(w*x**d), (2**(d+1) - (-1)**(d+1))/(d+1.)), "Quadrature rule failed"
+
+
+def test_smolyak(m = 5):
+	np.random.seed(0)
+	lb = -np.ones(m)
+	ub = np.arange(1, m+1)
+	for level in range(5):
+		X, w = smolyak(m, level, lb, ub)
+		assert len(X) == smolyak_size(m, level)
+		assert np.all(X >= lb) and np.all(X <= ub)
+
+		# The rule is exact for polynomials of total degree 2*level + 1
+		for it in range(5):
+			p = np.random.multinomial(2*level+1, np.ones(m)/m)
+			int1 = np.sum(w*np.prod(X**p, axis = 1))
+			int2 = np.prod((ub**(p+1) - lb**(p+1))/(p+1.))
+			print(level, p, int1, int2)
+			assert np.isclose(int1, int2), "Quadrature rule failed"
+
+
+def test_quad_smolyak(m = 12):
+	# A tensor product rule would have only one point in each direction
+	dom = psdr.BoxDomain(-np.ones(m), np.ones(m))
+	X, w = dom.quadrature_rule(1000)
+	assert 300 < len(X) <= 1000
+	assert np.isclose(np.sum(w), 2.**m)
+	assert np.isclose(np.sum(w*X[:,0]**2), 2.**m/3)
+
+	# Some weights are negative, but the estimated C is still correct
+	a = np.arange(1, m+1)/m
+	grads = np.outer(np.sin(X @ a), a)
+	asub = psdr.ActiveSubspace()
+	asub.fit(grads, w/np.sum(w))
+	print(asub.singvals)
+	assert np.all(np.isfinite(asub.singvals))
+	assert np.isclose(np.abs(asub.U[:,0] @ a)/np.linalg.norm(a), 1)
+	assert np.all(asub.singvals[1:] < 1e-6*asub.singvals[0])
+
 
 if __name__ == '__main__':
 	test_sphere()
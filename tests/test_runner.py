@@ -0,0 +1,101 @@
+from __future__ import print_function
+import time
+import threading
+import numpy as np
+import psdr, psdr.demos
+from psdr import BoxDomain, Function, LocalRunner, FunctionEvaluationError
+
+
+def test_local_runner(m = 3):
+	np.random.seed(0)
+	X = np.random.randn(20, m)
+	threads = set()
+	def f(x):
+		threads.add(threading.get_ident())
+		time.sleep(1e-3)
+		return np.sum(x**2)
+	
+	with LocalRunner(f, workers = 4, batch_size = 3) as runner:
+		fX = runner(X)
+		assert np.allclose(fX, np.sum(X**2, axis = 1))
+		assert runner(X[0]) == f(X[0])
+	assert len(threads) > 1
+
+	# Vectorized functions receive a batch at a time
+	runner = LocalRunner(lambda X: np.sum(X**2, axis = 1), vectorized = True, workers = 2, batch_size = 7)
+	assert np.allclose(runner(X), np.sum(X**2, axis = 1))
+
+	# As a vectorized function
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	fun = Function(runner, dom, vectorized = True)
+	Xn = fun.domain.sample(10)
+	assert np.allclose(fun(Xn).flatten(), np.sum(Xn**2, axis = 1))
+
+
+def test_local_runner_retry(m = 2):
+	X = np.arange(10*m, dtype = float).reshape(10, m)
+	attempts = {}
+	def flaky(x):
+		# Every job fails the first time; job 3 always fails
+		k = int(x[0])//m
+		attempts[k] = attempts.get(k, 0) + 1
+		if attempts[k] == 1 or k == 3:
+			raise RuntimeError("failed")
+		return x[0]
+
+	runner = LocalRunner(flaky, workers = 2, batch_size = 4, retries = 2)
+	try:
+		runner(X)
+		assert False, "should have raised"
+	except FunctionEvaluationError as e:
+		assert list(e.errors.keys()) == [3]
+	assert attempts[3] == 3
+	assert all(attempts[k] == 2 for k in attempts if k != 3)
+
+	# Timeouts
+	def slow(x):
+		time.sleep(0.05 if x[0] > 0 else 0)
+		return x[0]
+	runner = LocalRunner(slow, timeout = 0.02)
+	try:
+		runner(np.array([[-1.], [1.], [-2.]]))
+		assert False, "should have raised"
+	except FunctionEvaluationError as e:
+		assert list(e.errors.keys()) == [1]
+		assert isinstance(e.errors[1], TimeoutError)
+
+	# A vectorized function that fails once on a batch is retried one row at a time
+	calls = []
+	def flaky_vec(X):
+		calls.append(len(X))
+		if len(calls) == 1:
+			raise RuntimeError("failed")
+		return np.sum(X**2, axis = 1)
+	runner = LocalRunner(flaky_vec, vectorized = True, batch_size = 5)
+	assert np.allclose(runner(X[:5]), np.sum(X[:5]**2, axis = 1))
+	assert calls == [5, 1, 1, 1, 1, 1]
+
+
+def test_naca_local_runner():
+	# The NACA0012 pipeline can be exercised with a surrogate without Docker
+	def surrogate(x, return_grad = False, **kwargs):
+		fx = np.array([np.sum(x), np.sum(x**2)])
+		if return_grad:
+			return fx, np.vstack([np.ones(len(x)), 2*x])
+		return fx
+
+	naca = psdr.demos.NACA0012(n_lower = 2, n_upper = 3, runner = LocalRunner(surrogate, workers = 2))
+	X = naca.domain.sample(5)
+	fX, grads = naca(X, return_grad = True)
+	assert fX.shape == (5, 2)
+	assert grads.shape == (5, 2, 5)
+	
+	try:
+		psdr.demos.NACA0012(runner = LocalRunner(surrogate), dask_client = object())
+		assert False, "should have raised"
+	except ValueError:
+		pass
+
+	args = psdr.demos.naca0012._naca0012_command('/workdir/job', n_lower = 2, n_upper = 3, return_grad = True)
+	assert args[:5] == ['/workdir/job/my.input', '--nlower', '2', '--nupper', '3']
+	assert '--adjoint' in args
@@ -59,6 +59,34 @@ def no_test_seqmaximin():
 			assert len(samp.fX) == 7	
 
 
+def test_seqmaximin_async(m = 2):
+	import asyncio
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	running = []
+	peak = [0]
+	async def slow(x):
+		running.append(1)
+		peak[0] = max(peak[0], len(running))
+		# Evaluation times vary so results arrive out of order
+		await asyncio.sleep(0.01*np.random.rand())
+		running.pop()
+		return np.sum(x**2)
+
+	fun = psdr.Function(lambda x: np.sum(x**2), dom, afuns = slow)
+	samp = SequentialMaximinSampler(fun)
+	asyncio.run(samp.sample_async(8, max_pending = 3))
+	assert peak[0] == 3
+	assert samp.X.shape == (8, m)
+	assert np.allclose(samp.fX.flatten(), np.sum(samp.X**2, axis = 1))
+	# Pending points are treated as sampled, so no points are repeated
+	assert np.min(pdist(samp.X)) > 1e-3
+	
+	samp.sample(2)
+	assert samp.X.shape == (10, m)
+	assert samp.fX.shape == (10, 1)
+
+
 def test_maximin(N = 11, m = 5):
 	dom = BoxDomain(-np.ones(m), np.ones(m))
 	L = np.ones((1,m))
@@ -8,5 +8,24 @@ def test_subspace_convergence():
 	sampler = psdr.random_sample
 	ang, Ms = psdr.subspace_convergence(mego, fun, sampler, Ms, data = 'grad', subspace_dimension = 1)
 
+
+def test_subspace_convergence_resume(tmp_path):
+	fun = psdr.demos.Borehole()
+	Ns = [10, 20, 40, 80]
+	path = str(tmp_path / 'ckpt')
+	
+	np.random.seed(0)
+	ang_ref, Ms_ref = psdr.subspace_convergence(psdr.ActiveSubspace(), fun, psdr.random_sample, Ns, data = 'grad')
+	
+	# Run only part of the study, then resume it from the checkpoint
+	np.random.seed(0)
+	psdr.subspace_convergence(psdr.ActiveSubspace(), fun, psdr.random_sample, Ns[:2], data = 'grad', checkpoint = path)
+	np.random.seed(1)
+	ang, Ms = psdr.subspace_convergence(psdr.ActiveSubspace(), fun, psdr.random_sample, Ns, data = 'grad', checkpoint = path)
+	assert np.all(Ms == Ms_ref)
+	assert np.allclose(ang, ang_ref)
+	assert psdr.Checkpoint(path)['grads'].shape == (sum(Ns), len(fun.domain))
+
+
 if __name__ == '__main__':
 	test_subspace_convergence()
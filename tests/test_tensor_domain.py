@@ -1,4 +1,5 @@
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from psdr import TensorProductDomain, BoxDomain, LinQuadDomain
 
 def test_sample():
@@ -26,3 +27,68 @@ def test_closest_point(m = 5):
 	x = dom.closest_point(x0)
 	assert np.all(np.isclose(x[0:m],0))
 	assert np.all(np.isclose(x[-1], 2))
+
+def test_normalize():
+	np.random.seed(0)
+	dom1 = BoxDomain([-1, 0], [1, 10])
+	dom2 = LinQuadDomain(lb = [2], ub = [3])
+	dom = dom1 * dom2
+	
+	X = dom.sample(20)
+	X_norm = dom.normalize(X)
+	assert np.allclose(X_norm[:,0:2], dom1.normalize(X[:,0:2]))
+	assert np.allclose(X_norm[:,2:], dom2.normalize(X[:,2:]))
+	assert np.all(np.abs(X_norm) <= 1 + 1e-10)
+	assert np.allclose(dom.unnormalize(X_norm), X)
+	assert np.allclose(dom._unnormalize_der(), np.diag(dom._unnormalize_scale()))
+
+	# Write into a caller-supplied buffer, including in place
+	out = np.empty(X.shape)
+	assert dom.unnormalize(X_norm, out = out) is out
+	assert np.allclose(out, X)
+	dom.normalize(out, out = out)
+	assert np.allclose(out, X_norm)
+	x_norm = np.empty(len(dom))
+	dom.normalize(X[0], out = x_norm)
+	assert np.allclose(x_norm, X_norm[0])
+
+def test_separable():
+	np.random.seed(0)
+	dom1 = LinQuadDomain(Ls = [np.eye(3)], ys = [np.zeros(3)], rhos = [1])
+	dom2 = BoxDomain([2, -1], [3, 1])
+	dom3 = LinQuadDomain(A = [[1, 1]], b = [0.5], lb = [0, 0], ub = [1, 1])
+	dom = dom1 * dom2 * dom3
+
+	# Constraints are assembled once as block diagonal matrices
+	assert dom.A is dom.A
+	assert dom.A.shape == (1, len(dom))
+	assert np.allclose(dom.A_sparse.toarray(), dom.A)
+	assert np.allclose(dom.lb, np.hstack([dom1.lb, dom2.lb, dom3.lb]))
+
+	X = dom.sample(100)
+	assert X.shape == (100, len(dom))
+	assert np.all(dom.isinside(X))
+
+	# Corners and closest points are found domain-by-domain;
+	# these should be at least as good as any sample
+	X = dom.sample(1000)
+	p = np.random.randn(len(dom))
+	x = dom.corner(p)
+	assert dom.isinside(x)
+	assert p.dot(x) >= np.max(X.dot(p)) - 1e-6
+
+	# A low-rank L that does not involve every domain
+	L_low = np.zeros((1, len(dom)))
+	L_low[0,0] = 1.
+	for L in [None, np.diag(np.random.rand(len(dom))), L_low]:
+		x0 = 3*np.random.randn(len(dom))
+		x = dom.closest_point(x0, L = L)
+		L = np.eye(len(dom)) if L is None else L
+		assert dom.isinside(x)
+		assert np.linalg.norm(L.dot(x - x0)) <= np.min(np.linalg.norm((X - x0).dot(L.T), axis = 1)) + 1e-6
+	
+	# The problems for each domain can be solved in other processes
+	with ProcessPoolExecutor(2) as executor:
+		dom_par = TensorProductDomain([dom1, dom2, dom3], executor = executor)
+		assert np.allclose(dom_par.corner(p), dom.corner(p), atol = 1e-6)
+		assert np.allclose(dom_par.closest_point(x0, L = L), dom.closest_point(x0, L = L), atol = 1e-6)
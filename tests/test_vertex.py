@@ -94,6 +94,31 @@ def test_vertex_eq(m = 5):
 	X0 = dom.sample(5)
 	check_vertex_sample(dom, Xhat, X0)
 
+def test_vertex_chunked(m = 5):
+	# Processing the points in small blocks should not change the vertices
+	import psdr.geometry.vertex as vertex
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	dom = dom.add_constraints(A_eq = np.ones(m), b_eq = [0])
+	Xhat = dom.sample(10)
+	X0 = dom.sample(50)
+	V1 = voronoi_vertex_sample(dom, Xhat, X0, randomize = False)
+	chunk_size = vertex._CHUNK_SIZE
+	try:
+		vertex._CHUNK_SIZE = 7
+		V2 = voronoi_vertex_sample(dom, Xhat, X0, randomize = False)
+	finally:
+		vertex._CHUNK_SIZE = chunk_size
+	assert np.allclose(V1, V2)
+
+def test_vertex_high_dim(m = 12):
+	# The range of L is large enough that nearest sites are found by brute force rather than a KD-tree
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	Xhat = dom.sample(20)
+	X0 = dom.sample(20)
+	check_vertex_sample(dom, Xhat, X0)
+
 
 def test_vertex_full(m = 2):
 	np.random.seed(0)
@@ -115,6 +140,28 @@ def test_vertex_full(m = 2):
 	print("Checking with a Lipschitz matrix")
 	check_vertex(dom, Xhat, L = L)
 		
+def test_vertex_parallel(m = 2, M = 10):
+	from concurrent.futures import ProcessPoolExecutor
+	np.random.seed(0)
+	dom = BoxDomain(-np.ones(m), np.ones(m))
+	Xhat = dom.sample(M)
+	L = np.diag(np.arange(1, m+1))
+
+	V1, cells1 = voronoi_vertex(dom, Xhat, L = L, return_cells = True)
+	with ProcessPoolExecutor(max_workers = 2) as executor:
+		V2, cells2 = voronoi_vertex(dom, Xhat, L = L, executor = executor, return_cells = True)
+	assert np.allclose(V1, V2)
+
+	# Every vertex in a cell should be (one of) the closest vertices to its site 
+	D = cdist(Xhat, V1, L)
+	d = np.min(D, axis = 0)
+	for k in range(M):
+		assert len(cells1[k]) > 0
+		assert np.all(cells1[k] == cells2[k])
+		assert np.allclose(D[k, cells1[k]], d[cells1[k]])
+
+	check_voronoi(dom, Xhat, V1, L = L)
+
 
 if __name__ == '__main__':
 	test_vertex_full()